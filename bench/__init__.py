@@ -0,0 +1,5 @@
+"""
+Нагрузочный тест бота: заглушки Telegram Bot API и Google Sheets API
+(bench/fakes.py) и сценарии регистрации и рассылки (bench/run.py).
+Запуск: python -m bench.run --help
+"""
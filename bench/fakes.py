@@ -0,0 +1,246 @@
+"""
+Заглушки Telegram Bot API и Google Sheets API для нагрузочного теста.
+
+Обе работают в отдельном процессе (`start`), чтобы не делить event loop и
+память с измеряемым ботом. Для каждой задаётся `Faults`: средняя задержка
+ответа, доля ошибок 500 и доля ответов 429. Счётчики вызовов отдаются по
+GET /_stats.
+
+Telegram отвечает на методы, которые вызывает бот (sendMessage,
+answerCallbackQuery, editMessageText, ...). На первый getUpdates нового
+процесса бота (без offset) отдаёт сообщение /start и запоминает время
+этого запроса и первого ответа бота после него (`_polled_at`,
+`_replied_at` в /_stats) — по ним меряется холодный старт. Sheets хранит листы в памяти
+и поддерживает то, чем пользуется RestSheetsService: токен сервисного
+аккаунта, values:batchGet, values:batchUpdate, values:append и
+метаданные Drive (modifiedTime меняется при каждой записи).
+"""
+import asyncio
+import itertools
+import json
+import multiprocessing
+import random
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import rsa
+from aiohttp import web
+
+
+@dataclass(frozen=True)
+class Faults:
+    latency: float = 0.0
+    error_rate: float = 0.0
+    flood_rate: float = 0.0
+    retry_after: int = 1
+
+
+async def _delay(faults: Faults) -> None:
+    if faults.latency:
+        await asyncio.sleep(random.uniform(0.5, 1.5) * faults.latency)
+
+
+def _fault(faults: Faults) -> int:
+    """Код ошибки, которую надо вернуть (0 — ответить нормально)."""
+    roll = random.random()
+    if roll < faults.flood_rate:
+        return 429
+    if roll < faults.flood_rate + faults.error_rate:
+        return 500
+    return 0
+
+
+# --- Telegram Bot API ---
+START_USER_ID = 20_000_000
+
+
+def telegram_app(faults: Faults) -> web.Application:
+    calls: Counter = Counter()
+    marks: Dict[str, float] = {}
+    message_ids = itertools.count(1)
+    update_ids = itertools.count(1)
+    bot_user = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+    def message(chat_id: str, text: str) -> Dict:
+        return {
+            "message_id": next(message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id), "type": "private"},
+            "from": bot_user,
+            "text": text,
+        }
+
+    async def handle(request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        calls[method] += 1
+        params = await request.post()
+        await _delay(faults)
+        status = _fault(faults)
+        if status == 429:
+            calls["_429"] += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {faults.retry_after}",
+                "parameters": {"retry_after": faults.retry_after},
+            })
+        if status:
+            calls["_500"] += 1
+            return web.json_response(
+                {"ok": False, "error_code": 500, "description": "Internal Server Error"}
+            )
+        if method == "getUpdates":
+            if "offset" in params:
+                await asyncio.sleep(min(float(params.get("timeout", 0)), 1.0))
+                result = []
+            else:
+                marks["_polled_at"] = time.time()
+                user = {"id": START_USER_ID, "is_bot": False, "first_name": "Bench"}
+                update_id = next(update_ids)
+                result = [{"update_id": update_id, "message": {
+                    "message_id": update_id, "date": int(time.time()), "text": "/start",
+                    "chat": {"id": START_USER_ID, "type": "private"}, "from": user,
+                }}]
+        elif method == "getMe":
+            result = bot_user
+        elif method in ("sendMessage", "editMessageText"):
+            result = message(params.get("chat_id", "0"), params.get("text", ""))
+            if method == "sendMessage" and marks.get("_replied_at", 0.0) < marks.get("_polled_at", 0.0):
+                marks["_replied_at"] = time.time()
+        elif method == "copyMessage":
+            result = {"message_id": next(message_ids)}
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def stats(_: web.Request) -> web.Response:
+        return web.json_response({**calls, **marks})
+
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", handle)
+    app.router.add_get("/_stats", stats)
+    return app
+
+
+# --- Google Sheets API ---
+def write_credentials(path: str, token_uri: str) -> None:
+    """Ключ сервисного аккаунта для заглушки (ключ настоящий, подпись не проверяется)."""
+    _, private_key = rsa.newkeys(1024)
+    info = {
+        "type": "service_account",
+        "client_email": "bench@bench.iam.gserviceaccount.com",
+        "private_key_id": "bench",
+        "private_key": private_key.save_pkcs1().decode(),
+        "token_uri": token_uri,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(info, f)
+
+
+def _parse_range(a1: str) -> Tuple[str, int]:
+    """'Лист'!A5:L -> ("Лист", 5); строка 1:1 -> 1."""
+    match = re.match(r"'((?:[^']|'')+)'(?:!([A-Z]*)(\d+))?", a1)
+    return match.group(1).replace("''", "'"), int(match.group(3) or 1)
+
+
+def sheets_app(faults: Faults) -> web.Application:
+    sheets: Dict[str, List[List]] = {}
+    calls: Counter = Counter()
+    # Сколько раз книгу меняли — из этого собирается modifiedTime
+    modified = [0]
+
+    def guarded(op: str):
+        def wrap(handler):
+            async def wrapped(request: web.Request) -> web.Response:
+                calls[op] += 1
+                await _delay(faults)
+                status = _fault(faults)
+                if status:
+                    calls[f"_{status}"] += 1
+                    return web.json_response(
+                        {"error": {"code": status, "message": "bench fault"}}, status=status
+                    )
+                return await handler(request)
+            return wrapped
+        return wrap
+
+    async def token(_: web.Request) -> web.Response:
+        calls["token"] += 1
+        return web.json_response({"access_token": "bench", "expires_in": 3600})
+
+    @guarded("batchGet")
+    async def batch_get(request: web.Request) -> web.Response:
+        value_ranges = []
+        for a1 in request.query.getall("ranges", []):
+            name, start = _parse_range(a1)
+            rows = sheets.get(name, [])
+            rows = rows[:1] if a1.endswith("1:1") else rows[start - 1:]
+            value_ranges.append({"values": rows} if rows else {})
+        return web.json_response({"valueRanges": value_ranges})
+
+    @guarded("batchUpdate")
+    async def batch_update(request: web.Request) -> web.Response:
+        body = await request.json()
+        for item in body["data"]:
+            name, start = _parse_range(item["range"])
+            rows = sheets.setdefault(name, [])
+            for i, row in enumerate(item["values"]):
+                while len(rows) < start + i:
+                    rows.append([])
+                rows[start + i - 1] = row
+        modified[0] += 1
+        return web.json_response({"totalUpdatedRows": len(body["data"])})
+
+    @guarded("append")
+    async def append(request: web.Request) -> web.Response:
+        name, _ = _parse_range(request.match_info["range"])
+        values = (await request.json())["values"]
+        sheets.setdefault(name, []).extend(values)
+        modified[0] += 1
+        return web.json_response({"updates": {"updatedRows": len(values)}})
+
+    @guarded("driveFile")
+    async def drive_file(_: web.Request) -> web.Response:
+        return web.json_response({"modifiedTime": f"2024-01-01T00:00:00.{modified[0]:06d}Z"})
+
+    async def stats(_: web.Request) -> web.Response:
+        return web.json_response({**calls, "_rows": {k: len(v) for k, v in sheets.items()}})
+
+    app = web.Application()
+    app.router.add_post("/token", token)
+    app.router.add_get("/v4/spreadsheets/{id}/values:batchGet", batch_get)
+    app.router.add_post("/v4/spreadsheets/{id}/values:batchUpdate", batch_update)
+    app.router.add_post("/v4/spreadsheets/{id}/values/{range}:append", append)
+    app.router.add_get("/drive/v3/files/{id}", drive_file)
+    app.router.add_get("/_stats", stats)
+    return app
+
+
+# --- Отдельный процесс ---
+def _serve(telegram_port: int, sheets_port: int, telegram: Faults, sheets: Faults, ready) -> None:
+    async def main() -> None:
+        for app, port in ((telegram_app(telegram), telegram_port), (sheets_app(sheets), sheets_port)):
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            await web.TCPSite(runner, "127.0.0.1", port).start()
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+def start(telegram_port: int, sheets_port: int, telegram: Faults, sheets: Faults):
+    """Запускает обе заглушки в дочернем процессе; возвращает процесс (terminate() — остановить)."""
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Event()
+    process = ctx.Process(
+        target=_serve, args=(telegram_port, sheets_port, telegram, sheets, ready), daemon=True
+    )
+    process.start()
+    if not ready.wait(30):
+        process.terminate()
+        raise RuntimeError("Fake API servers did not start")
+    return process
@@ -0,0 +1,517 @@
+"""
+Нагрузочный тест: регистрации и рассылка через настоящие хендлеры бота.
+
+Бот собирается так же, как в bot.py (FSM в SQLite, локальное хранилище,
+очередь записи в Sheets, рассылка), но ходит в заглушки Telegram и Google
+Sheets (bench/fakes.py) с настраиваемыми задержками, ошибками и 429.
+Sheets подключается через RestSheetsService.
+
+Сценарии:
+  registration — `--users` пользователей параллельно (не больше
+      `--concurrency` одновременно) проходят анкету Мероприятий или
+      Акселератора от /start до подтверждения; затем ждём, пока очередь
+      запишет всё в листы.
+  broadcast — в хранилище `--recipients` пользователей, админ делает /send
+      «всем», ждём завершения рассылки.
+  startup — `--starts` раз запускаем сам bot.py (polling, REST-клиент Sheets)
+      с чистой базой и меряем, через сколько он начал получать апдейты и
+      ответил на первый (/start).
+
+Отчёт: пропускная способность, p50/p95/p99 времени обработки апдейта,
+запросы к API на одну регистрацию, пиковый RSS. Результат сохраняется в
+`--results` (по умолчанию bench/results) и сравнивается с предыдущим
+запуском того же сценария с теми же параметрами.
+
+    python -m bench.run registration --users 2000 --concurrency 200
+    python -m bench.run broadcast --recipients 5000 --broadcast-rate 1000
+    python -m bench.run startup --starts 10 --sheets-latency 2
+"""
+import argparse
+import asyncio
+import glob
+import itertools
+import json
+import logging
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import aiohttp
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+from bench import fakes
+from config import (
+    ADMIN_DIGEST_INTERVAL,
+    ADMIN_DIGEST_THRESHOLD,
+    BROADCAST_RATE,
+    BROADCAST_WORKERS,
+    SHEETS_BATCH_MAX_AGE,
+    SHEETS_BATCH_SIZE,
+    SHEETS_BREAKER_RESET,
+    SHEETS_BREAKER_THRESHOLD,
+    SHEETS_MAX_CONCURRENCY,
+    SHEETS_TIMEOUT,
+)
+from handlers import admin, registration
+from handlers.registration import FORM_BY_CHOICE
+from services import admins, metrics
+from services.admin_notifier import AdminNotifier
+from services.admin_sync import AdminSync
+from services.async_sheets import AsyncSheetsService
+from services.broadcast_jobs import BroadcastJobManager
+from services.broadcaster import Broadcaster, RateLimiter
+from services.circuit_breaker import CircuitBreaker
+from services.fsm_storage import create_storage
+from services.ledger import BroadcastLedger
+from services.readiness import ADMINS, REGISTRATIONS, Readiness
+from services.registration_queue import RegistrationQueue
+from services.sheets_rest import RestSheetsService
+from services.store import DATE_FMT, RegistrationStore
+
+logger = logging.getLogger("bench")
+
+BENCH_TOKEN = "123456:bench"
+BOT_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bot.py")
+FIRST_USER_ID = 10_000_000
+ADMIN_ID = 1000
+
+# Ответы на текстовые шаги анкет (проходят проверки utils/validators.py)
+ANSWERS = {
+    "full_name": lambda i: f"Участник Нагрузочного Теста {i}",
+    "project_name": lambda i: f"Проект {i}",
+    "email": lambda i: f"user{i}@example.com",
+    "contact": lambda i: f"@bench_user_{i}",
+    "description": lambda i: "Описание проекта для нагрузочного теста. " * 3,
+    "presentation_url": lambda i: f"https://example.com/deck/{i}",
+    "team": lambda i: f"Участник Нагрузочного Теста {i}, ПМИ",
+    "edu_program": lambda i: "Прикладная математика и информатика",
+    "question": lambda i: "-",
+}
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {
+        "p50": round(cuts[49] * 1000, 2),
+        "p95": round(cuts[94] * 1000, 2),
+        "p99": round(cuts[98] * 1000, 2),
+        "max": round(max(values) * 1000, 2),
+    }
+
+
+def peak_rss_mb() -> float:
+    # Linux: ru_maxrss в килобайтах
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+async def fetch_stats(url: str) -> Dict:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{url}/_stats") as response:
+            return await response.json()
+
+
+def api_calls(stats: Dict) -> int:
+    return sum(v for k, v in stats.items() if not k.startswith("_") and k != "token")
+
+
+class Harness:
+    """Бот, собранный как в bot.py, но с заглушками вместо Telegram и Google."""
+
+    def __init__(self, args: argparse.Namespace, workdir: str):
+        self.args = args
+        self.workdir = workdir
+        self.telegram_url = f"http://127.0.0.1:{args.telegram_port}"
+        self.sheets_url = f"http://127.0.0.1:{args.sheets_port}"
+        db_path = os.path.join(workdir, "bench.db")
+        credentials = os.path.join(workdir, "credentials.json")
+        fakes.write_credentials(credentials, f"{self.sheets_url}/token")
+
+        session = AiohttpSession(api=TelegramAPIServer.from_base(self.telegram_url))
+        self.bot = Bot(token=BENCH_TOKEN, session=session)
+        self.storage = create_storage("sqlite", db_path)
+        self.dp = Dispatcher(storage=self.storage)
+        self.dp.include_router(registration.router)
+        self.dp.include_router(admin.router)
+        self.dp.message.middleware(metrics.HandlerMetricsMiddleware())
+        self.dp.callback_query.middleware(metrics.HandlerMetricsMiddleware())
+        self.bot.session.middleware(metrics.TelegramMetricsMiddleware())
+
+        self.sheets = AsyncSheetsService(
+            RestSheetsService(
+                credentials,
+                "bench",
+                max_connections=SHEETS_MAX_CONCURRENCY,
+                api_url=f"{self.sheets_url}/v4",
+                drive_url=f"{self.sheets_url}/drive/v3",
+            ),
+            max_concurrency=SHEETS_MAX_CONCURRENCY,
+            timeout=SHEETS_TIMEOUT,
+            breaker=CircuitBreaker(
+                "sheets", failure_threshold=SHEETS_BREAKER_THRESHOLD, reset_timeout=SHEETS_BREAKER_RESET
+            ),
+        )
+        self.queue = RegistrationQueue(
+            db_path, self.sheets, batch_size=SHEETS_BATCH_SIZE, batch_max_age=SHEETS_BATCH_MAX_AGE
+        )
+        self.store = RegistrationStore(db_path)
+        self.broadcaster = Broadcaster(
+            self.bot, RateLimiter(global_rate=args.broadcast_rate), workers=BROADCAST_WORKERS
+        )
+        self.jobs = BroadcastJobManager(self.broadcaster)
+        self.notifier = AdminNotifier(
+            self.broadcaster, digest_threshold=ADMIN_DIGEST_THRESHOLD, interval=ADMIN_DIGEST_INTERVAL
+        )
+        self.dp["sheets"] = self.sheets
+        self.dp["registration_queue"] = self.queue
+        self.dp["registration_store"] = self.store
+        self.dp["registrations"] = self.store
+        self.dp["broadcaster"] = self.broadcaster
+        self.dp["broadcast_jobs"] = self.jobs
+        self.dp["broadcast_ledger"] = BroadcastLedger(db_path)
+        self.dp["admin_notifier"] = self.notifier
+        self.dp["admin_sync"] = AdminSync(self.sheets)
+        admins.set_admin_ids(range(ADMIN_ID, ADMIN_ID + args.admins))
+        # Админы заданы сразу, база пустая — прогревать нечего
+        self.readiness = Readiness()
+        self.readiness.set_ready(ADMINS)
+        self.readiness.set_ready(REGISTRATIONS)
+        self.dp["readiness"] = self.readiness
+
+        self._update_ids = itertools.count(1)
+        self.latencies: List[float] = []
+        self.failed_updates = 0
+
+    def _user(self, user_id: int) -> User:
+        return User(id=user_id, is_bot=False, first_name=f"user{user_id}")
+
+    def _chat(self, user_id: int) -> Chat:
+        return Chat(id=user_id, type="private")
+
+    def message(self, user_id: int, text: str) -> Update:
+        update_id = next(self._update_ids)
+        return Update(update_id=update_id, message=Message(
+            message_id=update_id, date=datetime.now(), chat=self._chat(user_id),
+            from_user=self._user(user_id), text=text,
+        ))
+
+    def callback(self, user_id: int, data: str) -> Update:
+        update_id = next(self._update_ids)
+        return Update(update_id=update_id, callback_query=CallbackQuery(
+            id=str(update_id), from_user=self._user(user_id), chat_instance=str(user_id), data=data,
+            message=Message(message_id=update_id, date=datetime.now(), chat=self._chat(user_id), text="…"),
+        ))
+
+    async def feed(self, update: Update) -> bool:
+        started = time.perf_counter()
+        try:
+            await self.dp.feed_update(self.bot, update)
+            return True
+        except Exception as e:
+            self.failed_updates += 1
+            logger.debug("Update %s failed: %s", update.update_id, e)
+            return False
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+
+    async def register(self, index: int) -> None:
+        """Один пользователь проходит анкету от /start до подтверждения."""
+        user_id = FIRST_USER_ID + index
+        choice = "ev:evs" if index % 2 == 0 else "ev:acc"
+        form = FORM_BY_CHOICE[choice]
+        updates = [self.message(user_id, "/start"), self.callback(user_id, choice)]
+        for step in form.steps:
+            if step.choices is not None:
+                updates.append(self.callback(user_id, next(iter(step.choices))))
+            else:
+                updates.append(self.message(user_id, ANSWERS[step.key](index)))
+        updates.append(self.callback(user_id, "conf:y"))
+        for update in updates:
+            await self.feed(update)
+            if self.args.think:
+                await asyncio.sleep(self.args.think)
+
+    async def drain_queue(self, timeout: float) -> float:
+        started = time.monotonic()
+        while self.queue.pending_count() and time.monotonic() - started < timeout:
+            await asyncio.sleep(0.1)
+        return time.monotonic() - started
+
+    async def close(self) -> None:
+        await self.storage.close()
+        await self.sheets.sheets.close()
+        await self.bot.session.close()
+
+
+async def run_registration(h: Harness) -> Dict:
+    args = h.args
+    queue_task = asyncio.create_task(h.queue.run())
+    limit = asyncio.Semaphore(args.concurrency)
+
+    async def user(index: int) -> None:
+        async with limit:
+            await h.register(index)
+
+    started = time.monotonic()
+    await asyncio.gather(*(user(i) for i in range(args.users)))
+    duration = time.monotonic() - started
+    drain = await h.drain_queue(args.drain_timeout)
+    queue_task.cancel()
+    # Сводка за неполный интервал — чтобы её запросы тоже попали в счёт
+    await h.notifier.join()
+    await h.notifier.flush()
+
+    completed = sum(
+        1 for i in range(args.users)
+        if h.store.registered_at("events" if i % 2 == 0 else "accelerator", FIRST_USER_ID + i)
+    )
+    telegram = await fetch_stats(h.telegram_url)
+    sheets = await fetch_stats(h.sheets_url)
+    per_registration = max(completed, 1)
+    return {
+        "users": args.users,
+        "completed": completed,
+        "duration_s": round(duration, 2),
+        "registrations_per_s": round(completed / duration, 2),
+        "updates": len(h.latencies),
+        "failed_updates": h.failed_updates,
+        "update_latency_ms": percentiles(h.latencies),
+        "telegram_calls_per_registration": round(api_calls(telegram) / per_registration, 2),
+        "sheets_calls_per_registration": round(api_calls(sheets) / per_registration, 3),
+        "sheets_drain_s": round(drain, 2),
+        "queue_left": h.queue.pending_count(),
+        "telegram_calls": telegram,
+        "sheets_calls": sheets,
+    }
+
+
+async def run_broadcast(h: Harness) -> Dict:
+    args = h.args
+    now = datetime.now().strftime(DATE_FMT)
+    for i in range(args.recipients):
+        h.store.add("events", {"user_id": FIRST_USER_ID + i, "registration_date": now})
+
+    await h.feed(h.message(ADMIN_ID, "/send"))
+    await h.feed(h.callback(ADMIN_ID, "aud:all"))
+    started = time.monotonic()
+    await h.feed(h.message(ADMIN_ID, "Нагрузочный тест рассылки"))
+    jobs = h.jobs.active_jobs()
+    if not jobs:
+        raise RuntimeError("Broadcast did not start")
+    await jobs[0].task
+    duration = time.monotonic() - started
+    result = jobs[0].result
+    telegram = await fetch_stats(h.telegram_url)
+    return {
+        "recipients": args.recipients,
+        "sent": len(result.sent),
+        "blocked": len(result.blocked),
+        "failed": len(result.failed),
+        "duration_s": round(duration, 2),
+        "messages_per_s": round(len(result.sent) / duration, 2),
+        "telegram_calls": telegram,
+        "telegram_calls_per_recipient": round(api_calls(telegram) / max(args.recipients, 1), 3),
+        "update_latency_ms": percentiles(h.latencies),
+    }
+
+
+async def wait_first_reply(telegram_url: str, since: float, timeout: float) -> Dict:
+    """Ждёт, пока бот, запущенный в момент since, ответит на свой первый апдейт."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = await fetch_stats(telegram_url)
+        if stats.get("_polled_at", 0.0) > since and stats.get("_replied_at", 0.0) > stats["_polled_at"]:
+            return stats
+        await asyncio.sleep(0.05)
+    raise RuntimeError(f"Bot did not answer the first update in {timeout:.0f}s")
+
+
+async def run_startup(h: Harness) -> Dict:
+    args = h.args
+    polled: List[float] = []
+    answered: List[float] = []
+    for i in range(args.starts):
+        env = {
+            **os.environ,
+            "BOT_TOKEN": BENCH_TOKEN,
+            "TELEGRAM_API_URL": h.telegram_url,
+            "TELEGRAM_PROXY": "",
+            "WEBHOOK_URL": "",
+            "SHEETS_BACKEND": "rest",
+            "SHEETS_API_URL": f"{h.sheets_url}/v4",
+            "DRIVE_API_URL": f"{h.sheets_url}/drive/v3",
+            "SPREADSHEET_ID": "bench",
+            "DB_PATH": os.path.join(h.workdir, f"startup-{i}.db"),
+            "FSM_STORAGE": "sqlite",
+            "METRICS_PORT": "0",
+        }
+        output = None if args.verbose else subprocess.DEVNULL
+        started = time.time()
+        # credentials.json бот ищет в текущем каталоге — его пишет Harness
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, BOT_SCRIPT, cwd=h.workdir, env=env, stdout=output, stderr=output
+        )
+        try:
+            stats = await wait_first_reply(h.telegram_url, started, args.startup_timeout)
+        finally:
+            process.terminate()
+            await process.wait()
+        polled.append(stats["_polled_at"] - started)
+        answered.append(stats["_replied_at"] - started)
+    return {
+        "starts": args.starts,
+        "first_poll_ms": percentiles(polled),
+        "first_update_ms": percentiles(answered),
+    }
+
+
+SCENARIOS = {"registration": run_registration, "broadcast": run_broadcast, "startup": run_startup}
+
+
+def git_revision() -> str:
+    try:
+        rev = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True).stdout.strip()
+        return f"{rev}-dirty" if dirty else rev
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def flatten(data: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def comparable(params: Dict) -> Dict:
+    return {k: v for k, v in params.items() if not k.endswith("_port")}
+
+
+def previous_result(results_dir: str, report: Dict, current: Optional[str]) -> Optional[Dict]:
+    """Последний сохранённый запуск того же сценария с теми же параметрами."""
+    paths = glob.glob(os.path.join(results_dir, f"{report['scenario']}-*.json"))
+    for path in sorted(paths, reverse=True):
+        if path == current:
+            continue
+        with open(path, encoding="utf-8") as f:
+            previous = json.load(f)
+        if comparable(previous["params"]) == comparable(report["params"]):
+            return previous
+    return None
+
+
+def print_report(report: Dict, previous: Optional[Dict]) -> None:
+    current = flatten(report["metrics"])
+    before = flatten(previous["metrics"]) if previous else {}
+    if previous:
+        print(f"Сравнение с {previous['revision']} ({previous['started_at']})")
+    for key, value in current.items():
+        line = f"{key:<45} {value:>12}"
+        old = before.get(key)
+        if old is not None:
+            change = f"{(value - old) / old * 100:+.1f}%" if old else ""
+            line += f"   было {old:>12} {change}"
+        print(line)
+
+
+def save_report(report: Dict, results_dir: str) -> str:
+    os.makedirs(results_dir, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(results_dir, f"{report['scenario']}-{stamp}-{report['revision']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        harness = Harness(args, workdir)
+        try:
+            metrics = await SCENARIOS[args.scenario](harness)
+        finally:
+            await harness.close()
+    metrics["peak_rss_mb"] = peak_rss_mb()
+    return metrics
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота с заглушками Telegram и Sheets")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--users", type=int, default=1000, help="сколько пользователей регистрируются")
+    parser.add_argument("--concurrency", type=int, default=100, help="сколько заполняют анкету одновременно")
+    parser.add_argument("--think", type=float, default=0.0, help="пауза пользователя между шагами, с")
+    parser.add_argument("--recipients", type=int, default=5000, help="получателей рассылки")
+    parser.add_argument("--broadcast-rate", type=float, default=BROADCAST_RATE,
+                        help="темп рассылки, сообщений в секунду (по умолчанию BROADCAST_RATE)")
+    parser.add_argument("--admins", type=int, default=3, help="сколько админов получают уведомления")
+    parser.add_argument("--starts", type=int, default=5, help="сколько раз запустить бота в сценарии startup")
+    parser.add_argument("--startup-timeout", type=float, default=60.0,
+                        help="сколько ждать ответа бота на первый апдейт, с")
+    parser.add_argument("--tg-latency", type=float, default=0.05, help="задержка Telegram API, с")
+    parser.add_argument("--tg-errors", type=float, default=0.0, help="доля ответов 500 от Telegram")
+    parser.add_argument("--tg-429", type=float, default=0.0, help="доля ответов 429 от Telegram")
+    parser.add_argument("--sheets-latency", type=float, default=0.3, help="задержка Sheets API, с")
+    parser.add_argument("--sheets-errors", type=float, default=0.0, help="доля ответов 500 от Sheets")
+    parser.add_argument("--sheets-429", type=float, default=0.0, help="доля ответов 429 от Sheets")
+    parser.add_argument("--drain-timeout", type=float, default=120.0,
+                        help="сколько ждать записи очереди в листы, с")
+    parser.add_argument("--telegram-port", type=int, default=18081)
+    parser.add_argument("--sheets-port", type=int, default=18082)
+    parser.add_argument("--results", default=os.path.join(os.path.dirname(__file__), "results"),
+                        help="куда сохранять результаты")
+    parser.add_argument("--no-save", action="store_true", help="не сохранять результат")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.ERROR,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    fake_servers = fakes.start(
+        args.telegram_port,
+        args.sheets_port,
+        fakes.Faults(args.tg_latency, args.tg_errors, args.tg_429),
+        fakes.Faults(args.sheets_latency, args.sheets_errors, args.sheets_429),
+    )
+    started_at = datetime.now().isoformat(timespec="seconds")
+    try:
+        metrics = asyncio.run(run(args))
+    finally:
+        fake_servers.terminate()
+
+    params = {k: v for k, v in vars(args).items() if k not in ("results", "no_save", "verbose")}
+    report = {
+        "scenario": args.scenario,
+        "revision": git_revision(),
+        "started_at": started_at,
+        "params": params,
+        "metrics": metrics,
+    }
+    path = None if args.no_save else save_report(report, args.results)
+    print_report(report, previous_result(args.results, report, path))
+    if path:
+        print(f"\nРезультат сохранён: {path}")
+
+
+if __name__ == "__main__":
+    main()
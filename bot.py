@@ -1,15 +1,63 @@
 import asyncio
 import logging
+import multiprocessing
 from datetime import datetime
 
+from aiohttp import web
 from aiogram import Bot, Dispatcher
 from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
 from aiogram.exceptions import TelegramNetworkError
-from aiogram.fsm.storage.memory import MemoryStorage
 
-from config import BOT_TOKEN, TELEGRAM_PROXY
+from config import (
+    BOT_TOKEN,
+    TELEGRAM_PROXY,
+    TELEGRAM_API_URL,
+    DB_PATH,
+    READ_MODEL,
+    SHEETS_BATCH_SIZE,
+    SHEETS_BATCH_MAX_AGE,
+    SHEETS_BACKEND,
+    SHEETS_MAX_CONCURRENCY,
+    SHEETS_TIMEOUT,
+    SHEETS_BREAKER_THRESHOLD,
+    SHEETS_BREAKER_RESET,
+    BROADCAST_WORKERS,
+    BROADCAST_RATE,
+    ADMIN_DIGEST_THRESHOLD,
+    ADMIN_DIGEST_INTERVAL,
+    FSM_STORAGE,
+    REDIS_URL,
+    FSM_TTL_HOURS,
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WEBHOOK_WORKERS,
+    ADMIN_SYNC_INTERVAL,
+    REGISTRATION_IMPORT_RETRY,
+    STARTUP_WAIT_TIMEOUT,
+    METRICS_HOST,
+    METRICS_PORT,
+)
 from handlers import registration, admin
 from services.sheets import GoogleSheetsService
+from services.sheets_rest import RestSheetsService
+from services.async_sheets import AsyncSheetsService
+from services.circuit_breaker import CircuitBreaker
+from services.registration_queue import RegistrationQueue
+from services.store import RegistrationStore
+from services.fsm_storage import create_storage, count_states
+from services.broadcaster import Broadcaster, RateLimiter
+from services.broadcast_jobs import BroadcastJobManager
+from services.admin_notifier import AdminNotifier
+from services.ledger import BroadcastLedger
+from services.leader import LeaderLease
+from services.admin_sync import AdminSync
+from services.readiness import ADMINS, REGISTRATIONS, SHEETS, Readiness
+from services.webhook import build_router_app, build_worker_app
+from services import metrics
 import services.admins
 
 if not BOT_TOKEN:
@@ -21,39 +69,136 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-session = AiohttpSession(proxy=TELEGRAM_PROXY) if TELEGRAM_PROXY else None
+api = TelegramAPIServer.from_base(TELEGRAM_API_URL) if TELEGRAM_API_URL else PRODUCTION
+session = AiohttpSession(proxy=TELEGRAM_PROXY, api=api)
 bot = Bot(token=BOT_TOKEN, session=session)
-storage = MemoryStorage()
+storage = create_storage(FSM_STORAGE, DB_PATH, REDIS_URL, ttl=FSM_TTL_HOURS * 3600)
 dp = Dispatcher(storage=storage)
 dp.include_router(registration.router)
 dp.include_router(admin.router)
+# Время обработчиков и запросы к Bot API — в метрики (см. services/metrics.py)
+dp.message.middleware(metrics.HandlerMetricsMiddleware())
+dp.callback_query.middleware(metrics.HandlerMetricsMiddleware())
+bot.session.middleware(metrics.TelegramMetricsMiddleware())
+
+# Что загружается в фоне после старта; хендлеры ждут готовности через `readiness`
+readiness = Readiness(timeout=STARTUP_WAIT_TIMEOUT)
+dp["readiness"] = readiness
+
+# Единственный экземпляр на процесс; хендлеры получают его как аргумент `sheets`.
+# С Google он соединяется при первом вызове (или при прогреве в startup).
+# Блокирующие вызовы gspread выполняются в пуле потоков, а не в event loop;
+# REST-клиент (SHEETS_BACKEND=rest) асинхронный и работает прямо в нём
+if SHEETS_BACKEND == "rest":
+    sheets_service = RestSheetsService(max_connections=SHEETS_MAX_CONCURRENCY)
+else:
+    sheets_service = GoogleSheetsService()
+sheets = AsyncSheetsService(
+    sheets_service,
+    max_concurrency=SHEETS_MAX_CONCURRENCY,
+    timeout=SHEETS_TIMEOUT,
+    breaker=CircuitBreaker(
+        "sheets", failure_threshold=SHEETS_BREAKER_THRESHOLD, reset_timeout=SHEETS_BREAKER_RESET
+    ),
+)
+dp["sheets"] = sheets
+registration_queue = RegistrationQueue(
+    DB_PATH,
+    sheets,
+    batch_size=SHEETS_BATCH_SIZE,
+    batch_max_age=SHEETS_BATCH_MAX_AGE,
+)
+dp["registration_queue"] = registration_queue
+registration_store = RegistrationStore(DB_PATH)
+dp["registration_store"] = registration_store
+# Аудитории рассылки и статистика: локальная база или инкрементальное чтение листов
+registrations = registration_store if READ_MODEL == "store" else sheets
+dp["registrations"] = registrations
+# В режиме вебхука рассылки могут идти в нескольких процессах — делим общий темп между ними
+broadcast_rate = BROADCAST_RATE / WEBHOOK_WORKERS if WEBHOOK_URL else BROADCAST_RATE
+broadcaster = Broadcaster(bot, RateLimiter(global_rate=broadcast_rate), workers=BROADCAST_WORKERS)
+dp["broadcaster"] = broadcaster
+broadcast_jobs = BroadcastJobManager(broadcaster)
+dp["broadcast_jobs"] = broadcast_jobs
+dp["broadcast_ledger"] = BroadcastLedger(DB_PATH)
+# Уведомления админов о регистрациях: в фоне, при всплеске — сводками
+admin_notifier = AdminNotifier(
+    broadcaster, digest_threshold=ADMIN_DIGEST_THRESHOLD, interval=ADMIN_DIGEST_INTERVAL
+)
+dp["admin_notifier"] = admin_notifier
+# Список админов: проверка изменений листа «Админы» каждые ADMIN_SYNC_INTERVAL секунд
+admin_sync = AdminSync(sheets, interval=ADMIN_SYNC_INTERVAL)
+dp["admin_sync"] = admin_sync
+
+
+def log_admin_change(snapshot: services.admins.AdminSnapshot) -> None:
+    logger.info("Admin IDs updated (v%s): %s", snapshot.version, sorted(snapshot.ids))
+
+
+services.admins.subscribe(log_admin_change)
+
+metrics.FSM_SESSIONS.set_function(lambda: count_states(storage))
+metrics.SHEETS_QUEUE.set_function(
+    lambda: {k: v for k, v in sheets.stats().items() if k in ("queued", "in_flight")}
+)
+metrics.SHEETS_BREAKER_OPEN.set_function(lambda: int(sheets.breaker.is_open))
+metrics.BROADCAST_JOBS.set_function(lambda: len(broadcast_jobs.active_jobs()))
+metrics.BROADCAST_PENDING.set_function(broadcast_jobs.pending_messages)
+metrics.REGISTRATION_QUEUE.set_function(registration_queue.pending_count)
 
-sheets_service = GoogleSheetsService()
 
+# Прогрев и registration_sync_task могут импортировать одновременно
+import_lock = asyncio.Lock()
 
-async def refresh_admin_ids() -> list[int]:
-    """Загружает список админов из Google Sheets (лист «Админы»)."""
-    ids = sheets_service.get_admin_ids()
-    logger.info("Admin IDs refreshed: %s", ids)
-    return ids
 
+async def import_registrations() -> bool:
+    """
+    Переносит в локальное хранилище регистрации из листов, которые ещё не импортированы.
+    Возвращает True, если импортированы оба листа.
+    """
+    async with import_lock:
+        done = True
+        for event_type in ("events", "accelerator"):
+            if registration_store.is_imported(event_type):
+                continue
+            try:
+                rows = await sheets.get_registration_records(event_type)
+            except Exception as e:
+                logger.error("Failed to import %s registrations from Google Sheets: %s", event_type, e)
+                done = False
+                continue
+            n = registration_store.import_rows(event_type, rows)
+            logger.info("Imported %s %s registrations from Google Sheets", n, event_type)
+        return done
 
-async def hourly_maintenance_task(b: Bot, sheets: GoogleSheetsService) -> None:
-    """Каждый час: обновляет список админов и шлёт статистику админам."""
+
+async def import_registrations_until_done() -> None:
+    """Повторяет импорт, пока оба листа не будут импортированы."""
+    while not await import_registrations():
+        await asyncio.sleep(REGISTRATION_IMPORT_RETRY)
+
+
+async def warm_registrations(import_from_sheets: bool) -> None:
+    """Индекс регистраций из локальной базы; import_from_sheets — и первая попытка импорта из листов."""
+    await registration_store.load()
+    if import_from_sheets:
+        await import_registrations()
+
+
+async def registration_sync_task() -> None:
+    """Импорт регистраций из листов (с повторами) и перенос очереди в Google Sheets."""
+    await asyncio.gather(import_registrations_until_done(), registration_queue.run())
+
+
+async def hourly_stats_task(b: Bot, registrations) -> None:
+    """Каждый час шлёт статистику админам."""
     while True:
         now = datetime.now()
         seconds_until_next = (60 - now.minute) * 60 - now.second
         await asyncio.sleep(seconds_until_next)
 
-        # Обновляем админов перед отправкой статистики
         try:
-            ids = await refresh_admin_ids()
-            services.admins.set_admin_ids(ids)
-        except Exception as e:
-            logger.error("Failed to refresh admin IDs: %s", e)
-
-        try:
-            stats = sheets.get_registrations_count_last_hour()
+            stats = await registrations.get_registrations_count_last_hour()
             total = stats["events"] + stats["accelerator"]
             text = (
                 "📊 Статистика за последний час\n\n"
@@ -72,8 +217,8 @@ async def hourly_maintenance_task(b: Bot, sheets: GoogleSheetsService) -> None:
         await asyncio.sleep(3600)
 
 
-async def main():
-    logger.info("Starting bot...")
+async def startup(metrics_port: int = METRICS_PORT) -> None:
+    """Подготовка процесса, обрабатывающего апдейты."""
     if TELEGRAM_PROXY:
         proxy_host = TELEGRAM_PROXY.rsplit("@", 1)[-1]
         logger.info("Telegram proxy enabled: %s", proxy_host)
@@ -83,17 +228,31 @@ async def main():
             "бот не сможет подключиться."
         )
 
-    # Подтягиваем админов при старте
-    try:
-        ids = await refresh_admin_ids()
-        services.admins.set_admin_ids(ids)
-    except Exception as e:
-        logger.error("Failed to load admin IDs at startup: %s", e)
+    if metrics_port:
+        await metrics.start_server(METRICS_HOST, metrics_port)
+
+    # Подключение к Google и список админов загружаются в фоне: апдейты
+    # начинают обрабатываться сразу, а хендлеры, которым нужны админы, ждут readiness
+    asyncio.create_task(readiness.warm(SHEETS, sheets.connect))
+    asyncio.create_task(readiness.warm(ADMINS, admin_sync.refresh))
+
+
+async def main():
+    logger.info("Starting bot...")
+    await startup()
 
-    asyncio.create_task(hourly_maintenance_task(bot, sheets_service))
+    asyncio.create_task(hourly_stats_task(bot, registrations))
+    asyncio.create_task(
+        readiness.warm(REGISTRATIONS, lambda: warm_registrations(import_from_sheets=True))
+    )
+    asyncio.create_task(registration_sync_task())
+    asyncio.create_task(admin_sync.run())
+    asyncio.create_task(admin_notifier.run())
 
     while True:
         try:
+            # Если раньше бот работал через вебхук, polling без этого не запустится
+            await bot.delete_webhook()
             await dp.start_polling(bot)
             break
         except TelegramNetworkError as e:
@@ -101,5 +260,68 @@ async def main():
             await asyncio.sleep(30)
 
 
+def _worker_port(index: int) -> int:
+    return WEBHOOK_PORT + 1 + index
+
+
+async def worker_main(index: int) -> None:
+    """Процесс-воркер режима вебхука: обрабатывает апдейты своей доли чатов."""
+    logger.info("Starting webhook worker %s...", index)
+    await startup(METRICS_PORT + index if METRICS_PORT else 0)
+
+    # Импорт из листов делает лидер (registration_sync_task), здесь — только свой индекс
+    asyncio.create_task(
+        readiness.warm(REGISTRATIONS, lambda: warm_registrations(import_from_sheets=False))
+    )
+    # Ежечасный отчёт и очередь записи в Google Sheets — в одном процессе на все воркеры;
+    # список админов каждый процесс обновляет сам
+    leader = LeaderLease(DB_PATH, "singletons")
+    asyncio.create_task(
+        leader.run(registration_sync_task, lambda: hourly_stats_task(bot, registrations))
+    )
+    asyncio.create_task(admin_sync.run())
+    asyncio.create_task(admin_notifier.run())
+
+    runner = web.AppRunner(build_worker_app(dp, bot, WEBHOOK_PATH, WEBHOOK_SECRET))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", _worker_port(index)).start()
+    await asyncio.Event().wait()
+
+
+def _run_worker(index: int) -> None:
+    asyncio.run(worker_main(index))
+
+
+def run_webhook() -> None:
+    """Главный процесс режима вебхука: запускает воркеры и раздаёт им апдейты."""
+    logger.info("Starting bot in webhook mode with %s workers...", WEBHOOK_WORKERS)
+    ctx = multiprocessing.get_context("spawn")
+    workers = [
+        ctx.Process(target=_run_worker, args=(i,), daemon=True) for i in range(WEBHOOK_WORKERS)
+    ]
+    for process in workers:
+        process.start()
+
+    urls = [f"http://127.0.0.1:{_worker_port(i)}{WEBHOOK_PATH}" for i in range(WEBHOOK_WORKERS)]
+    app = build_router_app(urls, WEBHOOK_PATH, WEBHOOK_SECRET)
+
+    async def on_startup(_: web.Application) -> None:
+        await bot.set_webhook(f"{WEBHOOK_URL}{WEBHOOK_PATH}", secret_token=WEBHOOK_SECRET or None)
+
+    async def on_shutdown(_: web.Application) -> None:
+        await bot.session.close()
+
+    app.on_startup.append(on_startup)
+    app.on_shutdown.append(on_shutdown)
+    try:
+        web.run_app(app, host=WEBHOOK_HOST, port=WEBHOOK_PORT)
+    finally:
+        for process in workers:
+            process.terminate()
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    if WEBHOOK_URL:
+        run_webhook()
+    else:
+        asyncio.run(main())
@@ -1,24 +1,42 @@
+from datetime import datetime, timedelta
+from typing import Union
+
 from aiogram import Router, types, F
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 from utils.states import AdminStates
-from services.sheets import GoogleSheetsService
-from services.admins import get_admin_ids
+from services.async_sheets import AsyncSheetsService, SheetsUnavailable
+from services.registration_queue import RegistrationQueue
+from services.store import RegistrationStore
+from services.broadcaster import Broadcaster, DeleteResult
+from services.broadcast_jobs import (
+    BroadcastJob,
+    BroadcastJobManager,
+    ProgressMessage,
+    JOB_CANCEL_PREFIX,
+)
+from services.ledger import BroadcastLedger
+from services import admins
+from services.admin_sync import AdminSync
+from services.readiness import ADMINS, REGISTRATIONS, Readiness
 
 router = Router()
-sheets_service = GoogleSheetsService()
 
-broadcast_messages = {}
+# Источник аудиторий и статистики: локальная база или сами листы (см. READ_MODEL)
+Registrations = Union[RegistrationStore, AsyncSheetsService]
 
 
-def is_admin(message: types.Message) -> bool:
-    return message.from_user.id in get_admin_ids()
+async def is_admin(message: types.Message, readiness: Readiness) -> bool:
+    # Сразу после старта список админов может ещё загружаться
+    await readiness.wait(ADMINS)
+    return admins.is_admin(message.from_user.id)
 
 
-def is_admin_callback(callback: types.CallbackQuery) -> bool:
-    return callback.from_user.id in get_admin_ids()
+async def is_admin_callback(callback: types.CallbackQuery, readiness: Readiness) -> bool:
+    await readiness.wait(ADMINS)
+    return admins.is_admin(callback.from_user.id)
 
 
 # Аудитории рассылки (callback_data — короткие из-за лимита 64 байта)
@@ -27,50 +45,80 @@ AUDIENCE_ACCELERATOR = "Зарегистрированные на Акселер
 AUDIENCE_EVENTS = "Зарегистрированные на Мероприятия"
 
 
-def audience_kb():
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text=AUDIENCE_ALL, callback_data="aud:all")],
-        [InlineKeyboardButton(text=AUDIENCE_ACCELERATOR, callback_data="aud:acc")],
-        [InlineKeyboardButton(text=AUDIENCE_EVENTS, callback_data="aud:ev")],
-        [InlineKeyboardButton(text="Отменить рассылку", callback_data="aud:can")],
-    ])
-
+AUDIENCE_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text=AUDIENCE_ALL, callback_data="aud:all")],
+    [InlineKeyboardButton(text=AUDIENCE_ACCELERATOR, callback_data="aud:acc")],
+    [InlineKeyboardButton(text=AUDIENCE_EVENTS, callback_data="aud:ev")],
+    [InlineKeyboardButton(text="Отменить рассылку", callback_data="aud:can")],
+])
 
-def broadcast_cancel_kb():
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="Отменить рассылку", callback_data="bc:can")],
-    ])
+BROADCAST_CANCEL_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="Отменить рассылку", callback_data="bc:can")],
+])
 
 
 @router.message(Command("stats"), is_admin)
-async def cmd_stats(message: types.Message):
-    """Проверка рассылки статистики: сразу присылает отчёт за последний час."""
+async def cmd_stats(
+    message: types.Message,
+    registrations: Registrations,
+    sheets: AsyncSheetsService,
+    registration_queue: RegistrationQueue,
+    readiness: Readiness,
+):
+    """Статистика регистраций за последний час, сегодня и последние 7 дней."""
+    await readiness.wait(REGISTRATIONS)
+    now = datetime.now()
+    windows = {
+        "За последний час": now - timedelta(hours=1),
+        "Сегодня": now.replace(hour=0, minute=0, second=0, microsecond=0),
+        "За 7 дней": now - timedelta(days=7),
+    }
     try:
-        stats = sheets_service.get_registrations_count_last_hour()
-        total = stats["events"] + stats["accelerator"]
-        text = (
-            "📊 Статистика за последний час\n\n"
-            f"Мероприятия: {stats['events']}\n"
-            f"Акселератор: {stats['accelerator']}\n"
-            f"Всего: {total}"
-        )
+        counts = await registrations.count_windows(windows)
+        blocks = []
+        for title, stats in counts.items():
+            total = stats["events"] + stats["accelerator"]
+            blocks.append(
+                f"{title}\n"
+                f"Мероприятия: {stats['events']}\n"
+                f"Акселератор: {stats['accelerator']}\n"
+                f"Всего: {total}"
+            )
+        text = "📊 Статистика регистраций\n\n" + "\n\n".join(blocks)
+        if sheets.breaker.is_open:
+            text += (
+                "\n\n⚠️ Google Sheets недоступна, регистрации сохраняются локально "
+                f"(в очереди: {registration_queue.pending_count()})"
+            )
         await message.answer(text)
     except Exception as e:
         await message.answer(f"Ошибка: {e}")
 
 
+@router.message(Command("reload_admins"), is_admin)
+async def cmd_reload_admins(message: types.Message, admin_sync: AdminSync):
+    """Перечитывает лист «Админы», не дожидаясь периодической проверки."""
+    try:
+        await admin_sync.refresh()
+    except SheetsUnavailable as e:
+        await message.answer(f"Не удалось обновить список админов: {e}")
+        return
+    snapshot = admins.snapshot()
+    await message.answer(f"Список админов обновлён: {len(snapshot.ids)} (версия {snapshot.version}).")
+
+
 @router.message(Command("send"), is_admin)
 async def cmd_send(message: types.Message, state: FSMContext):
     await state.set_state(AdminStates.waiting_for_audience)
     await message.answer(
         "Выберите аудиторию рассылки:",
-        reply_markup=audience_kb(),
+        reply_markup=AUDIENCE_KB,
     )
 
 
 @router.callback_query(AdminStates.waiting_for_audience, F.data.startswith("aud:"))
-async def process_audience(callback: types.CallbackQuery, state: FSMContext):
-    if not is_admin_callback(callback):
+async def process_audience(callback: types.CallbackQuery, state: FSMContext, readiness: Readiness):
+    if not await is_admin_callback(callback, readiness):
         await callback.answer("Нет прав.", show_alert=True)
         await state.clear()
         return
@@ -91,18 +139,18 @@ async def process_audience(callback: types.CallbackQuery, state: FSMContext):
     await state.set_state(AdminStates.waiting_for_broadcast)
     await callback.message.answer(
         "Введите текст рассылки:",
-        reply_markup=broadcast_cancel_kb(),
+        reply_markup=BROADCAST_CANCEL_KB,
     )
 
 
 @router.message(AdminStates.waiting_for_audience)
 async def wrong_audience(message: types.Message):
-    await message.answer("Используйте кнопки выше для выбора аудитории.", reply_markup=audience_kb())
+    await message.answer("Используйте кнопки выше для выбора аудитории.", reply_markup=AUDIENCE_KB)
 
 
 @router.callback_query(AdminStates.waiting_for_broadcast, F.data == "bc:can")
-async def broadcast_cancel(callback: types.CallbackQuery, state: FSMContext):
-    if not is_admin_callback(callback):
+async def broadcast_cancel(callback: types.CallbackQuery, state: FSMContext, readiness: Readiness):
+    if not await is_admin_callback(callback, readiness):
         await callback.answer("Нет прав.", show_alert=True)
         return
     await callback.answer()
@@ -111,15 +159,28 @@ async def broadcast_cancel(callback: types.CallbackQuery, state: FSMContext):
 
 
 @router.message(AdminStates.waiting_for_broadcast)
-async def process_broadcast(message: types.Message, state: FSMContext):
-    if not is_admin(message):
+async def process_broadcast(
+    message: types.Message,
+    state: FSMContext,
+    registrations: Registrations,
+    broadcast_jobs: BroadcastJobManager,
+    broadcast_ledger: BroadcastLedger,
+    readiness: Readiness,
+):
+    if not await is_admin(message, readiness):
         await message.answer("Нет прав.")
         await state.clear()
         return
 
     data = await state.get_data()
     audience_key = data.get("audience", "all")
-    user_ids = sheets_service.get_user_ids(audience_key)
+    await readiness.wait(REGISTRATIONS)
+    try:
+        user_ids = await registrations.get_user_ids(audience_key)
+    except SheetsUnavailable as e:
+        await message.answer(f"Не удалось получить список получателей: {e}")
+        await state.clear()
+        return
 
     if not user_ids:
         await message.answer(
@@ -128,48 +189,92 @@ async def process_broadcast(message: types.Message, state: FSMContext):
         await state.clear()
         return
 
-    sent_messages = []
-    for user_id in user_ids:
-        try:
-            sent_msg = await message.bot.send_message(user_id, message.text)
-            sent_messages.append({"user_id": user_id, "message_id": sent_msg.message_id})
-        except Exception as e:
-            print(f"Error sending to {user_id}: {e}")
-
-    broadcast_messages[message.message_id] = sent_messages
-    stats = (
-        "Рассылка завершена!\n\n"
-        f"✅ Отправлено: {len(sent_messages)} сообщений\n"
-        "Чтобы удалить это сообщение у всех, удалите его и ответьте /delete."
-    )
-    sent_stat = await message.answer(stats)
-    broadcast_messages[sent_stat.message_id] = sent_messages
+    broadcast_id = broadcast_ledger.create(message.chat.id, message.message_id)
+
+    async def on_done(job: BroadcastJob) -> None:
+        result = job.result
+        title = "Рассылка остановлена." if result.cancelled else "Рассылка завершена!"
+        stats = (
+            f"{title}\n\n"
+            f"✅ Отправлено: {len(result.sent)} сообщений\n"
+            f"🚫 Недоступны (бот заблокирован, аккаунт удалён): {len(result.blocked)}\n"
+            f"⚠️ Ошибки: {len(result.failed)}\n"
+            f"⏱ Время: {result.duration:.0f} с\n"
+            "Чтобы удалить это сообщение у всех, удалите его и ответьте /delete."
+        )
+        sent_stat = await message.answer(stats)
+        broadcast_ledger.add_alias(broadcast_id, sent_stat.chat.id, sent_stat.message_id)
+
     await state.clear()
+    await broadcast_jobs.start(
+        message.bot,
+        message.chat.id,
+        user_ids,
+        message.text,
+        on_done=on_done,
+        # Доставленные пишутся в журнал по ходу рассылки — /delete переживёт перезапуск
+        on_sent=lambda batch: broadcast_ledger.add_messages(broadcast_id, batch),
+        broadcast_id=broadcast_id,
+    )
+
+
+@router.callback_query(F.data.startswith(JOB_CANCEL_PREFIX))
+async def broadcast_job_cancel(
+    callback: types.CallbackQuery, broadcast_jobs: BroadcastJobManager, readiness: Readiness
+):
+    if not await is_admin_callback(callback, readiness):
+        await callback.answer("Нет прав.", show_alert=True)
+        return
+    job_id = callback.data[len(JOB_CANCEL_PREFIX):]
+    if broadcast_jobs.cancel(job_id):
+        await callback.answer("Останавливаю рассылку…")
+    else:
+        await callback.answer("Рассылка уже завершена.")
 
 
 @router.message(F.text == "/delete")
-async def handle_message_deletion(message: types.Message):
-    if not is_admin(message):
+async def handle_message_deletion(
+    message: types.Message,
+    broadcast_ledger: BroadcastLedger,
+    broadcaster: Broadcaster,
+    broadcast_jobs: BroadcastJobManager,
+    readiness: Readiness,
+):
+    if not await is_admin(message, readiness):
         await message.answer("Нет прав.")
         return
     if not message.reply_to_message:
         await message.answer("Ответьте на сообщение рассылки, которое нужно удалить у всех.")
         return
-    reply_msg_id = message.reply_to_message.message_id
-    if reply_msg_id not in broadcast_messages:
+    broadcast_id = broadcast_ledger.find(message.chat.id, message.reply_to_message.message_id)
+    if broadcast_id is None:
         await message.answer("Это не сообщение рассылки.")
         return
-    sent_messages = broadcast_messages[reply_msg_id]
-    deleted_count = 0
-    error_count = 0
-    for msg in sent_messages:
-        try:
-            await message.bot.delete_message(msg["user_id"], msg["message_id"])
-            deleted_count += 1
-        except Exception as e:
-            print(f"Error deleting for {msg['user_id']}: {e}")
-            error_count += 1
-    del broadcast_messages[reply_msg_id]
-    await message.answer(
-        f"Удалено: {deleted_count}, ошибок: {error_count}",
-    )
+    job = broadcast_jobs.find(broadcast_id)
+    if job is not None:
+        # Иначе задание продолжит отправку, и новые сообщения останутся у получателей
+        await message.answer("Рассылка ещё идёт — останавливаю её перед удалением.")
+        await broadcast_jobs.stop(job)
+    sent_at = broadcast_ledger.created_at(broadcast_id)
+    if sent_at is None:
+        await message.answer("Эта рассылка уже удалена.")
+        return
+    messages = broadcast_ledger.messages(broadcast_id)
+    result = DeleteResult(pending=len(messages))
+
+    def on_progress(current: DeleteResult) -> None:
+        nonlocal result
+        result = current
+
+    def render() -> str:
+        return f"Удаление: {result.total}/{len(messages)}, ошибок: {result.failed}"
+
+    sent = await message.answer(render())
+    progress = ProgressMessage(message.bot, sent.chat.id, sent.message_id, render)
+    progress.start()
+    result = await broadcaster.delete_messages(messages, sent_at, on_progress=on_progress)
+    broadcast_ledger.delete(broadcast_id)
+    text = f"Удалено: {result.deleted}, ошибок: {result.failed}"
+    if result.expired:
+        text += f"\nСтарше 48 часов, Telegram не даёт удалить: {result.expired}"
+    await progress.finish(text)
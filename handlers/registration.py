@@ -1,237 +1,95 @@
 from aiogram import Router, F, types
-from aiogram.filters import Command
+from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardRemove
 from datetime import datetime
-
-from utils.states import ChoosingEvent, AcceleratorStates, EventStates
-from utils.validators import validate_email, validate_telegram_contact, validate_url
-from services.sheets import GoogleSheetsService
+from typing import Optional
+
+from utils.states import ChoosingEvent
+from utils.forms import (
+    ACCELERATOR_FORM,
+    EVENTS_FORM,
+    STEPS,
+    PREV_STATE,
+    CONFIRMATIONS,
+    EDIT_FIELDS,
+    Field,
+    Form,
+    with_back,
+)
+from services.admin_notifier import AdminNotifier
+from services.readiness import REGISTRATIONS, Readiness
+from services.registration_queue import RegistrationQueue
+from services.store import RegistrationStore
 from config import (
     EVENTS,
-    ACCELERATOR_STAGES,
-    PIZZAPITCH_CHOICES,
-    PERSONAL_DATA_POLICY_URL,
     SUPPORT_USERNAME,
     TEST_BOT_LINK,
 )
-from services.admins import get_admin_ids
 
+# Обе анкеты описаны в utils/forms.py; здесь — один набор обработчиков для любых шагов.
 router = Router()
-sheets_service = GoogleSheetsService()
-
-BACK_BTN = InlineKeyboardButton(text="◀️ Назад", callback_data="nav:back")
-
-
-# --- Инлайн-клавиатуры ---
-def back_kb():
-    return InlineKeyboardMarkup(inline_keyboard=[[BACK_BTN]])
-
-
-def with_back(kb: InlineKeyboardMarkup) -> InlineKeyboardMarkup:
-    rows = [list(row) for row in kb.inline_keyboard]
-    rows.append([BACK_BTN])
-    return InlineKeyboardMarkup(inline_keyboard=rows)
-
-
-def event_choice_kb():
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text=EVENTS["events"], callback_data="ev:evs")],
-        [InlineKeyboardButton(text=EVENTS["accelerator"], callback_data="ev:acc")],
-        [InlineKeyboardButton(text="📝 Пройти тест", url=TEST_BOT_LINK)] if TEST_BOT_LINK else [InlineKeyboardButton(text="📝 Пройти тест (настройте TEST_BOT_LINK)", callback_data="test:placeholder")],
-    ])
-
-
-def yes_no_kb():
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [
-            InlineKeyboardButton(text="Да", callback_data="yn:y"),
-            InlineKeyboardButton(text="Нет", callback_data="yn:n"),
-        ],
-    ])
-
-
-def consent_kb():
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="Да, я ознакомился", callback_data="consent")],
-    ])
-
-
-def confirm_kb():
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [
-            InlineKeyboardButton(text="✅ Да", callback_data="conf:y"),
-            InlineKeyboardButton(text="✏️ Изменить", callback_data="conf:e"),
-        ],
-    ])
-
-
-def stage_kb():
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text=v, callback_data=f"st:{k}")] for k, v in ACCELERATOR_STAGES.items()
-    ])
-
-
-def pizzapitch_kb():
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text=v, callback_data=f"pz:{k}")] for k, v in PIZZAPITCH_CHOICES.items()
-    ])
-
-
-# --- Меню «что изменить» для акселератора ---
-def acc_edit_menu_kb():
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="ФИО", callback_data="edit:acc:name")],
-        [InlineKeyboardButton(text="Название проекта", callback_data="edit:acc:project")],
-        [InlineKeyboardButton(text="Email", callback_data="edit:acc:email")],
-        [InlineKeyboardButton(text="Telegram", callback_data="edit:acc:tg")],
-        [InlineKeyboardButton(text="Этап", callback_data="edit:acc:stage")],
-        [InlineKeyboardButton(text="Описание", callback_data="edit:acc:description")],
-        [InlineKeyboardButton(text="Выступление на мероприятиях", callback_data="edit:acc:pizzapitch")],
-        [InlineKeyboardButton(text="Ссылка на презентацию", callback_data="edit:acc:presentation")],
-        [InlineKeyboardButton(text="ФИО и Образовательная программа", callback_data="edit:acc:team")],
-        [InlineKeyboardButton(text="Ваш вуз", callback_data="edit:acc:hse")],
-        [BACK_BTN],
-    ])
-
-
-# --- Меню «что изменить» для мероприятий ---
-def ev_edit_menu_kb():
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="ФИО", callback_data="edit:ev:name")],
-        [InlineKeyboardButton(text="Ваш вуз", callback_data="edit:ev:hse")],
-        [InlineKeyboardButton(text="Образовательная программа", callback_data="edit:ev:edu")],
-        [InlineKeyboardButton(text="Telegram", callback_data="edit:ev:tg")],
-        [InlineKeyboardButton(text="Вопрос", callback_data="edit:ev:question")],
-        [BACK_BTN],
-    ])
-
-
-# --- Тексты и клавиатуры шагов (для перехода вперёд и «Назад») ---
-ACC_INTRO = "Регистрация в Акселератор «ВоронаКреативТех».\nВведите ваши ФИО:"
-EV_INTRO = "Регистрация на мероприятия Бизнес-студии «ВоронаКреативТех».\nВведите ваши ФИО:"
-CONSENT_TEXT = (
-    "Я подтверждаю, что лично ознакомился с Положением об обработке "
-    "персональных данных НИУ ВШЭ, вправе предоставлять свои персональные "
-    "данные и давать согласие на их обработку.\n\n"
-    f"Ссылка на положение: {PERSONAL_DATA_POLICY_URL}"
-)
 
 
-def acc_step_prompt(state: AcceleratorStates):
-    prompts = {
-        AcceleratorStates.waiting_for_name: (ACC_INTRO, back_kb()),
-        AcceleratorStates.waiting_for_project_name: ("Название проекта:", back_kb()),
-        AcceleratorStates.waiting_for_email: ("Электронная почта:", back_kb()),
-        AcceleratorStates.waiting_for_tg: (
-            "Ваш Telegram-аккаунт (@username или номер телефона):",
-            back_kb(),
-        ),
-        AcceleratorStates.waiting_for_stage: (
-            "Этап реализации проекта:",
-            with_back(stage_kb()),
-        ),
-        AcceleratorStates.waiting_for_description: ("Краткое описание проекта:", back_kb()),
-        AcceleratorStates.waiting_for_pizzapitch: (
-            "Хотите ли выступить на мероприятиях Бизнес-студии?",
-            with_back(pizzapitch_kb()),
-        ),
-        AcceleratorStates.waiting_for_presentation_url: (
-            "Пришлите ссылку на презентацию вашего продукта/проекта. Если её нет — поставьте «-»:",
-            back_kb(),
-        ),
-        AcceleratorStates.waiting_for_team: ("ФИО и Образовательная программа:", back_kb()),
-        AcceleratorStates.waiting_for_hse: ("Ваш вуз:", with_back(yes_no_kb())),
-        AcceleratorStates.waiting_for_consent: (CONSENT_TEXT, with_back(consent_kb())),
-    }
-    return prompts[state]
-
-
-def ev_step_prompt(state: EventStates):
-    prompts = {
-        EventStates.waiting_for_name: (EV_INTRO, back_kb()),
-        EventStates.waiting_for_hse: (
-            "Ваш вуз (важно для заказа пропуска для гостей не из ВШЭ):",
-            with_back(yes_no_kb()),
-        ),
-        EventStates.waiting_for_edu_program: (
-            "Ваша образовательная программа (для выпускников — программа по диплому):",
-            back_kb(),
-        ),
-        EventStates.waiting_for_tg: (
-            "Ваш Telegram-аккаунт (@username или номер телефона):",
-            back_kb(),
-        ),
-        EventStates.waiting_for_question: (
-            "Ваш вопрос спикерам или организаторам (можно пропустить — отправьте «-»):",
-            back_kb(),
-        ),
-        EventStates.waiting_for_consent: (CONSENT_TEXT, with_back(consent_kb())),
-    }
-    return prompts[state]
-
-
-# --- Маппинг предыдущих состояний (для кнопки «Назад») ---
-ACC_PREV_STATE = {
-    AcceleratorStates.waiting_for_name: ChoosingEvent.waiting_for_event,
-    AcceleratorStates.waiting_for_project_name: AcceleratorStates.waiting_for_name,
-    AcceleratorStates.waiting_for_email: AcceleratorStates.waiting_for_project_name,
-    AcceleratorStates.waiting_for_tg: AcceleratorStates.waiting_for_email,
-    AcceleratorStates.waiting_for_stage: AcceleratorStates.waiting_for_tg,
-    AcceleratorStates.waiting_for_description: AcceleratorStates.waiting_for_stage,
-    AcceleratorStates.waiting_for_pizzapitch: AcceleratorStates.waiting_for_description,
-    AcceleratorStates.waiting_for_presentation_url: AcceleratorStates.waiting_for_pizzapitch,
-    AcceleratorStates.waiting_for_team: AcceleratorStates.waiting_for_presentation_url,
-    AcceleratorStates.waiting_for_hse: AcceleratorStates.waiting_for_team,
-    AcceleratorStates.waiting_for_consent: AcceleratorStates.waiting_for_hse,
-    AcceleratorStates.waiting_for_confirmation: AcceleratorStates.waiting_for_consent,
-}
-
-EV_PREV_STATE = {
-    EventStates.waiting_for_name: ChoosingEvent.waiting_for_event,
-    EventStates.waiting_for_hse: EventStates.waiting_for_name,
-    EventStates.waiting_for_edu_program: EventStates.waiting_for_hse,
-    EventStates.waiting_for_tg: EventStates.waiting_for_edu_program,
-    EventStates.waiting_for_question: EventStates.waiting_for_tg,
-    EventStates.waiting_for_consent: EventStates.waiting_for_question,
-    EventStates.waiting_for_confirmation: EventStates.waiting_for_consent,
-}
+# --- Инлайн-клавиатуры (строятся один раз при импорте) ---
+EVENT_CHOICE_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text=EVENTS["events"], callback_data="ev:evs")],
+    [InlineKeyboardButton(text=EVENTS["accelerator"], callback_data="ev:acc")],
+    [InlineKeyboardButton(text="📝 Пройти тест", url=TEST_BOT_LINK)] if TEST_BOT_LINK else [InlineKeyboardButton(text="📝 Пройти тест (настройте TEST_BOT_LINK)", callback_data="test:placeholder")],
+])
+
+CONFIRM_KB = with_back(InlineKeyboardMarkup(inline_keyboard=[
+    [
+        InlineKeyboardButton(text="✅ Да", callback_data="conf:y"),
+        InlineKeyboardButton(text="✏️ Изменить", callback_data="conf:e"),
+    ],
+]))
+
+CHOOSE_EVENT_TEXT = "Выберите, на какое мероприятие хотите зарегистрироваться:"
+FORM_BY_CHOICE = {"ev:acc": ACCELERATOR_FORM, "ev:evs": EVENTS_FORM}
+
+# Состояния шагов по типу ответа — для фильтров обработчиков
+TEXT_STATES = [field.state for _, field in STEPS.values() if field.choices is None]
+CHOICE_STATES = [field.state for _, field in STEPS.values() if field.choices is not None]
+CHOICE_CALLBACKS = frozenset(data for _, field in STEPS.values() for data in field.choices or ())
+CONFIRMATION_STATES = [form.confirmation_state for form in CONFIRMATIONS.values()]
+
+
+async def _ask(message: types.Message, state: FSMContext, field: Field):
+    await state.set_state(field.state)
+    await message.answer(field.prompt, reply_markup=field.markup)
+
+
+async def _next_step(message: types.Message, state: FSMContext, form: Form, field: Field):
+    """Следующий вопрос анкеты, а после последнего — сводка и подтверждение."""
+    step = form.next[field.state.state]
+    if step is not None:
+        await _ask(message, state, step)
+        return
+    data = await state.get_data()
+    await state.set_state(form.confirmation_state)
+    await message.answer(form.summary(data), reply_markup=CONFIRM_KB)
 
 
 async def _show_event_choice(callback: types.CallbackQuery, state: FSMContext):
     await state.set_state(ChoosingEvent.waiting_for_event)
     await callback.message.answer(
-        "Выберите, на какое мероприятие хотите зарегистрироваться:",
-        reply_markup=event_choice_kb(),
+        CHOOSE_EVENT_TEXT,
+        reply_markup=EVENT_CHOICE_KB,
     )
 
 
 @router.callback_query(F.data == "nav:back")
-async def nav_back(callback: types.CallbackQuery, state: FSMContext):
+async def nav_back(callback: types.CallbackQuery, state: FSMContext, raw_state: Optional[str]):
     await callback.answer()
-    current = await state.get_state()
-
-    for step_state, prev_state in ACC_PREV_STATE.items():
-        if current != step_state.state:
-            continue
-        if prev_state is ChoosingEvent.waiting_for_event:
-            await _show_event_choice(callback, state)
-            return
-        await state.set_state(prev_state)
-        text, markup = acc_step_prompt(prev_state)
-        await callback.message.answer(text, reply_markup=markup)
+    prev_state = PREV_STATE.get(raw_state)
+    if prev_state is None:
         return
-
-    for step_state, prev_state in EV_PREV_STATE.items():
-        if current != step_state.state:
-            continue
-        if prev_state is ChoosingEvent.waiting_for_event:
-            await _show_event_choice(callback, state)
-            return
-        await state.set_state(prev_state)
-        text, markup = ev_step_prompt(prev_state)
-        await callback.message.answer(text, reply_markup=markup)
+    if prev_state is ChoosingEvent.waiting_for_event:
+        await _show_event_choice(callback, state)
         return
+    _, field = STEPS[prev_state.state]
+    await _ask(callback.message, state, field)
 
 
 # --- /start и выбор мероприятия ---
@@ -239,7 +97,15 @@ WELCOME_TEXT = (
     "Добро пожаловать!\n\n"
     "Ниже небольшая анкета, после заполнения которой (1 мин.), вы будете зарегистрированы "
     "на наши мероприятия и получите доступ к нашим материалам.\n"
-    "Контакт для связи и поддержки {support}"
+    f"Контакт для связи и поддержки {SUPPORT_USERNAME}"
+)
+REMOVE_KB = ReplyKeyboardRemove()
+ALREADY_REGISTERED_TEXT = (
+    "Вы уже зарегистрированы. Если заполните анкету заново, мы обновим ваши данные."
+)
+UPDATED_TEXT = (
+    "Данные регистрации обновлены. ✅\n\n"
+    "Если хотите зарегистрироваться на второе мероприятие, нажмите /start"
 )
 
 
@@ -247,30 +113,29 @@ WELCOME_TEXT = (
 async def cmd_start(message: types.Message, state: FSMContext):
     await state.clear()
     await message.answer(
-        WELCOME_TEXT.format(support=SUPPORT_USERNAME),
-        reply_markup=ReplyKeyboardRemove(),
+        WELCOME_TEXT,
+        reply_markup=REMOVE_KB,
     )
     await message.answer(
-        "Выберите, на какое мероприятие хотите зарегистрироваться:",
-        reply_markup=event_choice_kb(),
+        CHOOSE_EVENT_TEXT,
+        reply_markup=EVENT_CHOICE_KB,
     )
     await state.set_state(ChoosingEvent.waiting_for_event)
 
 
 @router.callback_query(ChoosingEvent.waiting_for_event, F.data.in_(["ev:acc", "ev:evs", "test:placeholder"]))
-async def process_event_choice(callback: types.CallbackQuery, state: FSMContext):
+async def process_event_choice(
+    callback: types.CallbackQuery, state: FSMContext, registration_store: RegistrationStore
+):
     await callback.answer()
-    if callback.data == "ev:acc":
-        await state.update_data(event_type="accelerator")
-        await state.set_state(AcceleratorStates.waiting_for_name)
-        text, markup = acc_step_prompt(AcceleratorStates.waiting_for_name)
-        await callback.message.answer(text, reply_markup=markup)
-    elif callback.data == "ev:evs":
-        await state.update_data(event_type="events")
-        await state.set_state(EventStates.waiting_for_name)
-        text, markup = ev_step_prompt(EventStates.waiting_for_name)
-        await callback.message.answer(text, reply_markup=markup)
+    form = FORM_BY_CHOICE.get(callback.data)
     # test:placeholder — заглушка, просто игнорируем
+    if form is None:
+        return
+    await state.update_data(event_type=form.event_type)
+    if registration_store.registered_at(form.event_type, callback.from_user.id) is not None:
+        await callback.message.answer(ALREADY_REGISTERED_TEXT)
+    await _ask(callback.message, state, form.steps[0])
 
 
 @router.message(ChoosingEvent.waiting_for_event)
@@ -279,169 +144,59 @@ async def wrong_event_choice(message: types.Message, state: FSMContext):
     await message.answer("Чтобы начать регистрацию, нажмите /start")
 
 
-# ========== АКСЕЛЕРАТОР ==========
-@router.message(AcceleratorStates.waiting_for_name, F.text)
-async def acc_name(message: types.Message, state: FSMContext):
-    await state.update_data(full_name=message.text.strip())
-    await state.set_state(AcceleratorStates.waiting_for_project_name)
-    text, markup = acc_step_prompt(AcceleratorStates.waiting_for_project_name)
-    await message.answer(text, reply_markup=markup)
-
-
-@router.message(AcceleratorStates.waiting_for_project_name, F.text)
-async def acc_project(message: types.Message, state: FSMContext):
-    await state.update_data(project_name=message.text.strip())
-    await state.set_state(AcceleratorStates.waiting_for_email)
-    text, markup = acc_step_prompt(AcceleratorStates.waiting_for_email)
-    await message.answer(text, reply_markup=markup)
-
-
-@router.message(AcceleratorStates.waiting_for_email, F.text)
-async def acc_email(message: types.Message, state: FSMContext):
-    if not validate_email(message.text):
-        text, markup = acc_step_prompt(AcceleratorStates.waiting_for_email)
-        await message.answer("Некорректный email. Введите снова:", reply_markup=markup)
-        return
-    await state.update_data(email=message.text.strip())
-    await state.set_state(AcceleratorStates.waiting_for_tg)
-    text, markup = acc_step_prompt(AcceleratorStates.waiting_for_tg)
-    await message.answer(text, reply_markup=markup)
-
-
-@router.message(AcceleratorStates.waiting_for_tg, F.text)
-async def acc_tg(message: types.Message, state: FSMContext):
-    if not validate_telegram_contact(message.text):
-        text, markup = acc_step_prompt(AcceleratorStates.waiting_for_tg)
-        await message.answer("Введите @username или номер телефона:", reply_markup=markup)
+# ========== ШАГИ АНКЕТ ==========
+@router.message(StateFilter(*TEXT_STATES), F.text)
+async def form_text_answer(message: types.Message, state: FSMContext, raw_state: str):
+    form, field = STEPS[raw_state]
+    value = message.text.strip()
+    if field.validate is not None and not field.validate(value):
+        await message.answer(field.error, reply_markup=field.markup)
         return
-    await state.update_data(contact=message.text.strip())
-    await state.set_state(AcceleratorStates.waiting_for_stage)
-    text, markup = acc_step_prompt(AcceleratorStates.waiting_for_stage)
-    await message.answer(text, reply_markup=markup)
+    await state.update_data({field.key: value})
+    await _next_step(message, state, form, field)
 
 
-@router.callback_query(AcceleratorStates.waiting_for_stage, F.data.startswith("st:"))
-async def acc_stage(callback: types.CallbackQuery, state: FSMContext):
+@router.callback_query(StateFilter(*CHOICE_STATES), F.data.in_(CHOICE_CALLBACKS))
+async def form_choice_answer(callback: types.CallbackQuery, state: FSMContext, raw_state: str):
     await callback.answer()
-    key = callback.data.split(":", 1)[1]
-    if key not in ACCELERATOR_STAGES:
+    form, field = STEPS[raw_state]
+    if callback.data not in field.choices:
         return
-    await state.update_data(stage=ACCELERATOR_STAGES[key])
-    await state.set_state(AcceleratorStates.waiting_for_description)
-    text, markup = acc_step_prompt(AcceleratorStates.waiting_for_description)
-    await callback.message.answer(text, reply_markup=markup)
-
-
-@router.message(AcceleratorStates.waiting_for_stage)
-async def acc_stage_wrong(message: types.Message):
-    text, markup = acc_step_prompt(AcceleratorStates.waiting_for_stage)
-    await message.answer("Выберите этап кнопкой ниже.", reply_markup=markup)
-
-
-@router.message(AcceleratorStates.waiting_for_description, F.text)
-async def acc_description(message: types.Message, state: FSMContext):
-    await state.update_data(description=message.text.strip())
-    await state.set_state(AcceleratorStates.waiting_for_pizzapitch)
-    text, markup = acc_step_prompt(AcceleratorStates.waiting_for_pizzapitch)
-    await message.answer(text, reply_markup=markup)
-
-
-@router.callback_query(AcceleratorStates.waiting_for_pizzapitch, F.data.startswith("pz:"))
-async def acc_pizzapitch(callback: types.CallbackQuery, state: FSMContext):
-    await callback.answer()
-    key = callback.data.split(":", 1)[1]
-    if key not in PIZZAPITCH_CHOICES:
-        return
-    await state.update_data(pizzapitch=PIZZAPITCH_CHOICES[key])
-    await state.set_state(AcceleratorStates.waiting_for_presentation_url)
-    text, markup = acc_step_prompt(AcceleratorStates.waiting_for_presentation_url)
-    await callback.message.answer(text, reply_markup=markup)
-
-
-@router.message(AcceleratorStates.waiting_for_pizzapitch)
-async def acc_pizzapitch_wrong(message: types.Message):
-    text, markup = acc_step_prompt(AcceleratorStates.waiting_for_pizzapitch)
-    await message.answer("Выберите вариант кнопкой ниже.", reply_markup=markup)
-
-
-@router.message(AcceleratorStates.waiting_for_presentation_url, F.text)
-async def acc_presentation(message: types.Message, state: FSMContext):
-    text = message.text.strip()
-    if text != "-" and not validate_url(text):
-        text_p, markup = acc_step_prompt(AcceleratorStates.waiting_for_presentation_url)
-        await message.answer("Введите корректную ссылку (http:// или https://) или «-»:",
-                             reply_markup=markup)
-        return
-    await state.update_data(presentation_url=text)
-    await state.set_state(AcceleratorStates.waiting_for_team)
-    text_p, markup = acc_step_prompt(AcceleratorStates.waiting_for_team)
-    await message.answer(text_p, reply_markup=markup)
-
-
-@router.message(AcceleratorStates.waiting_for_team, F.text)
-async def acc_team(message: types.Message, state: FSMContext):
-    await state.update_data(team=message.text.strip())
-    await state.set_state(AcceleratorStates.waiting_for_hse)
-    text, markup = acc_step_prompt(AcceleratorStates.waiting_for_hse)
-    await message.answer(text, reply_markup=markup)
-
-
-@router.callback_query(AcceleratorStates.waiting_for_hse, F.data.in_(["yn:y", "yn:n"]))
-async def acc_hse(callback: types.CallbackQuery, state: FSMContext):
-    await callback.answer()
-    await state.update_data(hse="Да" if callback.data == "yn:y" else "Нет")
-    await state.set_state(AcceleratorStates.waiting_for_consent)
-    text, markup = acc_step_prompt(AcceleratorStates.waiting_for_consent)
-    await callback.message.answer(text, reply_markup=markup)
-
-
-@router.message(AcceleratorStates.waiting_for_hse)
-async def acc_hse_wrong(message: types.Message):
-    text, markup = acc_step_prompt(AcceleratorStates.waiting_for_hse)
-    await message.answer("Выберите «Да» или «Нет» кнопкой ниже.", reply_markup=markup)
-
-
-@router.callback_query(AcceleratorStates.waiting_for_consent, F.data == "consent")
-async def acc_consent(callback: types.CallbackQuery, state: FSMContext):
-    await callback.answer()
-    data = await state.get_data()
-    summary = (
-        "Проверьте данные:\n\n"
-        f"ФИО: {data['full_name']}\n"
-        f"Название проекта: {data['project_name']}\n"
-        f"Email: {data['email']}\n"
-        f"Тг: {data['contact']}\n"
-        f"Этап: {data['stage']}\n"
-        f"Описание: {data['description'][:100]}{'…' if len(data['description']) > 100 else ''}\n"
-        f"Выступление на мероприятиях: {data['pizzapitch']}\n"
-        f"Ссылка на презентацию: {data['presentation_url']}\n"
-        f"ФИО и Образовательная программа: {data['team'][:80]}{'…' if len(data['team']) > 80 else ''}\n"
-        f"Ваш вуз: {data['hse']}\n\n"
-        "Всё верно?"
-    )
-    await state.set_state(AcceleratorStates.waiting_for_confirmation)
-    await callback.message.answer(summary, reply_markup=with_back(confirm_kb()))
-
-
-@router.message(AcceleratorStates.waiting_for_consent)
-async def acc_consent_wrong(message: types.Message):
-    text, markup = acc_step_prompt(AcceleratorStates.waiting_for_consent)
-    await message.answer("Нажмите «Да, я ознакомился» под сообщением выше.", reply_markup=markup)
-
-
-@router.callback_query(AcceleratorStates.waiting_for_confirmation, F.data == "conf:y")
-async def acc_confirm_yes(callback: types.CallbackQuery, state: FSMContext):
+    if field.key is not None:
+        await state.update_data({field.key: field.choices[callback.data]})
+    await _next_step(callback.message, state, form, field)
+
+
+@router.message(StateFilter(*CHOICE_STATES))
+async def form_choice_wrong(message: types.Message, raw_state: str):
+    _, field = STEPS[raw_state]
+    await message.answer(field.error, reply_markup=field.markup)
+
+
+# ========== ПОДТВЕРЖДЕНИЕ И ИЗМЕНЕНИЕ ==========
+@router.callback_query(StateFilter(*CONFIRMATION_STATES), F.data == "conf:y")
+async def form_confirm_yes(
+    callback: types.CallbackQuery,
+    state: FSMContext,
+    raw_state: str,
+    registration_store: RegistrationStore,
+    registration_queue: RegistrationQueue,
+    admin_notifier: AdminNotifier,
+    readiness: Readiness,
+):
     await callback.answer()
+    form = CONFIRMATIONS[raw_state]
     data = await state.get_data()
+    # Повтор определяется по локальной базе — при первом запуске ждём импорта из листов
+    await readiness.wait(REGISTRATIONS)
     data["user_id"] = callback.from_user.id
-    data["registration_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    event_name = EVENTS["accelerator"]
-    if sheets_service.save_registration("accelerator", data):
-        await callback.message.answer(
-            f"Регистрация на {event_name} завершена. 🎉\n\n"
-            "Если хотите зарегистрироваться ещё раз или на второе мероприятие, нажмите /start",
-        )
-        await _notify_admins(callback.bot, "Акселератор", data)
+    registered_at = registration_store.registered_at(form.event_type, callback.from_user.id)
+    update = registered_at is not None
+    data["registration_date"] = registered_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    if _save_registration(form.event_type, data, registration_store, registration_queue, update):
+        await callback.message.answer(UPDATED_TEXT if update else form.success_text)
+        label = f"{form.title}, обновление анкеты" if update else form.title
+        admin_notifier.notify(label, data)
     else:
         await callback.message.answer(
             "Ошибка при сохранении. Попробуйте позже или нажмите /start.",
@@ -449,183 +204,42 @@ async def acc_confirm_yes(callback: types.CallbackQuery, state: FSMContext):
     await state.clear()
 
 
-@router.callback_query(AcceleratorStates.waiting_for_confirmation, F.data == "conf:e")
-async def acc_confirm_edit(callback: types.CallbackQuery, state: FSMContext):
+@router.callback_query(StateFilter(*CONFIRMATION_STATES), F.data == "conf:e")
+async def form_confirm_edit(callback: types.CallbackQuery, raw_state: str):
     await callback.answer()
     await callback.message.answer(
         "Выберите, что именно хотите изменить:",
-        reply_markup=acc_edit_menu_kb(),
+        reply_markup=CONFIRMATIONS[raw_state].edit_menu,
     )
 
 
-@router.callback_query(F.data.startswith("edit:acc:"))
-async def acc_edit_field(callback: types.CallbackQuery, state: FSMContext):
-    await callback.answer()
-    field = callback.data.split(":", 2)[2]
-    field_map = {
-        "name": AcceleratorStates.waiting_for_name,
-        "project": AcceleratorStates.waiting_for_project_name,
-        "email": AcceleratorStates.waiting_for_email,
-        "tg": AcceleratorStates.waiting_for_tg,
-        "stage": AcceleratorStates.waiting_for_stage,
-        "description": AcceleratorStates.waiting_for_description,
-        "pizzapitch": AcceleratorStates.waiting_for_pizzapitch,
-        "presentation": AcceleratorStates.waiting_for_presentation_url,
-        "team": AcceleratorStates.waiting_for_team,
-        "hse": AcceleratorStates.waiting_for_hse,
-    }
-    target_state = field_map.get(field)
-    if target_state:
-        await state.set_state(target_state)
-        text, markup = acc_step_prompt(target_state)
-        await callback.message.answer(text, reply_markup=markup)
-
-
-@router.message(AcceleratorStates.waiting_for_confirmation)
-async def acc_confirm_wrong(message: types.Message):
-    await message.answer(
-        "Нажмите «✅ Да» или «✏️ Изменить» под сообщением с данными.",
-        reply_markup=with_back(confirm_kb()),
-    )
-
-
-# ========== МЕРОПРИЯТИЯ ==========
-@router.message(EventStates.waiting_for_name, F.text)
-async def ev_name(message: types.Message, state: FSMContext):
-    await state.update_data(full_name=message.text.strip())
-    await state.set_state(EventStates.waiting_for_hse)
-    text, markup = ev_step_prompt(EventStates.waiting_for_hse)
-    await message.answer(text, reply_markup=markup)
-
-
-@router.callback_query(EventStates.waiting_for_hse, F.data.in_(["yn:y", "yn:n"]))
-async def ev_hse(callback: types.CallbackQuery, state: FSMContext):
+@router.callback_query(F.data.in_(frozenset(EDIT_FIELDS)))
+async def form_edit_field(callback: types.CallbackQuery, state: FSMContext):
     await callback.answer()
-    await state.update_data(hse="Да" if callback.data == "yn:y" else "Нет")
-    await state.set_state(EventStates.waiting_for_edu_program)
-    text, markup = ev_step_prompt(EventStates.waiting_for_edu_program)
-    await callback.message.answer(text, reply_markup=markup)
+    _, field = EDIT_FIELDS[callback.data]
+    await _ask(callback.message, state, field)
 
 
-@router.message(EventStates.waiting_for_hse)
-async def ev_hse_wrong(message: types.Message):
-    text, markup = ev_step_prompt(EventStates.waiting_for_hse)
-    await message.answer("Выберите «Да» или «Нет» кнопкой ниже.", reply_markup=markup)
-
-
-@router.message(EventStates.waiting_for_edu_program, F.text)
-async def ev_edu(message: types.Message, state: FSMContext):
-    await state.update_data(edu_program=message.text.strip())
-    await state.set_state(EventStates.waiting_for_tg)
-    text, markup = ev_step_prompt(EventStates.waiting_for_tg)
-    await message.answer(text, reply_markup=markup)
-
-
-@router.message(EventStates.waiting_for_tg, F.text)
-async def ev_tg(message: types.Message, state: FSMContext):
-    if not validate_telegram_contact(message.text):
-        text, markup = ev_step_prompt(EventStates.waiting_for_tg)
-        await message.answer("Введите @username или номер телефона:", reply_markup=markup)
-        return
-    await state.update_data(contact=message.text.strip())
-    await state.set_state(EventStates.waiting_for_question)
-    text, markup = ev_step_prompt(EventStates.waiting_for_question)
-    await message.answer(text, reply_markup=markup)
-
-
-@router.message(EventStates.waiting_for_question, F.text)
-async def ev_question(message: types.Message, state: FSMContext):
-    text = message.text.strip()
-    await state.update_data(question="-" if text == "-" else text)
-    await state.set_state(EventStates.waiting_for_consent)
-    text, markup = ev_step_prompt(EventStates.waiting_for_consent)
-    await message.answer(text, reply_markup=markup)
-
-
-@router.callback_query(EventStates.waiting_for_consent, F.data == "consent")
-async def ev_consent(callback: types.CallbackQuery, state: FSMContext):
-    await callback.answer()
-    data = await state.get_data()
-    summary = (
-        "Проверьте данные:\n\n"
-        f"ФИО: {data['full_name']}\n"
-        f"Ваш вуз: {data['hse']}\n"
-        f"Образовательная программа: {data.get('edu_program', '')}\n"
-        f"Тг: {data['contact']}\n"
-        f"Вопрос: {data.get('question', '-')}\n\n"
-        "Всё верно?"
-    )
-    await state.set_state(EventStates.waiting_for_confirmation)
-    await callback.message.answer(summary, reply_markup=with_back(confirm_kb()))
-
-
-@router.message(EventStates.waiting_for_consent)
-async def ev_consent_wrong(message: types.Message):
-    text, markup = ev_step_prompt(EventStates.waiting_for_consent)
-    await message.answer("Нажмите «Да, я ознакомился» под сообщением выше.", reply_markup=markup)
-
-
-@router.callback_query(EventStates.waiting_for_confirmation, F.data == "conf:y")
-async def ev_confirm_yes(callback: types.CallbackQuery, state: FSMContext):
-    await callback.answer()
-    data = await state.get_data()
-    data["user_id"] = callback.from_user.id
-    data["registration_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    event_name = EVENTS["events"]
-    if sheets_service.save_registration("events", data):
-        await callback.message.answer(
-            f"Регистрация на мероприятия Бизнес-студии «ВоронаКреативТех» завершена. 🎉\n\n"
-            "До скорой встречи! И подписывайтесь на наш канал @HSEVorona, "
-            "чтобы общаться и быть в курсе новостей!\n\n"
-            "Если хотите зарегистрироваться ещё раз или на второе мероприятие, нажмите /start",
-        )
-        await _notify_admins(callback.bot, "Мероприятия", data)
-    else:
-        await callback.message.answer(
-            "Ошибка при сохранении. Попробуйте позже или нажмите /start.",
-        )
-    await state.clear()
-
-
-@router.callback_query(EventStates.waiting_for_confirmation, F.data == "conf:e")
-async def ev_confirm_edit(callback: types.CallbackQuery, state: FSMContext):
-    await callback.answer()
-    await callback.message.answer(
-        "Выберите, что именно хотите изменить:",
-        reply_markup=ev_edit_menu_kb(),
-    )
-
-
-@router.callback_query(F.data.startswith("edit:ev:"))
-async def ev_edit_field(callback: types.CallbackQuery, state: FSMContext):
-    await callback.answer()
-    field = callback.data.split(":", 2)[2]
-    field_map = {
-        "name": EventStates.waiting_for_name,
-        "hse": EventStates.waiting_for_hse,
-        "edu": EventStates.waiting_for_edu_program,
-        "tg": EventStates.waiting_for_tg,
-        "question": EventStates.waiting_for_question,
-    }
-    target_state = field_map.get(field)
-    if target_state:
-        await state.set_state(target_state)
-        text, markup = ev_step_prompt(target_state)
-        await callback.message.answer(text, reply_markup=markup)
-
-
-@router.message(EventStates.waiting_for_confirmation)
-async def ev_confirm_wrong(message: types.Message):
+@router.message(StateFilter(*CONFIRMATION_STATES))
+async def form_confirm_wrong(message: types.Message):
     await message.answer(
         "Нажмите «✅ Да» или «✏️ Изменить» под сообщением с данными.",
-        reply_markup=with_back(confirm_kb()),
+        reply_markup=CONFIRM_KB,
     )
 
 
-async def _notify_admins(bot, event_label: str, data: dict):
-    text = f"Новая регистрация ({event_label})\n\nФИО: {data.get('full_name')}\nТг: {data.get('contact')}"
-    for admin_id in get_admin_ids():
-        try:
-            await bot.send_message(admin_id, text)
-        except Exception as e:
-            print(f"Failed to notify admin {admin_id}: {e}")
\ No newline at end of file
+def _save_registration(
+    event_type: str,
+    data: dict,
+    store: RegistrationStore,
+    queue: RegistrationQueue,
+    update: bool = False,
+) -> bool:
+    """
+    Пишет анкету в локальное хранилище и ставит её в очередь на запись в Google Sheets.
+    update: пользователь уже зарегистрирован — заменить прежнюю анкету, а не добавлять новую.
+    """
+    if update:
+        return store.update(event_type, data) and queue.enqueue(event_type, data, update=True)
+    return store.add(event_type, data) and queue.enqueue(event_type, data)
+
@@ -0,0 +1,120 @@
+"""
+Уведомления админов о новых регистрациях.
+
+`notify()` не ждёт отправки: сообщения всем админам уходят в фоне и
+параллельно, через Broadcaster (общий лимит Telegram, паузы на 429,
+повторы). Пока регистраций немного, каждая приходит отдельным сообщением.
+Если за последние `interval` секунд их набралось `digest_threshold` и больше,
+уведомитель переходит в режим сводки: раз в `interval` секунд админы получают
+одно сообщение «N новых регистраций за последние M мин». Когда поток
+спадает ниже порога, уведомления снова приходят по одному.
+
+В режиме вебхука у каждого воркера свой уведомитель и своя сводка.
+"""
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from services import admins
+from services.broadcaster import Broadcaster
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних анкет перечислять в сводке
+DIGEST_NAMES = 5
+
+
+def registration_text(event_label: str, data: Dict) -> str:
+    return f"Новая регистрация ({event_label})\n\nФИО: {data.get('full_name')}\nТг: {data.get('contact')}"
+
+
+def digest_text(items: List[Tuple[str, Dict]], minutes: int) -> str:
+    lines = [f"📥 {len(items)} новых регистраций за последние {minutes} мин", ""]
+    for label, n in Counter(label for label, _ in items).most_common():
+        lines.append(f"{label}: {n}")
+    lines += ["", "Последние:"]
+    for label, data in items[-DIGEST_NAMES:]:
+        lines.append(f"• {data.get('full_name')} ({data.get('contact')}), {label}")
+    return "\n".join(lines)
+
+
+class AdminNotifier:
+    def __init__(self, broadcaster: Broadcaster, digest_threshold: int = 10, interval: float = 300.0):
+        self._broadcaster = broadcaster
+        self.digest_threshold = digest_threshold
+        self.interval = interval
+        self._recent: Deque[float] = deque()
+        self._pending: List[Tuple[str, Dict]] = []
+        # Начало текущей сводки; None — уведомления по одному
+        self._digest_since: Optional[float] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def digest_mode(self) -> bool:
+        return self._digest_since is not None
+
+    def _rate(self, now: float) -> int:
+        """Сколько регистраций было за последние `interval` секунд."""
+        while self._recent and self._recent[0] <= now - self.interval:
+            self._recent.popleft()
+        return len(self._recent)
+
+    def notify(self, event_label: str, data: Dict) -> None:
+        """Ставит уведомление о регистрации в отправку; возвращается сразу."""
+        now = time.monotonic()
+        self._recent.append(now)
+        if not self.digest_mode and self._rate(now) < self.digest_threshold:
+            self._spawn(self._send(registration_text(event_label, data)))
+            return
+        if not self.digest_mode:
+            self._digest_since = now
+            logger.info(
+                "Registration spike (%s in %.0fs), admin notifications switched to digest",
+                self._rate(now), self.interval,
+            )
+        self._pending.append((event_label, dict(data)))
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, text: str) -> None:
+        admin_ids = admins.get_admin_ids()
+        results = await asyncio.gather(
+            *(self._broadcaster.send_message(admin_id, text) for admin_id in admin_ids)
+        )
+        for admin_id, (status, _) in zip(admin_ids, results):
+            if status != "sent":
+                logger.warning("Failed to notify admin %s: %s", admin_id, status)
+
+    async def join(self) -> None:
+        """Ждёт, пока уйдут уже запущенные уведомления."""
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def flush(self) -> None:
+        """Отправляет накопленную сводку; если поток спал — возвращает уведомления по одному."""
+        if not self.digest_mode:
+            return
+        now = time.monotonic()
+        items, self._pending = self._pending, []
+        if items:
+            minutes = max(1, round((now - self._digest_since) / 60))
+            await self._send(digest_text(items, minutes))
+        if self._rate(now) < self.digest_threshold:
+            self._digest_since = None
+            logger.info("Registration rate is back to normal, admin notifications sent one by one")
+        else:
+            self._digest_since = now
+
+    async def run(self) -> None:
+        """Фоновая задача: раз в `interval` секунд отправляет сводку."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Admin digest failed")
@@ -0,0 +1,44 @@
+"""
+Синхронизация списка админов с листом «Админы».
+
+Раз в `interval` секунд бот читает только диапазон `A1:B` листа «Админы»
+(один маленький запрос) и сравнивает полученные ID с текущим списком:
+подписчики оповещаются, только если состав изменился. Время изменения
+книги (Drive `modifiedTime`) для этого не годится — книга общая с листами
+регистраций и меняется при каждой новой анкете.
+`refresh()` (команда /reload_admins) перечитывает лист сразу.
+"""
+import asyncio
+import logging
+
+from services import admins
+from services.async_sheets import AsyncSheetsService, SheetsUnavailable
+
+logger = logging.getLogger(__name__)
+
+
+class AdminSync:
+    def __init__(self, sheets: AsyncSheetsService, interval: float = 30.0):
+        self._sheets = sheets
+        self.interval = interval
+        self._lock = asyncio.Lock()
+
+    async def refresh(self) -> bool:
+        """
+        Перечитывает лист «Админы».
+        Возвращает True, если список админов изменился.
+        """
+        async with self._lock:
+            ids = await self._sheets.get_admin_ids()
+            return admins.set_admin_ids(ids)
+
+    async def run(self) -> None:
+        """Фоновая задача: периодическая проверка изменений."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except SheetsUnavailable as e:
+                logger.warning("Admin list not refreshed: %s", e)
+            except Exception:
+                logger.exception("Admin list refresh failed")
@@ -1,20 +1,68 @@
 """
 Динамический список админов.
 
-Обновляется каждый час из Google Sheets (лист «Админы») в bot.py.
-Хендлеры импортируют `get_admin_ids()` напрямую отсюда.
+Обновляется из Google Sheets (лист «Админы») в bot.py. Текущий список хранится
+неизменяемым снимком (frozenset + номер версии), который при обновлении
+заменяется целиком, поэтому проверка `is_admin` — O(1) и без копирования.
+Хендлеры импортируют функции напрямую отсюда; `subscribe` позволяет узнавать
+об изменениях списка, не опрашивая его.
 """
+import logging
+from dataclasses import dataclass
+from typing import Callable, FrozenSet, Iterable, List
 
-# Глобальный список админов (обновляется из bot.py)
-_admin_ids: list[int] = []
+logger = logging.getLogger(__name__)
 
 
-def get_admin_ids() -> list[int]:
-    """Возвращает текущий список Telegram ID админов (копия)."""
-    return list(_admin_ids)
+@dataclass(frozen=True)
+class AdminSnapshot:
+    ids: FrozenSet[int]
+    version: int
 
 
-def set_admin_ids(ids: list[int]) -> None:
-    """Обновляет список админов (вызывается из bot.py)."""
-    global _admin_ids
-    _admin_ids = list(ids)
+# Текущий снимок (заменяется из bot.py)
+_snapshot = AdminSnapshot(frozenset(), 0)
+_subscribers: List[Callable[[AdminSnapshot], None]] = []
+
+
+def snapshot() -> AdminSnapshot:
+    return _snapshot
+
+
+def is_admin(user_id: int) -> bool:
+    return user_id in _snapshot.ids
+
+
+def get_admin_ids() -> FrozenSet[int]:
+    """Возвращает текущее множество Telegram ID админов."""
+    return _snapshot.ids
+
+
+def set_admin_ids(ids: Iterable[int]) -> bool:
+    """
+    Обновляет список админов (вызывается из bot.py).
+    Если состав изменился — создаёт новую версию и оповещает подписчиков.
+    Возвращает True, если список изменился.
+    """
+    global _snapshot
+    new_ids = frozenset(ids)
+    if new_ids == _snapshot.ids:
+        return False
+    _snapshot = AdminSnapshot(new_ids, _snapshot.version + 1)
+    for callback in list(_subscribers):
+        try:
+            callback(_snapshot)
+        except Exception:
+            logger.exception("Admin list subscriber failed")
+    return True
+
+
+def subscribe(callback: Callable[[AdminSnapshot], None]) -> Callable[[], None]:
+    """Подписывает callback на изменения списка. Возвращает функцию отписки."""
+    _subscribers.append(callback)
+
+    def unsubscribe() -> None:
+        if callback in _subscribers:
+            _subscribers.remove(callback)
+
+    return unsubscribe
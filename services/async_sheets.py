@@ -0,0 +1,213 @@
+"""
+Асинхронная обёртка над клиентом Google Sheets.
+
+gspread (GoogleSheetsService) работает синхронно, поэтому каждый вызов
+выполняется в отдельном пуле потоков размером `max_concurrency` (под квоту
+Sheets API), а не в event loop. Асинхронный REST-клиент (RestSheetsService,
+SHEETS_BACKEND=rest) вызывается прямо в event loop, не больше `max_concurrency`
+запросов одновременно. На каждый вызов действует таймаут — он отсчитывается с
+начала выполнения, ожидание свободного места в него не входит; сам HTTP-запрос
+обрывается таймаутом клиента. Место освобождается, только когда вызов
+действительно закончился (поток gspread после таймаута ещё работает). `stats()` показывает глубину очереди и число вызовов.
+
+Таймауты, 429, 5xx и сетевые ошибки считает предохранитель (`breaker`).
+Пока он разомкнут, вызовы сразу завершаются `SheetsUnavailable`, не нагружая
+API: регистрации остаются в локальной очереди и дописываются после
+восстановления, список админов остаётся прежним.
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Union
+
+from services import metrics
+from services.circuit_breaker import HALF_OPEN, CircuitBreaker
+from services.sheets import GoogleSheetsService
+from services.sheets_rest import RestSheetsService
+
+logger = logging.getLogger(__name__)
+
+
+class SheetsUnavailable(Exception):
+    """
+    Google Sheets не ответила вовремя, перегружена или предохранитель разомкнут.
+    reason: "timeout" | "unavailable" | "rejected" (вызов не выполнялся).
+    """
+
+    def __init__(self, message: str, reason: str = "unavailable"):
+        super().__init__(message)
+        self.reason = reason
+
+
+class AsyncSheetsService:
+    def __init__(
+        self,
+        sheets: Union[GoogleSheetsService, RestSheetsService],
+        max_concurrency: int = 4,
+        timeout: float = 30.0,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.sheets = sheets
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.breaker = breaker or CircuitBreaker("sheets")
+        self._executor = ThreadPoolExecutor(max_concurrency, thread_name_prefix="sheets")
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._in_flight = 0
+        self._calls = 0
+        self._timeouts = 0
+        self._errors = 0
+        self._rejected = 0
+        sheets.set_timeout(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        """Ожидают потока, выполняются сейчас, всего вызовов, таймаутов, ошибок."""
+        with self._lock:
+            return {
+                "queued": self._queued,
+                "in_flight": self._in_flight,
+                "calls": self._calls,
+                "timeouts": self._timeouts,
+                "errors": self._errors,
+                "rejected": self._rejected,
+            }
+
+    async def _acquire(self) -> None:
+        """Ждёт свободного места (не больше max_concurrency вызовов одновременно)."""
+        try:
+            await self._semaphore.acquire()
+        finally:
+            with self._lock:
+                self._queued -= 1
+        with self._lock:
+            self._in_flight += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        self._semaphore.release()
+
+    def _submit(self, fn: Callable, args: Tuple) -> asyncio.Future:
+        """Запускает синхронный вызов в пуле; место освобождается, когда поток закончит."""
+        loop = asyncio.get_running_loop()
+
+        def release(_) -> None:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self._release)
+
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(release)
+        return asyncio.wrap_future(future)
+
+    async def _call(self, fn: Callable, *args: Any) -> Any:
+        started = time.monotonic()
+        try:
+            result = await self._call_with_breaker(fn, args)
+        except SheetsUnavailable as e:
+            metrics.SHEETS_CALLS.inc(fn.__name__, e.reason)
+            raise
+        except Exception:
+            metrics.SHEETS_CALLS.inc(fn.__name__, "error")
+            raise
+        finally:
+            metrics.SHEETS_SECONDS.observe(time.monotonic() - started, fn.__name__)
+        metrics.SHEETS_CALLS.inc(fn.__name__, "ok")
+        return result
+
+    async def _call_with_breaker(self, fn: Callable, args: Tuple) -> Any:
+        if not self.breaker.allow():
+            with self._lock:
+                self._rejected += 1
+            raise SheetsUnavailable(
+                f"Google Sheets временно недоступна, повтор через {self.breaker.retry_in():.0f} с",
+                reason="rejected",
+            )
+        # allow() в half-open пропускает только пробный вызов — этот
+        probe = self.breaker.state == HALF_OPEN
+        try:
+            return await self._guarded_call(fn, args)
+        except BaseException:
+            # Отменённый пробный вызов не дошёл до record_success/record_failure
+            if probe:
+                self.breaker.release_probe()
+            raise
+
+    async def _guarded_call(self, fn: Callable, args: Tuple) -> Any:
+        with self._lock:
+            self._queued += 1
+            self._calls += 1
+            queued = self._queued
+        if queued > self.max_concurrency * 4:
+            logger.warning("Sheets call queue is deep: %s waiting", queued)
+        await self._acquire()
+        started = time.monotonic()
+        is_coroutine = asyncio.iscoroutinefunction(fn)
+        call = fn(*args) if is_coroutine else self._submit(fn, args)
+        try:
+            result = await asyncio.wait_for(call, self.timeout)
+        except asyncio.TimeoutError as e:
+            with self._lock:
+                self._timeouts += 1
+            self.breaker.record_failure()
+            logger.warning(
+                "Sheets call %s timed out after %.1fs", fn.__name__, time.monotonic() - started
+            )
+            raise SheetsUnavailable(
+                f"Google Sheets не ответила за {self.timeout:.0f} с", reason="timeout"
+            ) from e
+        except Exception as e:
+            with self._lock:
+                self._errors += 1
+            if not self.sheets.is_unavailable(e):
+                # API ответил — ошибка не связана с его доступностью
+                self.breaker.record_success()
+                raise
+            self.breaker.record_failure()
+            raise SheetsUnavailable(f"Google Sheets недоступна: {e}") from e
+        finally:
+            if is_coroutine:
+                self._release()
+        self.breaker.record_success()
+        return result
+
+    async def connect(self) -> None:
+        """Подключается к Google заранее (иначе это произойдёт при первом вызове)."""
+        await self._call(self.sheets.connect)
+
+    def build_row(self, event_type: str, user_data: Dict) -> Tuple[str, List]:
+        return self.sheets.build_row(event_type, user_data)
+
+    async def append_rows(self, sheet_name: str, rows: List[List]) -> bool:
+        return await self._call(self.sheets.append_rows, sheet_name, rows)
+
+    async def update_registration(self, event_type: str, user_data: Dict) -> bool:
+        return await self._call(self.sheets.update_registration, event_type, user_data)
+
+    async def save_registration(self, event_type: str, user_data: Dict) -> bool:
+        return await self._call(self.sheets.save_registration, event_type, user_data)
+
+    async def get_admin_ids(self) -> List[int]:
+        return await self._call(self.sheets.get_admin_ids)
+
+    async def get_modified_time(self) -> str:
+        return await self._call(self.sheets.get_modified_time)
+
+    async def get_registration_records(self, event_type: str) -> List[Dict]:
+        return await self._call(self.sheets.get_registration_records, event_type)
+
+    async def get_user_ids(self, audience: str) -> List[int]:
+        return await self._call(self.sheets.get_user_ids, audience)
+
+    async def count_windows(self, windows: Mapping[str, datetime]) -> Dict[str, Dict[str, int]]:
+        return await self._call(self.sheets.count_windows, windows)
+
+    async def get_registrations_count_last_hour(self) -> Dict[str, int]:
+        return await self._call(self.sheets.get_registrations_count_last_hour)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
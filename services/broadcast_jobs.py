@@ -0,0 +1,238 @@
+"""
+Фоновые задания рассылки.
+
+`/send` не ждёт окончания рассылки: задание запускается отдельной asyncio-
+задачей со своим ID и раз в несколько секунд редактирует одно сообщение
+с прогрессом («Отправлено 1200/5000, ошибок 3, осталось ~40 с»). Кнопка
+«Остановить» под ним прерывает задание. Несколько заданий идут одновременно
+и делят общий RateLimiter: очередь за токенами обслуживается по порядку
+(FIFO), поэтому каждое задание получает свою долю темпа, а ответы на /stats
+и регистрации лимитером не задерживаются вовсе.
+
+Доставленные сообщения отдаются в `on_sent` пачками по ходу рассылки (не
+реже раза в `flush_interval` секунд), чтобы после перезапуска бота их
+можно было удалить через /delete. Задание помнит ID рассылки в журнале
+(`broadcast_id`): /delete по идущей рассылке сначала останавливает её
+(`find`, `stop`), чтобы удалить всё, что успело уйти.
+"""
+import asyncio
+import logging
+import secrets
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from services.broadcaster import Broadcaster, BroadcastResult
+
+logger = logging.getLogger(__name__)
+
+JOB_CANCEL_PREFIX = "bcj:"
+
+
+class ProgressMessage:
+    """
+    Сообщение админу, которое раз в `interval` секунд переписывается текстом
+    из `render()`, пока идёт долгая операция (рассылка, удаление).
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        chat_id: int,
+        message_id: int,
+        render: Callable[[], str],
+        interval: float = 3.0,
+        reply_markup: Optional[InlineKeyboardMarkup] = None,
+    ):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.render = render
+        self.interval = interval
+        self.reply_markup = reply_markup
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+
+    async def finish(self, text: str) -> None:
+        """Останавливает обновления и пишет итоговый текст (без кнопок)."""
+        if self._task is not None:
+            self._task.cancel()
+        await self._edit(text, None)
+
+    async def _loop(self) -> None:
+        last_text = None
+        while True:
+            await asyncio.sleep(self.interval)
+            text = self.render()
+            if text != last_text:
+                await self._edit(text, self.reply_markup)
+                last_text = text
+
+    async def _edit(self, text: str, reply_markup: Optional[InlineKeyboardMarkup]) -> None:
+        try:
+            await self.bot.edit_message_text(
+                text, chat_id=self.chat_id, message_id=self.message_id, reply_markup=reply_markup
+            )
+        except Exception as e:
+            logger.warning("Failed to update progress message %s: %s", self.message_id, e)
+
+
+@dataclass
+class BroadcastJob:
+    id: str
+    admin_chat_id: int
+    total: int
+    started_at: float = field(default_factory=time.monotonic)
+    result: BroadcastResult = field(default_factory=BroadcastResult)
+    cancel: asyncio.Event = field(default_factory=asyncio.Event)
+    progress: Optional[ProgressMessage] = None
+    task: Optional[asyncio.Task] = None
+    broadcast_id: Optional[int] = None
+
+    def progress_text(self) -> str:
+        done = self.result.total
+        errors = len(self.result.failed) + len(self.result.blocked)
+        text = f"Рассылка {self.id}: отправлено {done}/{self.total}, ошибок {errors}"
+        elapsed = time.monotonic() - self.started_at
+        if 0 < done < self.total:
+            eta = (self.total - done) * elapsed / done
+            text += f", осталось ~{eta:.0f} с"
+        return text
+
+
+def job_cancel_kb(job_id: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="Остановить рассылку", callback_data=f"{JOB_CANCEL_PREFIX}{job_id}")],
+    ])
+
+
+SentBatch = List[Tuple[int, int]]
+
+
+class BroadcastJobManager:
+    def __init__(
+        self,
+        broadcaster: Broadcaster,
+        progress_interval: float = 3.0,
+        flush_size: int = 100,
+        flush_interval: float = 3.0,
+    ):
+        self.broadcaster = broadcaster
+        self.progress_interval = progress_interval
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._jobs: Dict[str, BroadcastJob] = {}
+        # Задания по ID рассылки в журнале — до полного завершения, включая on_done
+        self._by_broadcast: Dict[int, BroadcastJob] = {}
+
+    def active_jobs(self) -> List[BroadcastJob]:
+        return list(self._jobs.values())
+
+    def pending_messages(self) -> int:
+        """Сколько сообщений активных рассылок ещё не отправлено."""
+        return sum(job.total - job.result.total for job in self._jobs.values())
+
+    async def start(
+        self,
+        bot: Bot,
+        admin_chat_id: int,
+        user_ids: List[int],
+        text: str,
+        on_done: Callable[[BroadcastJob], Awaitable[None]],
+        on_sent: Optional[Callable[[SentBatch], None]] = None,
+        broadcast_id: Optional[int] = None,
+    ) -> BroadcastJob:
+        """
+        Запускает рассылку в фоне и присылает админу сообщение с прогрессом.
+        on_sent получает пачки доставленных (chat_id, message_id) по ходу рассылки,
+        on_done вызывается после завершения (или остановки) задания.
+        broadcast_id — ID рассылки в журнале, по нему задание находит `find`.
+        """
+        job = BroadcastJob(
+            id=secrets.token_hex(3),
+            admin_chat_id=admin_chat_id,
+            total=len(user_ids),
+            broadcast_id=broadcast_id,
+        )
+        markup = job_cancel_kb(job.id)
+        sent = await bot.send_message(admin_chat_id, job.progress_text(), reply_markup=markup)
+        job.progress = ProgressMessage(
+            bot, admin_chat_id, sent.message_id, job.progress_text, self.progress_interval, markup
+        )
+        self._jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(bot, job, user_ids, text, on_done, on_sent))
+        if broadcast_id is not None:
+            self._by_broadcast[broadcast_id] = job
+            job.task.add_done_callback(lambda _: self._by_broadcast.pop(broadcast_id, None))
+        return job
+
+    def find(self, broadcast_id: int) -> Optional[BroadcastJob]:
+        """Задание рассылки из журнала, если оно ещё не завершилось."""
+        return self._by_broadcast.get(broadcast_id)
+
+    async def stop(self, job: BroadcastJob) -> None:
+        """Останавливает задание и ждёт его завершения (включая on_sent и on_done)."""
+        job.cancel.set()
+        await asyncio.shield(job.task)
+
+    def cancel(self, job_id: str) -> bool:
+        """Останавливает задание. False — такого задания нет (уже завершилось)."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        job.cancel.set()
+        return True
+
+    async def _run(
+        self,
+        bot: Bot,
+        job: BroadcastJob,
+        user_ids: List[int],
+        text: str,
+        on_done: Callable[[BroadcastJob], Awaitable[None]],
+        on_sent: Optional[Callable[[SentBatch], None]],
+    ) -> None:
+        flushed = 0
+        flushed_at = time.monotonic()
+
+        def flush() -> None:
+            nonlocal flushed, flushed_at
+            batch = job.result.sent[flushed:]
+            flushed += len(batch)
+            flushed_at = time.monotonic()
+            if batch and on_sent is not None:
+                try:
+                    on_sent(batch)
+                except Exception:
+                    logger.exception("Broadcast job %s failed to save sent messages", job.id)
+
+        def on_progress(result: BroadcastResult) -> None:
+            job.result = result
+            pending = len(result.sent) - flushed
+            if pending >= self.flush_size or (
+                pending and time.monotonic() - flushed_at >= self.flush_interval
+            ):
+                flush()
+
+        job.progress.start()
+        try:
+            job.result = await self.broadcaster.broadcast(
+                user_ids, text, on_progress=on_progress, cancel=job.cancel
+            )
+        except Exception:
+            logger.exception("Broadcast job %s failed", job.id)
+        finally:
+            self._jobs.pop(job.id, None)
+            flush()
+
+        status = "остановлена" if job.result.cancelled else "завершена"
+        await job.progress.finish(f"{job.progress_text()}\nРассылка {status}.")
+        try:
+            await on_done(job)
+        except Exception:
+            logger.exception("Broadcast job %s completion handler failed", job.id)
@@ -1,54 +1,275 @@
-from aiogram import Bot
-from typing import List
+"""
+Рассылка сообщений пользователям и их удаление (/delete).
+
+Несколько воркеров отправляют (или удаляют) сообщения параллельно, общий `RateLimiter`
+держит темп под лимитами Telegram (около 30 сообщений в секунду на бота и
+одно в секунду в один чат). На `TelegramRetryAfter` все отправки ставятся на
+паузу на указанное время, временные ошибки повторяются, а заблокировавшие
+бота и удалённые аккаунты сразу помечаются как постоянные отказы.
+"""
 import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNotFound,
+    TelegramRetryAfter,
+)
+
+logger = logging.getLogger(__name__)
+
+# Telegram позволяет боту удалять сообщения не старше 48 часов
+DELETE_WINDOW = 48 * 3600
+
+
+class TokenBucket:
+    """Не больше `rate` операций в секунду со всплеском до `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        """Запрещает выдачу токенов на `seconds` секунд (ответ RetryAfter)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    self._updated = time.monotonic()
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class RateLimiter:
+    """Общий лимит бота и отдельный интервал между сообщениями в один чат."""
+
+    def __init__(self, global_rate: float = 25.0, per_chat_interval: float = 1.0):
+        self.bucket = TokenBucket(global_rate)
+        self._per_chat_interval = per_chat_interval
+        self._chat_next: Dict[int, float] = {}
+
+    def pause(self, seconds: float) -> None:
+        self.bucket.pause(seconds)
+
+    async def acquire(self, chat_id: int) -> None:
+        now = time.monotonic()
+        next_at = self._chat_next.get(chat_id, 0.0)
+        self._chat_next[chat_id] = max(now, next_at) + self._per_chat_interval
+        if next_at > now:
+            await asyncio.sleep(next_at - now)
+        await self.bucket.acquire()
+        if len(self._chat_next) > 10000:
+            self._prune()
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        self._chat_next = {c: t for c, t in self._chat_next.items() if t > now}
+
+
+@dataclass
+class BroadcastResult:
+    """Итог рассылки."""
+    sent: List[Tuple[int, int]] = field(default_factory=list)  # (chat_id, message_id)
+    failed: List[int] = field(default_factory=list)    # ошибки, попытки исчерпаны
+    blocked: List[int] = field(default_factory=list)   # бот заблокирован, аккаунт удалён и т.п.
+    duration: float = 0.0
+    cancelled: bool = False
+
+    @property
+    def total(self) -> int:
+        return len(self.sent) + len(self.failed) + len(self.blocked)
+
+
+@dataclass
+class DeleteResult:
+    """Итог удаления рассылки."""
+    deleted: int = 0
+    failed: int = 0
+    expired: int = 0   # старше 48 часов, удалять уже нельзя — в API не ходили
+    pending: int = 0   # ещё не обработаны
+    duration: float = 0.0
+
+    @property
+    def total(self) -> int:
+        return self.deleted + self.failed + self.expired
+
+
+_CHAT_GONE_MARKERS = ("chat not found", "user is deactivated", "peer_id_invalid")
+
+
+def is_chat_unreachable(error: Exception) -> bool:
+    """Бот заблокирован, аккаунт удалён или чат не найден — писать туда больше нельзя."""
+    if isinstance(error, (TelegramForbiddenError, TelegramNotFound)):
+        return True
+    return isinstance(error, TelegramBadRequest) and any(
+        marker in str(error).lower() for marker in _CHAT_GONE_MARKERS
+    )
+
 
 class Broadcaster:
-    def __init__(self, bot: Bot):
+    def __init__(
+        self,
+        bot: Bot,
+        limiter: Optional[RateLimiter] = None,
+        workers: int = 20,
+        max_retries: int = 3,
+    ):
         self.bot = bot
-    
-    async def send_message(self, user_id: int, text: str) -> bool:
+        self.limiter = limiter or RateLimiter()
+        self.workers = workers
+        self.max_retries = max_retries
+
+    async def _call(self, chat_id: int, method: Callable[[], Awaitable[Any]]) -> Tuple[str, Any]:
         """
-        Отправляет сообщение одному пользователю
-        
-        Args:
-            user_id: ID пользователя
-            text: Текст сообщения
-            
+        Выполняет запрос к API для чата с учётом лимитов и повторов.
+
+        Returns:
+            ("ok", ответ) | ("blocked", None) | ("failed", None)
+        """
+        attempt = 0
+        while True:
+            await self.limiter.acquire(chat_id)
+            try:
+                return "ok", await method()
+            except TelegramRetryAfter as e:
+                logger.warning("Flood control, pausing requests for %ss", e.retry_after)
+                self.limiter.pause(e.retry_after)
+            except Exception as e:
+                if is_chat_unreachable(e):
+                    logger.info("Chat %s is unreachable: %s", chat_id, e)
+                    return "blocked", None
+                attempt += 1
+                if isinstance(e, TelegramBadRequest):
+                    # Повтор с тем же запросом ничего не изменит
+                    attempt = self.max_retries + 1
+                if attempt > self.max_retries:
+                    logger.warning("Request to chat %s failed: %s", chat_id, e)
+                    return "failed", None
+                await asyncio.sleep(2 ** attempt)
+
+    async def send_message(self, user_id: int, text: str) -> Tuple[str, Optional[int]]:
+        """
+        Отправляет сообщение одному пользователю с учётом лимитов.
+
         Returns:
-            bool: True если отправка успешна, False если произошла ошибка
-        """
-        try:
-            await self.bot.send_message(user_id, text)
-            return True
-        except Exception as e:
-            print(f"Error sending message to {user_id}: {e}")
-            return False
-    
-    async def broadcast(self, user_ids: List[int], text: str) -> dict:
-        """
-        Выполняет рассылку сообщения всем пользователям
-        
+            ("sent", message_id) | ("blocked", None) | ("failed", None)
+        """
+        status, sent = await self._call(user_id, lambda: self.bot.send_message(user_id, text))
+        if status == "ok":
+            return "sent", sent.message_id
+        return status, None
+
+    async def delete_message(self, chat_id: int, message_id: int) -> bool:
+        """Удаляет сообщение у пользователя с учётом лимитов."""
+        status, _ = await self._call(chat_id, lambda: self.bot.delete_message(chat_id, message_id))
+        return status == "ok"
+
+    async def delete_messages(
+        self,
+        messages: List[Tuple[int, int]],
+        sent_at: float,
+        on_progress: Optional[Callable[[DeleteResult], None]] = None,
+    ) -> DeleteResult:
+        """
+        Удаляет сообщения рассылки: пары (chat_id, message_id).
+        Если рассылке (`sent_at`, unix time) больше 48 часов, запросы не
+        отправляются — Telegram их всё равно отклонит.
+        """
+        result = DeleteResult(pending=len(messages))
+        if time.time() - sent_at >= DELETE_WINDOW:
+            result.expired, result.pending = len(messages), 0
+            return result
+
+        started = time.monotonic()
+
+        async def delete_one(item: Tuple[int, int]) -> None:
+            ok = await self.delete_message(*item)
+            result.pending -= 1
+            if ok:
+                result.deleted += 1
+            else:
+                result.failed += 1
+            if on_progress is not None:
+                on_progress(result)
+
+        await self._run_pool(messages, delete_one)
+        result.duration = time.monotonic() - started
+        return result
+
+    async def _run_pool(
+        self,
+        items: List,
+        handle: Callable[[Any], Awaitable[None]],
+        cancel: Optional[asyncio.Event] = None,
+    ) -> None:
+        """Обрабатывает элементы `workers` параллельными воркерами."""
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in items:
+            queue.put_nowait(item)
+
+        async def worker() -> None:
+            while cancel is None or not cancel.is_set():
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await handle(item)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.workers, len(items)))))
+
+    async def broadcast(
+        self,
+        user_ids: List[int],
+        text: str,
+        on_progress: Optional[Callable[[BroadcastResult], None]] = None,
+        cancel: Optional[asyncio.Event] = None,
+    ) -> BroadcastResult:
+        """
+        Выполняет рассылку сообщения всем пользователям.
+
         Args:
             user_ids: Список ID пользователей
             text: Текст сообщения
-            
+            on_progress: Вызывается после каждой отправки с текущим итогом
+            cancel: Если событие установлено, новые отправки не начинаются
+
         Returns:
-            dict: Статистика рассылки (успешно/неуспешно)
-        """
-        results = {
-            "success": 0,
-            "failed": 0
-        }
-        
-        for user_id in user_ids:
-            success = await self.send_message(user_id, text)
-            if success:
-                results["success"] += 1
+            BroadcastResult: кому доставлено (с message_id), кому нет
+        """
+        result = BroadcastResult()
+        started = time.monotonic()
+
+        async def send_one(user_id: int) -> None:
+            status, message_id = await self.send_message(user_id, text)
+            if status == "sent":
+                result.sent.append((user_id, message_id))
+            elif status == "blocked":
+                result.blocked.append(user_id)
             else:
-                results["failed"] += 1
-            
-            # Небольшая задержка между отправками
-            await asyncio.sleep(0.05)
-        
-        return results
+                result.failed.append(user_id)
+            if on_progress is not None:
+                on_progress(result)
 
+        await self._run_pool(user_ids, send_one, cancel)
+        result.duration = time.monotonic() - started
+        result.cancelled = cancel is not None and cancel.is_set()
+        return result
@@ -0,0 +1,87 @@
+"""
+Предохранитель (circuit breaker) для внешнего API.
+
+После `failure_threshold` ошибок подряд цепь размыкается: вызовы отклоняются
+сразу, не нагружая упавший сервис. Через `reset_timeout` секунд пропускается
+один пробный вызов (half-open). Удачный замыкает цепь, неудачный снова
+размыкает её на вдвое больший срок (но не дольше `max_reset_timeout`).
+Если пробный вызов не завершился (задачу отменили), `release_probe`
+разрешает следующий.
+"""
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 5.0,
+        max_reset_timeout: float = 300.0,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = CLOSED
+        self._failures = 0
+        self._timeout = reset_timeout
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        """Цепь разомкнута (включая ожидание результата пробного вызова)."""
+        return self.state != CLOSED
+
+    def retry_in(self) -> float:
+        """Через сколько секунд будет разрешён пробный вызов (0 — уже можно)."""
+        if self.state == CLOSED:
+            return 0.0
+        return max(0.0, self._opened_at + self._timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        """Можно ли выполнить вызов сейчас. В half-open пропускает один пробный."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and self.retry_in() == 0:
+            self.state = HALF_OPEN
+            self._probing = False
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def release_probe(self) -> None:
+        """Пробный вызов прерван без результата — следующий вызов станет пробным."""
+        if self.state == HALF_OPEN:
+            self._probing = False
+
+    def record_success(self) -> None:
+        if self.state != CLOSED:
+            logger.info("Circuit %s closed: backend is available again", self.name)
+        self.state = CLOSED
+        self._failures = 0
+        self._timeout = self.reset_timeout
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self.state == HALF_OPEN:
+            self._timeout = min(self.max_reset_timeout, self._timeout * 2)
+        elif self.state == CLOSED and self._failures < self.failure_threshold:
+            return
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._probing = False
+        logger.warning(
+            "Circuit %s open after %s failures, next probe in %.0fs",
+            self.name, self._failures, self._timeout,
+        )
@@ -0,0 +1,76 @@
+"""
+Счётчики регистраций за скользящее окно.
+
+Для каждого типа мероприятия — кольцевой буфер поминутных корзин за
+последние `days` дней (плюс одна корзина, чтобы окно «последние days
+дней» помещалось целиком). Запрос «сколько с момента X» суммирует корзины в
+памяти, без обращения к базе и к Google Sheets. Точность — одна минута.
+Счётчики наполняет RegistrationStore: при старте из базы и после каждой
+новой регистрации.
+"""
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+
+class SlidingCounter:
+    def __init__(self, minutes: int):
+        self._size = minutes
+        self._buckets = [0] * minutes
+        self._head: Optional[int] = None  # номер последней минуты (от эпохи)
+
+    def _advance(self, minute: int) -> None:
+        if self._head is None:
+            self._head = minute
+            return
+        if minute <= self._head:
+            return
+        if minute - self._head >= self._size:
+            self._buckets = [0] * self._size
+        else:
+            for m in range(self._head + 1, minute + 1):
+                self._buckets[m % self._size] = 0
+        self._head = minute
+
+    def add(self, ts: float, n: int = 1) -> None:
+        minute = int(ts // 60)
+        self._advance(minute)
+        if minute > self._head - self._size:
+            self._buckets[minute % self._size] += n
+
+    def count_since(self, since_ts: float, now_ts: float) -> int:
+        self._advance(int(now_ts // 60))
+        start = max(int(since_ts // 60), self._head - self._size + 1)
+        return sum(self._buckets[m % self._size] for m in range(start, self._head + 1))
+
+
+class RegistrationCounters:
+    def __init__(self, event_types: Iterable[str] = ("events", "accelerator"), days: int = 7):
+        self.days = days
+        self._event_types = tuple(event_types)
+        self._counters: Dict[str, SlidingCounter] = {}
+        self.reset()
+
+    def reset(self) -> None:
+        self._counters = {e: SlidingCounter(self.days * 24 * 60 + 1) for e in self._event_types}
+
+    def covers(self, since: datetime) -> bool:
+        """
+        Окно `since` помещается в буфер (иначе нужен запрос к базе).
+        Допуск в одну корзину: `now - days`, посчитанное вызывающим чуть
+        раньше, тоже считается из памяти.
+        """
+        return time.time() - since.timestamp() <= self.days * 24 * 3600 + 60
+
+    def record(self, event_type: str, when: datetime) -> None:
+        counter = self._counters.get(event_type)
+        if counter is not None:
+            counter.add(when.timestamp())
+
+    def counts_since(self, since: datetime) -> Dict[str, int]:
+        """Количество регистраций начиная с `since`: {"events": N, "accelerator": N}."""
+        now = time.time()
+        return {
+            event_type: counter.count_since(since.timestamp(), now)
+            for event_type, counter in self._counters.items()
+        }
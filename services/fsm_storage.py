@@ -0,0 +1,206 @@
+"""
+Хранилище FSM-состояний, переживающее перезапуск бота.
+
+`SQLiteStorage` держит недавние сессии в ограниченном LRU-кэше, а изменения
+пишет в SQLite пачкой раз в `flush_interval` секунд: несколько подряд идущих
+`set_state` / `update_data` одного шага анкеты превращаются в одну запись.
+Сессии, не менявшиеся дольше `ttl` секунд (брошенные анкеты), считаются
+пустыми и периодически удаляются из базы.
+
+`create_storage` выбирает бэкенд по настройке FSM_STORAGE: "sqlite",
+"memory" или "redis" (любой Redis-совместимый сервер, нужен пакет redis).
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Session:
+    state: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    updated_at: float = field(default_factory=time.time)
+    dirty: bool = False
+
+
+def _key(key: StorageKey) -> str:
+    return ":".join(
+        str(part) if part is not None else ""
+        for part in (
+            key.bot_id,
+            key.chat_id,
+            key.user_id,
+            key.thread_id,
+            key.business_connection_id,
+            key.destiny,
+        )
+    )
+
+
+class SQLiteStorage(BaseStorage):
+    def __init__(
+        self,
+        db_path: str,
+        ttl: float = 7 * 24 * 3600,
+        flush_interval: float = 1.0,
+        cache_size: int = 10000,
+    ):
+        self._ttl = ttl
+        self._flush_interval = flush_interval
+        self._cache_size = cache_size
+        self._cache: "OrderedDict[str, _Session]" = OrderedDict()
+        self._dirty: Dict[str, _Session] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._last_purge = 0.0
+        self._db = sqlite3.connect(db_path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS fsm_sessions ("
+            " key TEXT PRIMARY KEY,"
+            " state TEXT,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL"
+            ")"
+        )
+        self._db.commit()
+
+    def _load(self, key: str) -> _Session:
+        session = self._cache.get(key)
+        if session is None:
+            row = self._db.execute(
+                "SELECT state, data, updated_at FROM fsm_sessions WHERE key = ?", (key,)
+            ).fetchone()
+            session = _Session(row[0], json.loads(row[1]), row[2]) if row else _Session()
+            self._cache[key] = session
+            self._evict()
+        else:
+            self._cache.move_to_end(key)
+        if time.time() - session.updated_at > self._ttl:
+            session.state, session.data = None, {}
+        return session
+
+    def _evict(self) -> None:
+        while len(self._cache) > self._cache_size:
+            key, session = self._cache.popitem(last=False)
+            if session.dirty:
+                self._write({key: session})
+                self._dirty.pop(key, None)
+
+    def _touch(self, key: str, session: _Session) -> None:
+        session.updated_at = time.time()
+        session.dirty = True
+        self._dirty[key] = session
+        if self._flush_interval <= 0:
+            self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                self._flush_interval, self.flush
+            )
+
+    def _write(self, sessions: Mapping[str, _Session]) -> None:
+        upserts = []
+        deletes = []
+        for key, session in sessions.items():
+            session.dirty = False
+            if session.state is None and not session.data:
+                deletes.append((key,))
+            else:
+                upserts.append(
+                    (key, session.state, json.dumps(session.data, ensure_ascii=False), session.updated_at)
+                )
+        self._db.executemany(
+            "INSERT OR REPLACE INTO fsm_sessions (key, state, data, updated_at) VALUES (?, ?, ?, ?)",
+            upserts,
+        )
+        self._db.executemany("DELETE FROM fsm_sessions WHERE key = ?", deletes)
+        self._db.commit()
+
+    def flush(self) -> None:
+        """Записывает накопленные изменения в базу одной транзакцией."""
+        self._flush_handle = None
+        if self._dirty:
+            dirty, self._dirty = self._dirty, {}
+            try:
+                self._write(dirty)
+            except sqlite3.Error as e:
+                logger.error("Failed to persist FSM sessions: %s", e)
+                self._dirty.update(dirty)
+        now = time.time()
+        if now - self._last_purge > 3600:
+            self._db.execute("DELETE FROM fsm_sessions WHERE updated_at < ?", (now - self._ttl,))
+            self._db.commit()
+            self._last_purge = now
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        k = _key(key)
+        session = self._load(k)
+        session.state = state.state if isinstance(state, State) else state
+        self._touch(k, session)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return self._load(_key(key)).state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        k = _key(key)
+        session = self._load(k)
+        session.data = dict(data)
+        self._touch(k, session)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return dict(self._load(_key(key)).data)
+
+    def count_states(self) -> Dict[str, int]:
+        """Число живых (не старше ttl) сессий по состояниям, для метрик."""
+        self.flush()
+        rows = self._db.execute(
+            "SELECT state, COUNT(*) FROM fsm_sessions"
+            " WHERE state IS NOT NULL AND updated_at >= ? GROUP BY state",
+            (time.time() - self._ttl,),
+        )
+        return dict(rows.fetchall())
+
+    async def close(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self.flush()
+        self._db.close()
+
+
+def create_storage(kind: str, db_path: str, redis_url: str = "", ttl: float = 7 * 24 * 3600) -> BaseStorage:
+    """
+    Создаёт FSM-хранилище.
+    kind: "sqlite" | "memory" | "redis"
+    """
+    if kind == "memory":
+        return MemoryStorage()
+    if kind == "redis":
+        # Необязательная зависимость: нужна только для FSM_STORAGE=redis
+        from aiogram.fsm.storage.redis import RedisStorage
+
+        return RedisStorage.from_url(redis_url, state_ttl=int(ttl), data_ttl=int(ttl))
+    return SQLiteStorage(db_path, ttl=ttl)
+
+
+def count_states(storage: BaseStorage) -> Dict[str, int]:
+    """Сессии FSM по состояниям. Для Redis не считается (пустой результат)."""
+    if isinstance(storage, SQLiteStorage):
+        return storage.count_states()
+    if isinstance(storage, MemoryStorage):
+        counts: Dict[str, int] = {}
+        for record in storage.storage.values():
+            if record.state is not None:
+                counts[record.state] = counts.get(record.state, 0) + 1
+        return counts
+    return {}
@@ -0,0 +1,84 @@
+"""
+Выбор лидера среди нескольких процессов бота (аренда в общей SQLite-базе).
+
+Задачи, которые должны выполняться в единственном экземпляре (ежечасный
+отчёт админам, перенос очереди регистраций в Google Sheets), запускает только
+процесс, держащий аренду. Аренда продлевается каждые `ttl / 3` секунд; если
+лидер упал, через `ttl` секунд её забирает другой процесс.
+"""
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import time
+from typing import Awaitable, Callable, List
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLease:
+    def __init__(self, db_path: str, name: str, ttl: float = 30.0):
+        self.name = name
+        self.ttl = ttl
+        self.holder = f"{socket.gethostname()}:{os.getpid()}"
+        self.is_leader = False
+        self._db = sqlite3.connect(db_path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS leases ("
+            " name TEXT PRIMARY KEY,"
+            " holder TEXT NOT NULL,"
+            " expires_at REAL NOT NULL"
+            ")"
+        )
+        self._db.commit()
+
+    def try_acquire(self) -> bool:
+        """Берёт или продлевает аренду. True — этот процесс лидер."""
+        now = time.time()
+        try:
+            self._db.execute(
+                "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)"
+                " ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at"
+                " WHERE leases.expires_at < ? OR leases.holder = excluded.holder",
+                (self.name, self.holder, now + self.ttl, now),
+            )
+            self._db.commit()
+            row = self._db.execute("SELECT holder FROM leases WHERE name = ?", (self.name,)).fetchone()
+            self.is_leader = row is not None and row[0] == self.holder
+        except sqlite3.Error as e:
+            logger.error("Leader lease %s check failed: %s", self.name, e)
+            self.is_leader = False
+        return self.is_leader
+
+    def release(self) -> None:
+        self._db.execute(
+            "DELETE FROM leases WHERE name = ? AND holder = ?", (self.name, self.holder)
+        )
+        self._db.commit()
+        self.is_leader = False
+
+    async def run(self, *singletons: Callable[[], Awaitable[None]]) -> None:
+        """
+        Держит аренду и, пока процесс — лидер, выполняет задачи `singletons`.
+        При потере лидерства задачи отменяются.
+        """
+        tasks: List[asyncio.Task] = []
+        try:
+            while True:
+                was_leader = self.is_leader
+                if self.try_acquire() and not was_leader:
+                    logger.info("Became leader for %s (%s)", self.name, self.holder)
+                    tasks = [asyncio.create_task(factory()) for factory in singletons]
+                elif was_leader and not self.is_leader:
+                    logger.warning("Lost leadership for %s", self.name)
+                    for task in tasks:
+                        task.cancel()
+                    tasks = []
+                await asyncio.sleep(self.ttl / 3)
+        finally:
+            for task in tasks:
+                task.cancel()
+            if self.is_leader:
+                self.release()
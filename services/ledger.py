@@ -0,0 +1,111 @@
+"""
+Журнал рассылок для /delete (SQLite).
+
+Для каждой рассылки хранится только (broadcast_id, chat_id, message_id)
+доставленных сообщений и сообщения админа, по которым её можно найти:
+исходный текст рассылки и итоговая статистика. Журнал переживает
+перезапуск бота, а записи старше `retention` секунд удаляются — Telegram
+всё равно не даёт удалять сообщения старше 48 часов.
+"""
+import sqlite3
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from services.broadcaster import DELETE_WINDOW
+
+
+class BroadcastLedger:
+    def __init__(self, db_path: str, retention: float = DELETE_WINDOW):
+        self._retention = retention
+        self._db = sqlite3.connect(db_path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS broadcasts ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " created_at REAL NOT NULL"
+            ");"
+            "CREATE TABLE IF NOT EXISTS broadcast_messages ("
+            " broadcast_id INTEGER NOT NULL,"
+            " chat_id INTEGER NOT NULL,"
+            " message_id INTEGER NOT NULL,"
+            " PRIMARY KEY (broadcast_id, chat_id)"
+            ") WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS broadcast_aliases ("
+            " chat_id INTEGER NOT NULL,"
+            " message_id INTEGER NOT NULL,"
+            " broadcast_id INTEGER NOT NULL,"
+            " PRIMARY KEY (chat_id, message_id)"
+            ") WITHOUT ROWID;"
+        )
+        self._db.commit()
+
+    def create(self, chat_id: int, message_id: int) -> int:
+        """
+        Заводит рассылку и привязывает к ней исходное сообщение админа.
+        Заодно удаляет устаревшие рассылки.
+        """
+        self.purge()
+        cur = self._db.execute("INSERT INTO broadcasts (created_at) VALUES (?)", (time.time(),))
+        broadcast_id = cur.lastrowid
+        self.add_alias(broadcast_id, chat_id, message_id)
+        return broadcast_id
+
+    def add_alias(self, broadcast_id: int, chat_id: int, message_id: int) -> None:
+        """Привязывает к рассылке ещё одно сообщение админа (например, статистику)."""
+        self._db.execute(
+            "INSERT OR REPLACE INTO broadcast_aliases (chat_id, message_id, broadcast_id) VALUES (?, ?, ?)",
+            (chat_id, message_id, broadcast_id),
+        )
+        self._db.commit()
+
+    def add_messages(self, broadcast_id: int, sent: Iterable[Tuple[int, int]]) -> None:
+        """Записывает доставленные сообщения: пары (chat_id, message_id)."""
+        self._db.executemany(
+            "INSERT OR REPLACE INTO broadcast_messages (broadcast_id, chat_id, message_id) VALUES (?, ?, ?)",
+            ((broadcast_id, chat_id, message_id) for chat_id, message_id in sent),
+        )
+        self._db.commit()
+
+    def find(self, chat_id: int, message_id: int) -> Optional[int]:
+        """ID рассылки, к которой относится сообщение админа, или None."""
+        row = self._db.execute(
+            "SELECT broadcast_id FROM broadcast_aliases WHERE chat_id = ? AND message_id = ?",
+            (chat_id, message_id),
+        ).fetchone()
+        return row[0] if row else None
+
+    def created_at(self, broadcast_id: int) -> Optional[float]:
+        """Время рассылки (unix time) или None."""
+        row = self._db.execute("SELECT created_at FROM broadcasts WHERE id = ?", (broadcast_id,)).fetchone()
+        return row[0] if row else None
+
+    def messages(self, broadcast_id: int) -> List[Tuple[int, int]]:
+        """Доставленные сообщения рассылки: пары (chat_id, message_id)."""
+        return self._db.execute(
+            "SELECT chat_id, message_id FROM broadcast_messages WHERE broadcast_id = ?",
+            (broadcast_id,),
+        ).fetchall()
+
+    def delete(self, broadcast_id: int) -> None:
+        """Убирает рассылку из журнала."""
+        self._delete_where("id = ?", (broadcast_id,))
+
+    def purge(self) -> None:
+        """
+        Удаляет рассылки старше срока хранения, а также сообщения и ссылки,
+        оставшиеся от уже удалённых рассылок.
+        """
+        self._delete_where("created_at < ?", (time.time() - self._retention,))
+        for table in ("broadcast_messages", "broadcast_aliases"):
+            self._db.execute(
+                f"DELETE FROM {table} WHERE broadcast_id NOT IN (SELECT id FROM broadcasts)"
+            )
+        self._db.commit()
+
+    def _delete_where(self, condition: str, params: tuple) -> None:
+        ids = [row[0] for row in self._db.execute(f"SELECT id FROM broadcasts WHERE {condition}", params)]
+        for broadcast_id in ids:
+            self._db.execute("DELETE FROM broadcast_messages WHERE broadcast_id = ?", (broadcast_id,))
+            self._db.execute("DELETE FROM broadcast_aliases WHERE broadcast_id = ?", (broadcast_id,))
+            self._db.execute("DELETE FROM broadcasts WHERE id = ?", (broadcast_id,))
+        self._db.commit()
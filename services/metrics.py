@@ -0,0 +1,268 @@
+"""
+Метрики в формате Prometheus (GET /metrics).
+
+Небольшой собственный реестр вместо prometheus_client: счётчики,
+гистограммы и вычисляемые показатели, значение которых снимается в
+момент запроса (`Gauge.set_function`). Всё пишется из event loop, поэтому
+без блокировок.
+
+Что измеряется:
+  - время обработчиков aiogram и ошибки в них (`HandlerMetricsMiddleware`);
+  - запросы к Telegram Bot API по методам, включая ответы 429
+    (`TelegramMetricsMiddleware`, подключается к сессии бота);
+  - вызовы Google Sheets по методам (AsyncSheetsService);
+  - анкеты по состояниям FSM, очередь рассылок и записи в Sheets (bot.py).
+
+В режиме вебхука у каждого воркера свои метрики и свой порт.
+"""
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from aiohttp import web
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        _REGISTRY.append(self)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self.samples(),
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, values)} {_format_value(value)}"
+            for values, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = buckets
+        # метки -> (счётчики по корзинам, сумма, количество)
+        self._values: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        counts, total, count = self._values.get(label_values) or ([0] * len(self.buckets), 0.0, 0)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        self._values[label_values] = (counts, total + value, count + 1)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for values, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                labels = _format_labels(self.labels + ("le",), values + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels + ("le",), values + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labels, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+GaugeValue = Union[float, Dict[Union[str, LabelValues], float]]
+
+
+class Gauge(_Metric):
+    """Значение вычисляется при каждом запросе /metrics функцией из `set_function`."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._function: Optional[Callable[[], GaugeValue]] = None
+
+    def set_function(self, function: Callable[[], GaugeValue]) -> None:
+        """function() -> число (без меток) или {значение метки или кортеж значений: число}."""
+        self._function = function
+
+    def samples(self) -> List[str]:
+        if self._function is None:
+            return []
+        try:
+            value = self._function()
+        except Exception:
+            logger.exception("Failed to collect metric %s", self.name)
+            return []
+        if not isinstance(value, dict):
+            return [f"{self.name} {_format_value(value)}"]
+        lines = []
+        for values, v in sorted(value.items()):
+            values = values if isinstance(values, tuple) else (values,)
+            lines.append(f"{self.name}{_format_labels(self.labels, values)} {_format_value(v)}")
+        return lines
+
+
+_REGISTRY: List[_Metric] = []
+
+
+def render() -> str:
+    """Все метрики в текстовом формате Prometheus."""
+    lines: List[str] = []
+    for metric in _REGISTRY:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+# --- Метрики бота ---
+HANDLER_SECONDS = Histogram(
+    "bot_handler_seconds", "Время работы обработчика апдейта", ("handler",)
+)
+HANDLER_ERRORS = Counter(
+    "bot_handler_errors_total", "Исключения в обработчиках", ("handler",)
+)
+TELEGRAM_REQUESTS = Counter(
+    "bot_telegram_requests_total",
+    "Запросы к Telegram Bot API (result: ok, retry_after — ответ 429, error)",
+    ("method", "result"),
+)
+TELEGRAM_SECONDS = Histogram(
+    "bot_telegram_request_seconds", "Время запроса к Telegram Bot API", ("method",)
+)
+SHEETS_CALLS = Counter(
+    "bot_sheets_calls_total",
+    "Вызовы Google Sheets (result: ok, error, unavailable, timeout, rejected — предохранитель разомкнут)",
+    ("method", "result"),
+)
+SHEETS_SECONDS = Histogram(
+    "bot_sheets_call_seconds", "Время вызова Google Sheets, включая ожидание в очереди", ("method",)
+)
+SHEETS_QUEUE = Gauge(
+    "bot_sheets_calls_in_progress", "Вызовы Google Sheets сейчас (state: queued, in_flight)", ("state",)
+)
+SHEETS_BREAKER_OPEN = Gauge(
+    "bot_sheets_breaker_open", "Предохранитель Google Sheets разомкнут (1) или замкнут (0)"
+)
+FSM_SESSIONS = Gauge(
+    "bot_fsm_sessions", "Незавершённые анкеты и другие сессии FSM по состояниям", ("state",)
+)
+BROADCAST_PENDING = Gauge(
+    "bot_broadcast_pending_messages", "Сообщения активных рассылок, которые ещё не отправлены"
+)
+BROADCAST_JOBS = Gauge("bot_broadcast_jobs", "Активные рассылки")
+REGISTRATION_QUEUE = Gauge(
+    "bot_registration_queue_pending", "Регистрации, ещё не записанные в Google Sheets"
+)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Время и ошибки обработчиков. Подключается как inner-middleware диспетчера."""
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object is not None else "unknown"
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, name)
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """Запросы к Bot API: число по методам и результатам, время ответа."""
+
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            response = await make_request(bot, method)
+        except TelegramRetryAfter:
+            TELEGRAM_REQUESTS.inc(name, "retry_after")
+            raise
+        except Exception:
+            TELEGRAM_REQUESTS.inc(name, "error")
+            raise
+        finally:
+            TELEGRAM_SECONDS.observe(time.perf_counter() - started, name)
+        TELEGRAM_REQUESTS.inc(name, "ok")
+        return response
+
+
+async def _handle_metrics(_: web.Request) -> web.Response:
+    return web.Response(
+        body=render().encode(),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+
+def metrics_app() -> web.Application:
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+    return app
+
+
+async def start_server(host: str, port: int) -> web.AppRunner:
+    """Запускает HTTP-сервер с /metrics; возвращает runner (cleanup() — остановить)."""
+    runner = web.AppRunner(metrics_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Metrics available at http://%s:%s/metrics", host, port)
+    return runner
@@ -0,0 +1,71 @@
+"""
+Готовность данных, которые прогреваются в фоне после старта.
+
+Polling начинается сразу, а подключение к Google Sheets, список админов и
+индекс регистраций загружаются параллельно с ним (`warm`). Обработчики,
+которым нужны эти данные, ждут `wait(name)` — но не дольше `timeout`
+секунд: если Google недоступен, бот отвечает с тем, что есть, а не висит.
+Готовность отмечается после первой попытки прогрева, даже неудачной, —
+дальше данные обновляют обычные фоновые задачи.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SHEETS = "sheets"
+ADMINS = "admins"
+REGISTRATIONS = "registrations"
+
+
+class Readiness:
+    def __init__(self, timeout: float = 10.0):
+        self.timeout = timeout
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._started = time.monotonic()
+
+    def _future(self, name: str) -> asyncio.Future:
+        # Future создаётся при первом обращении — уже внутри работающего event loop
+        future = self._futures.get(name)
+        if future is None:
+            future = self._futures[name] = asyncio.get_running_loop().create_future()
+        return future
+
+    def is_ready(self, name: str) -> bool:
+        future = self._futures.get(name)
+        return future is not None and future.done()
+
+    def set_ready(self, name: str) -> None:
+        future = self._future(name)
+        if not future.done():
+            future.set_result(None)
+
+    async def wait(self, name: str, timeout: Optional[float] = None) -> bool:
+        """
+        Ждёт готовности `name` не дольше timeout (по умолчанию self.timeout).
+        Возвращает False, если не дождались.
+        """
+        future = self._future(name)
+        if future.done():
+            return True
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning("%s is not ready after %.1fs, continuing without it", name, timeout)
+            return False
+
+    async def warm(self, name: str, warmup: Callable[[], Awaitable]) -> None:
+        """Выполняет прогрев и отмечает готовность (в том числе после ошибки)."""
+        try:
+            await warmup()
+            logger.info(
+                "%s ready in %.2fs after start", name, time.monotonic() - self._started
+            )
+        except Exception as e:
+            logger.error("Failed to warm up %s: %s", name, e)
+        finally:
+            self.set_ready(name)
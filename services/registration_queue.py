@@ -0,0 +1,261 @@
+"""
+Очередь записи регистраций в Google Sheets (write-behind).
+
+Хендлер подтверждения сохраняет анкету в локальную SQLite-базу и сразу
+отвечает пользователю. Фоновый воркер (`run`, запускается из bot.py) копит
+строки по листам «Мероприятия» / «Акселератор» и дописывает их пачкой
+одним запросом `append_rows` — когда набралось `batch_size` строк или самая
+старая ждёт дольше `batch_max_age` секунд. При ошибках Google API попытка
+повторяется с экспоненциальной задержкой, а пока предохранитель Sheets
+разомкнут — после его пробного вызова. Строки удаляются из очереди только
+после успешной записи, поэтому рестарт бота ничего не теряет.
+
+Повторная анкета пользователя ставится в очередь как обновление (op="update")
+и перезаписывает его строку в листе отдельным запросом, сохраняя порядок.
+
+Запрос, оборванный таймаутом или ошибкой, мог всё-таки дописать строки.
+Поэтому перед повторной записью пачки бот дочитывает лист и пропускает
+строки, которые там уже есть (по ID пользователя и дате регистрации).
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from services.async_sheets import AsyncSheetsService, SheetsUnavailable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchResult:
+    """Итог записи одной пачки строк в лист."""
+    event_type: str
+    size: int
+    ok: bool
+    duration: float
+
+
+class RegistrationQueue:
+    def __init__(
+        self,
+        db_path: str,
+        sheets: AsyncSheetsService,
+        batch_size: int = 50,
+        batch_max_age: float = 2.0,
+        retry_base: float = 2.0,
+        retry_max: float = 300.0,
+        poll_interval: float = 5.0,
+    ):
+        self._sheets = sheets
+        self._batch_size = batch_size
+        self._batch_max_age = batch_max_age
+        self._retry_base = retry_base
+        self._retry_max = retry_max
+        # Строки могут добавлять другие процессы (режим вебхука) — периодически проверяем базу
+        self._poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._db = sqlite3.connect(db_path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS registration_queue ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " event_type TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0"
+            ")"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(registration_queue)")}
+        if "created_at" not in columns:
+            self._db.execute(
+                "ALTER TABLE registration_queue ADD COLUMN created_at REAL NOT NULL DEFAULT 0"
+            )
+        if "op" not in columns:
+            self._db.execute(
+                "ALTER TABLE registration_queue ADD COLUMN op TEXT NOT NULL DEFAULT 'append'"
+            )
+        self._db.commit()
+
+    def enqueue(self, event_type: str, user_data: Dict, update: bool = False) -> bool:
+        """
+        Сохраняет регистрацию локально и будит воркер.
+        event_type: "accelerator" | "events"
+        update: повторная анкета — перезаписать строку пользователя в листе
+        """
+        try:
+            self._db.execute(
+                "INSERT INTO registration_queue (event_type, payload, created_at, op)"
+                " VALUES (?, ?, ?, ?)",
+                (
+                    event_type,
+                    json.dumps(user_data, ensure_ascii=False),
+                    time.time(),
+                    "update" if update else "append",
+                ),
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.error("Failed to enqueue registration: %s", e)
+            return False
+        self._wakeup.set()
+        return True
+
+    def pending_count(self) -> int:
+        """Количество регистраций, ещё не записанных в Google Sheets."""
+        return self._db.execute("SELECT COUNT(*) FROM registration_queue").fetchone()[0]
+
+    def _next_batch(self, force: bool) -> Tuple[Optional[str], Optional[float]]:
+        """
+        Возвращает (event_type пачки, готовой к записи, сколько ждать следующую).
+        force: писать сразу, не дожидаясь порогов (повтор после ошибки).
+        """
+        now = time.time()
+        wait: Optional[float] = None
+        groups = self._db.execute(
+            "SELECT event_type, COUNT(*), MIN(created_at) FROM registration_queue GROUP BY event_type"
+        ).fetchall()
+        for event_type, count, oldest in groups:
+            age = now - oldest
+            if force or count >= self._batch_size or age >= self._batch_max_age:
+                return event_type, None
+            left = self._batch_max_age - age
+            wait = left if wait is None else min(wait, left)
+        return None, wait
+
+    async def flush(self, event_type: str) -> BatchResult:
+        """
+        Записывает в лист до `batch_size` самых старых строк данного типа.
+        Обновление (повторная анкета) записывается отдельно, по одному.
+        """
+        items = self._db.execute(
+            "SELECT id, payload, op, attempts FROM registration_queue"
+            " WHERE event_type = ? ORDER BY id LIMIT ?",
+            (event_type, self._batch_size),
+        ).fetchall()
+
+        ids: List[int] = []
+        rows: List[List] = []
+        retried: Dict[int, Dict] = {}
+        sheet_name = None
+        update = None
+        for row_id, payload, op, attempts in items:
+            if rows and op == "update":
+                break
+            try:
+                user_data = json.loads(payload)
+                sheet_name, row = self._sheets.build_row(event_type, user_data)
+            except (KeyError, ValueError) as e:
+                # Такая строка никогда не запишется — не блокируем ею очередь
+                logger.error("Dropping malformed registration %s: %s", row_id, e)
+                self._db.execute("DELETE FROM registration_queue WHERE id = ?", (row_id,))
+                continue
+            ids.append(row_id)
+            rows.append(row)
+            if attempts:
+                retried[row_id] = user_data
+            if op == "update":
+                update = user_data
+                break
+        self._db.commit()
+
+        started = time.monotonic()
+        ok = True
+        if rows and retried and update is None:
+            # Обновление строки повторять безопасно, а дописывание — нет
+            written = await self._already_written(event_type, retried)
+            if written is None:
+                ok = False
+            elif written:
+                logger.info(
+                    "%s %s registrations are already in Google Sheets, not resending",
+                    len(written), event_type,
+                )
+                marks = ",".join("?" * len(written))
+                self._db.execute(f"DELETE FROM registration_queue WHERE id IN ({marks})", list(written))
+                self._db.commit()
+                kept = [(row_id, row) for row_id, row in zip(ids, rows) if row_id not in written]
+                ids = [row_id for row_id, _ in kept]
+                rows = [row for _, row in kept]
+        if rows:
+            if ok:
+                try:
+                    if update is not None:
+                        ok = await self._sheets.update_registration(event_type, update)
+                    else:
+                        ok = await self._sheets.append_rows(sheet_name, rows)
+                except SheetsUnavailable as e:
+                    logger.warning("Google Sheets unavailable: %s", e)
+                    ok = False
+            marks = ",".join("?" * len(ids))
+            if ok:
+                self._db.execute(f"DELETE FROM registration_queue WHERE id IN ({marks})", ids)
+            else:
+                self._db.execute(
+                    f"UPDATE registration_queue SET attempts = attempts + 1 WHERE id IN ({marks})", ids
+                )
+            self._db.commit()
+        return BatchResult(event_type, len(rows), ok, time.monotonic() - started)
+
+    async def _already_written(self, event_type: str, items: Dict[int, Dict]) -> Optional[Set[int]]:
+        """
+        id строк очереди из items, которые уже есть в листе (та же пара
+        ID пользователя и дата регистрации). None — лист прочитать не удалось.
+        Лист читается инкрементально: после первого раза запрашивается только хвост.
+        """
+        try:
+            records = await self._sheets.get_registration_records(event_type)
+        except Exception as e:
+            logger.warning("Cannot check which registrations reached Google Sheets: %s", e)
+            return None
+        in_sheet = {
+            (str(record.get("ID пользователя")), str(record.get("Дата регистрации")))
+            for record in records
+        }
+        return {
+            row_id for row_id, user_data in items.items()
+            if (str(user_data.get("user_id")), str(user_data.get("registration_date"))) in in_sheet
+        }
+
+    async def run(self) -> None:
+        """Фоновый воркер: переносит строки из очереди в Google Sheets пачками."""
+        failures = 0
+        while True:
+            event_type, wait = self._next_batch(force=failures > 0)
+            if event_type is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(), wait if wait is not None else self._poll_interval
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            result = await self.flush(event_type)
+            if result.ok:
+                if result.size:
+                    logger.info(
+                        "Saved batch of %s %s registrations in %.2fs",
+                        result.size, result.event_type, result.duration,
+                    )
+                failures = 0
+                continue
+
+            delay = min(self._retry_max, self._retry_base * 2 ** failures)
+            failures += 1
+            if self._sheets.breaker.is_open:
+                # Режим деградации: регистрации копятся в очереди, ждём пробного вызова
+                delay = max(self._retry_base, self._sheets.breaker.retry_in())
+                logger.warning(
+                    "Google Sheets unavailable, %s registrations kept locally, retry in %.0fs",
+                    self.pending_count(), delay,
+                )
+            else:
+                logger.warning(
+                    "Batch of %s %s registrations not saved (attempt %s), retry in %.0fs",
+                    result.size, result.event_type, failures, delay,
+                )
+            await asyncio.sleep(delay)
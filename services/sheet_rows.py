@@ -0,0 +1,116 @@
+"""
+Разбор строк листов регистраций — общий для обоих клиентов Sheets
+(GoogleSheetsService на gspread и RestSheetsService на aiohttp).
+
+Курсор (`SheetCursor`) хранит уже прочитанную часть листа: по нему клиенты
+дочитывают только новые строки. Модуль не зависит ни от gspread, ни от HTTP.
+"""
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Mapping, Optional
+
+from config import SHEET_NAME_EVENTS, SHEET_NAME_ACCELERATOR
+from utils.forms import EVENTS_FORM, ACCELERATOR_FORM
+
+# Колонки листов регистраций задаются описанием анкет (utils/forms.py)
+HEADERS_EVENTS = EVENTS_FORM.headers
+HEADERS_ACCELERATOR = ACCELERATOR_FORM.headers
+
+# Ширина листов регистраций (сколько колонок читать)
+REGISTRATION_WIDTH = {
+    SHEET_NAME_EVENTS: len(HEADERS_EVENTS),
+    SHEET_NAME_ACCELERATOR: len(HEADERS_ACCELERATOR),
+}
+
+
+@dataclass
+class SheetCursor:
+    """
+    Что уже прочитано из листа: заголовки, строки данных, последняя строка
+    и modifiedTime книги на момент чтения (None — Drive API недоступен).
+    """
+    headers: List[str]
+    records: List[Dict]
+    last_row: List[str]
+    synced_at: float
+    modified_time: Optional[str] = None
+
+
+def trim_row(row: List) -> List[str]:
+    """Строка листа без пустых ячеек в конце (так их отдаёт API)."""
+    values = [str(v) for v in row]
+    while values and values[-1] == "":
+        values.pop()
+    return values
+
+
+def column_letter(width: int) -> str:
+    """Буква колонки по её номеру: 1 -> A, 12 -> L, 27 -> AA."""
+    letters = ""
+    while width > 0:
+        width, rest = divmod(width - 1, 26)
+        letters = chr(ord("A") + rest) + letters
+    return letters
+
+
+def to_record(headers: List[str], row: List) -> Dict:
+    row = list(row) + [""] * (len(headers) - len(row))
+    return dict(zip(headers, row))
+
+
+def make_cursor(values: List[List], modified_time: Optional[str] = None) -> SheetCursor:
+    """Курсор по полностью прочитанному листу (первая строка — заголовки)."""
+    headers = trim_row(values[0]) if values else []
+    return SheetCursor(
+        headers=headers,
+        records=[to_record(headers, row) for row in values[1:]],
+        last_row=trim_row(values[-1]) if values else [],
+        synced_at=time.monotonic(),
+        modified_time=modified_time,
+    )
+
+
+def registration_user_ids(rows: List[Dict]) -> List[int]:
+    """Telegram ID из колонки «ID пользователя» (пустые и нечисловые пропускаются)."""
+    user_ids: List[int] = []
+    for row in rows:
+        uid = row.get("ID пользователя")
+        if uid is not None and str(uid).strip():
+            try:
+                user_ids.append(int(uid))
+            except (ValueError, TypeError):
+                pass
+    return user_ids
+
+
+def first_registrations(rows: List[Dict]) -> List[datetime]:
+    """Дата первой регистрации каждого пользователя листа."""
+    first: Dict[str, datetime] = {}
+    for row in rows:
+        val = row.get("Дата регистрации")
+        if not val:
+            continue
+        if isinstance(val, datetime):
+            dt = val
+        else:
+            try:
+                dt = datetime.strptime(str(val).strip(), "%Y-%m-%d %H:%M:%S")
+            except (ValueError, TypeError):
+                continue
+        user = str(row.get("ID пользователя"))
+        if user not in first or dt < first[user]:
+            first[user] = dt
+    return list(first.values())
+
+
+def count_first_registrations(
+    records: Mapping[str, List[Dict]], windows: Mapping[str, datetime]
+) -> Dict[str, Dict[str, int]]:
+    """records: {event_type: строки листа} -> {имя окна: {event_type: N}}."""
+    result = {name: {"events": 0, "accelerator": 0} for name in windows}
+    for event_type, rows in records.items():
+        dates = first_registrations(rows)
+        for name, since in windows.items():
+            result[name][event_type] = sum(1 for dt in dates if dt >= since)
+    return result
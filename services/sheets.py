@@ -1,7 +1,12 @@
+import logging
+import threading
+import time
+
 import gspread
+import requests
 from oauth2client.service_account import ServiceAccountCredentials
 from datetime import datetime, timedelta
-from typing import List, Dict, Tuple
+from typing import List, Dict, Mapping, Optional, Set, Tuple
 from config import (
     SPREADSHEET_ID,
     CREDENTIALS_FILE,
@@ -9,98 +14,263 @@ from config import (
     SHEET_NAME_ACCELERATOR,
     SHEET_NAME_ADMINS,
 )
+from services.sheet_rows import (
+    HEADERS_EVENTS,
+    HEADERS_ACCELERATOR,
+    REGISTRATION_WIDTH,
+    SheetCursor,
+    column_letter,
+    count_first_registrations,
+    make_cursor,
+    registration_user_ids,
+    to_record,
+    trim_row,
+)
+from utils.forms import FORMS
 
-# Заголовки для листа «Мероприятия»
-HEADERS_EVENTS = [
-    "ID пользователя",
-    "ФИО",
-    "Вы из ВШЭ",
-    "Образовательная программа",
-    "Тг-аккаунт",
-    "Вопрос спикерам",
-    "Дата регистрации",
-]
-
-# Заголовки для листа «Акселератор»
-HEADERS_ACCELERATOR = [
-    "ID пользователя",
-    "ФИО",
-    "Название проекта",
-    "Email",
-    "Тг-аккаунт",
-    "Этап реализации",
-    "Описание проекта",
-    "Выступление на мероприятиях",
-    "Ссылка на презентацию",
-    "ФИО и Образовательная программа",
-    "Ваш вуз",
-    "Дата регистрации",
-]
+logger = logging.getLogger(__name__)
 
 # Заголовки для листа «Админы»
 HEADERS_ADMINS = ["ID админа", "Имя"]
 
 
+def _is_sheet_missing(error: Exception) -> bool:
+    """Ошибка означает, что листа с таким именем больше нет."""
+    if isinstance(error, gspread.exceptions.WorksheetNotFound):
+        return True
+    return isinstance(error, gspread.exceptions.APIError) and "Unable to parse range" in str(error)
+
+
+def is_unavailable(error: Exception) -> bool:
+    """Google API перегружен или недоступен (429, 5xx, сеть) — запрос стоит повторить позже."""
+    if isinstance(error, gspread.exceptions.APIError):
+        status = getattr(error.response, "status_code", 0)
+        return status == 429 or status >= 500
+    return isinstance(error, requests.RequestException)
+
+
 class GoogleSheetsService:
-    def __init__(self):
-        scope = [
-            "https://spreadsheets.google.com/feeds",
-            "https://www.googleapis.com/auth/drive",
-        ]
-        credentials = ServiceAccountCredentials.from_json_keyfile_name(
-            CREDENTIALS_FILE, scope
-        )
-        self.client = gspread.authorize(credentials)
-        self._spreadsheet = self.client.open_by_key(SPREADSHEET_ID)
+    """
+    Доступ к книге Google Sheets. В процессе создаётся один экземпляр (bot.py),
+    хендлеры получают его через контекст диспетчера (аргумент `sheets`).
+    Ошибки недоступности API (`is_unavailable`) методы не глотают, а пробрасывают:
+    их учитывает предохранитель в AsyncSheetsService.
+    Авторизация и открытие книги — при первом обращении (`connect`), а не в
+    конструкторе: бот стартует, даже если Google недоступен.
+    """
+
+    def __init__(self, sheet_ttl: float = 600.0, full_resync_interval: float = 86400.0):
+        self.client: Optional[gspread.Client] = None
+        self._spreadsheet: Optional[gspread.Spreadsheet] = None
+        self._timeout: Optional[float] = None
+        # Листы, у которых заголовки уже проверены (см. _ensure_headers)
+        self._headers_checked: Set[str] = set()
+        # Кэш хэндлов листов: имя -> (worksheet, время получения)
+        self._sheet_ttl = sheet_ttl
+        self._sheets: Dict[str, Tuple[gspread.Worksheet, float]] = {}
+        # Курсоры инкрементального чтения листов регистраций (см. _read_records)
+        self._full_resync_interval = full_resync_interval
+        self._cursors: Dict[str, SheetCursor] = {}
+        # False — Drive API недоступен, изменения ищутся по последней строке
+        self._check_modified = True
+        # Методы вызываются из пула потоков (AsyncSheetsService) — кэши под замком
+        self._lock = threading.RLock()
+
+    # Какие ошибки считает предохранитель AsyncSheetsService
+    is_unavailable = staticmethod(is_unavailable)
+
+    def set_timeout(self, timeout: float) -> None:
+        """Таймаут HTTP-запросов gspread (секунды)."""
+        self._timeout = timeout
+        if self.client is not None:
+            self.client.set_timeout(timeout)
+
+    def connect(self) -> gspread.Spreadsheet:
+        """Авторизуется и открывает книгу, если это ещё не сделано."""
+        with self._lock:
+            if self._spreadsheet is not None:
+                return self._spreadsheet
+            scope = [
+                "https://spreadsheets.google.com/feeds",
+                "https://www.googleapis.com/auth/drive",
+            ]
+            credentials = ServiceAccountCredentials.from_json_keyfile_name(
+                CREDENTIALS_FILE, scope
+            )
+            client = gspread.authorize(credentials)
+            if self._timeout is not None:
+                client.set_timeout(self._timeout)
+            self._spreadsheet = client.open_by_key(SPREADSHEET_ID)
+            self.client = client
+            return self._spreadsheet
 
     def _get_sheet(self, name: str):
-        return self._spreadsheet.worksheet(name)
+        """
+        Возвращает хэндл листа из кэша; запрашивает метаданные у API,
+        только если хэндла нет или он старше `sheet_ttl` секунд.
+        """
+        with self._lock:
+            cached = self._sheets.get(name)
+            now = time.monotonic()
+            if cached is not None and now - cached[1] < self._sheet_ttl:
+                return cached[0]
+            sheet = self.connect().worksheet(name)
+            self._sheets[name] = (sheet, now)
+            return sheet
+
+    def _forget_sheet(self, name: str, error: Exception) -> None:
+        """Выбрасывает хэндл из кэша, если ошибка говорит, что лист не найден."""
+        if _is_sheet_missing(error):
+            self._sheets.pop(name, None)
+            self._headers_checked.discard(name)
+            self._cursors.pop(name, None)
 
     def _ensure_headers(self, sheet, headers: List[str]) -> None:
-        if not sheet.get_all_values():
-            sheet.append_row(headers)
+        """
+        Создаёт строку заголовков, если первая строка листа пуста.
+        Проверка читает только строку 1 и выполняется один раз на лист.
+        """
+        with self._lock:
+            if sheet.title in self._headers_checked:
+                return
+            if not sheet.row_values(1):
+                sheet.insert_row(headers, 1)
+            self._headers_checked.add(sheet.title)
 
-    def save_registration(self, event_type: str, user_data: Dict) -> bool:
+    def _workbook_version(self) -> Optional[str]:
+        """modifiedTime книги; None, если Drive API недоступен сервисному аккаунту."""
+        if not self._check_modified:
+            return None
+        try:
+            return self.get_modified_time()
+        except gspread.exceptions.APIError as e:
+            if is_unavailable(e):
+                raise
+            logger.warning("Drive API unavailable, sheet edits are detected by the last row: %s", e)
+            self._check_modified = False
+            return None
+
+    def _full_sync(self, sheet, width: int, modified_time: Optional[str]) -> SheetCursor:
+        cursor = make_cursor(sheet.get(f"A1:{column_letter(width)}"), modified_time)
+        self._cursors[sheet.title] = cursor
+        return cursor
+
+    def _read_records(self, sheet_name: str) -> List[Dict]:
         """
-        Сохраняет регистрацию в лист по типу события.
+        Возвращает строки листа регистраций как словари (ключи — заголовки).
+
+        Лист читается целиком только в первый раз; дальше запрашивается
+        диапазон `A{n}:L` начиная с последней прочитанной строки n. Если эта
+        строка изменилась или исчезла (строки удалили или отредактировали
+        её), либо прошло `full_resync_interval` секунд, лист перечитывается
+        полностью. Правки в середине листа, не сдвигающие строку n, видны
+        только после такой полной пересинхронизации.
+
+        Перед чтением запрашивается modifiedTime книги (Drive API): если книга
+        не менялась с прошлого чтения, строки отдаются из кэша без запросов
+        к Sheets.
+        """
+        with self._lock:
+            sheet = self._get_sheet(sheet_name)
+            width = REGISTRATION_WIDTH[sheet_name]
+            cursor = self._cursors.get(sheet_name)
+            modified_time = self._workbook_version()
+            if cursor is None or time.monotonic() - cursor.synced_at >= self._full_resync_interval:
+                return self._full_sync(sheet, width, modified_time).records
+            if modified_time is not None and modified_time == cursor.modified_time:
+                return cursor.records
+
+            last = len(cursor.records) + 1
+            values = sheet.get(f"A{last}:{column_letter(width)}")
+            if not values or trim_row(values[0]) != cursor.last_row:
+                return self._full_sync(sheet, width, modified_time).records
+            for row in values[1:]:
+                cursor.records.append(to_record(cursor.headers, row))
+            cursor.last_row = trim_row(values[-1])
+            cursor.modified_time = modified_time
+            return cursor.records
+
+    def invalidate_headers(self, sheet_name: Optional[str] = None) -> None:
+        """
+        Сбрасывает кэш проверки заголовков — для одного листа или для всех.
+        Нужно, если лист очистили вручную.
+        """
+        if sheet_name is None:
+            self._headers_checked.clear()
+        else:
+            self._headers_checked.discard(sheet_name)
+
+    def build_row(self, event_type: str, user_data: Dict) -> Tuple[str, List]:
+        """
+        Возвращает (имя листа, строка) для регистрации.
         event_type: "accelerator" | "events"
         """
+        form = FORMS[event_type]
+        return form.sheet_name, form.row(user_data)
+
+    def append_rows(self, sheet_name: str, rows: List[List]) -> bool:
+        """
+        Дописывает несколько строк в лист одним запросом к API.
+        """
+        headers = HEADERS_EVENTS if sheet_name == SHEET_NAME_EVENTS else HEADERS_ACCELERATOR
         try:
-            if event_type == "events":
-                sheet = self._get_sheet(SHEET_NAME_EVENTS)
-                self._ensure_headers(sheet, HEADERS_EVENTS)
-                row = [
-                    user_data["user_id"],
-                    user_data["full_name"],
-                    user_data.get("hse", ""),
-                    user_data.get("edu_program", ""),
-                    user_data.get("contact", ""),
-                    user_data.get("question", ""),
-                    user_data["registration_date"],
-                ]
-            else:
-                sheet = self._get_sheet(SHEET_NAME_ACCELERATOR)
-                self._ensure_headers(sheet, HEADERS_ACCELERATOR)
-                row = [
-                    user_data["user_id"],
-                    user_data["full_name"],
-                    user_data.get("project_name", ""),
-                    user_data.get("email", ""),
-                    user_data.get("contact", ""),
-                    user_data.get("stage", ""),
-                    user_data.get("description", ""),
-                    user_data.get("pizzapitch", ""),
-                    user_data.get("presentation_url", ""),
-                    user_data.get("team", ""),
-                    user_data.get("hse", ""),
-                    user_data["registration_date"],
-                ]
-            sheet.append_row(row)
+            sheet = self._get_sheet(sheet_name)
+            self._ensure_headers(sheet, headers)
+            sheet.append_rows(rows)
             return True
         except Exception as e:
-            print(f"Error saving to Google Sheets: {e}")
+            logger.error("Error saving to Google Sheets: %s", e)
+            # Лист могли пересоздать или очистить — перепроверим заголовки
+            self.invalidate_headers(sheet_name)
+            self._forget_sheet(sheet_name, e)
+            if is_unavailable(e):
+                raise
             return False
 
+    def update_registration(self, event_type: str, user_data: Dict) -> bool:
+        """
+        Перезаписывает последнюю строку пользователя в листе (повторная анкета).
+        Если строки ещё нет, дописывает новую.
+        """
+        sheet_name, row = self.build_row(event_type, user_data)
+        user_id = str(user_data["user_id"])
+        try:
+            with self._lock:
+                records = self._read_records(sheet_name)
+                index = next(
+                    (i for i in range(len(records) - 1, -1, -1)
+                     if str(records[i].get("ID пользователя")) == user_id),
+                    None,
+                )
+                if index is None:
+                    return self.append_rows(sheet_name, [row])
+                n = index + 2  # строка 1 — заголовки
+                sheet = self._get_sheet(sheet_name)
+                sheet.update(f"A{n}:{column_letter(len(row))}{n}", [row])
+                cursor = self._cursors[sheet_name]
+                cursor.records[index] = to_record(cursor.headers, row)
+                if index == len(cursor.records) - 1:
+                    cursor.last_row = trim_row(row)
+                return True
+        except Exception as e:
+            logger.error("Error updating registration in Google Sheets: %s", e)
+            self._forget_sheet(sheet_name, e)
+            if is_unavailable(e):
+                raise
+            return False
+
+    def save_registration(self, event_type: str, user_data: Dict) -> bool:
+        """
+        Сохраняет регистрацию в лист по типу события.
+        event_type: "accelerator" | "events"
+        """
+        try:
+            sheet_name, row = self.build_row(event_type, user_data)
+        except KeyError as e:
+            logger.error("Error saving to Google Sheets: missing field %s", e)
+            return False
+        return self.append_rows(sheet_name, [row])
+
     def get_admin_ids(self) -> List[int]:
         """
         Возвращает список Telegram user_id админов из листа «Админы».
@@ -108,10 +278,13 @@ class GoogleSheetsService:
         """
         try:
             sheet = self._get_sheet(SHEET_NAME_ADMINS)
-            rows = sheet.get_all_records()
+            values = sheet.get("A1:B")
+            if not values:
+                return []
+            headers = [str(v).strip() for v in values[0]]
             admin_ids: List[int] = []
-            for row in rows:
-                uid = row.get("ID админа")
+            for row in values[1:]:
+                uid = to_record(headers, row).get("ID админа")
                 if uid is not None and str(uid).strip():
                     try:
                         admin_ids.append(int(uid))
@@ -119,9 +292,33 @@ class GoogleSheetsService:
                         pass
             return admin_ids
         except Exception as e:
-            print(f"Error getting admin ids from Google Sheets: {e}")
+            logger.error("Error getting admin ids from Google Sheets: %s", e)
+            self._forget_sheet(SHEET_NAME_ADMINS, e)
+            if is_unavailable(e):
+                raise
             return []
 
+    def get_modified_time(self) -> str:
+        """Время последнего изменения книги (Drive API, поле modifiedTime)."""
+        self.connect()
+        return self.client.get_file_drive_metadata(SPREADSHEET_ID)["modifiedTime"]
+
+    def get_registration_records(self, event_type: str) -> List[Dict]:
+        """
+        Возвращает все строки листа регистраций как словари (ключи — заголовки).
+        Если листа нет — пустой список; остальные ошибки пробрасываются, чтобы
+        импорт в локальное хранилище не посчитал лист пустым.
+        event_type: "accelerator" | "events"
+        """
+        sheet_name = SHEET_NAME_EVENTS if event_type == "events" else SHEET_NAME_ACCELERATOR
+        try:
+            return list(self._read_records(sheet_name))
+        except Exception as e:
+            self._forget_sheet(sheet_name, e)
+            if _is_sheet_missing(e):
+                return []
+            raise
+
     def get_user_ids(self, audience: str) -> List[int]:
         """
         Возвращает список Telegram user_id для рассылки.
@@ -130,62 +327,43 @@ class GoogleSheetsService:
         user_ids: List[int] = []
         try:
             if audience in ("all", "events"):
-                sheet = self._get_sheet(SHEET_NAME_EVENTS)
-                rows = sheet.get_all_records()
-                for row in rows:
-                    uid = row.get("ID пользователя")
-                    if uid is not None and str(uid).strip():
-                        try:
-                            user_ids.append(int(uid))
-                        except (ValueError, TypeError):
-                            pass
+                user_ids += registration_user_ids(self._read_records(SHEET_NAME_EVENTS))
             if audience in ("all", "accelerator"):
-                sheet = self._get_sheet(SHEET_NAME_ACCELERATOR)
-                rows = sheet.get_all_records()
-                for row in rows:
-                    uid = row.get("ID пользователя")
-                    if uid is not None and str(uid).strip():
-                        try:
-                            user_ids.append(int(uid))
-                        except (ValueError, TypeError):
-                            pass
-            if audience == "all":
-                user_ids = list(dict.fromkeys(user_ids))
+                user_ids += registration_user_ids(self._read_records(SHEET_NAME_ACCELERATOR))
+            # Повторные регистрации одного пользователя — один получатель
+            user_ids = list(dict.fromkeys(user_ids))
         except Exception as e:
-            print(f"Error getting user ids from Google Sheets: {e}")
+            logger.error("Error getting user ids from Google Sheets: %s", e)
+            self._forget_sheet(SHEET_NAME_EVENTS, e)
+            self._forget_sheet(SHEET_NAME_ACCELERATOR, e)
+            if is_unavailable(e):
+                raise
         return user_ids
 
-    def get_registrations_count_last_hour(self) -> Dict[str, int]:
+    def count_windows(self, windows: Mapping[str, datetime]) -> Dict[str, Dict[str, int]]:
         """
-        Возвращает количество регистраций за последний час по каждому листу.
-        Возвращает {"events": N, "accelerator": N}.
+        Количество зарегистрировавшихся для нескольких окон за одно чтение листов
+        (повторные анкеты одного пользователя считаются один раз).
+        Возвращает {имя окна: {"events": N, "accelerator": N}}.
         """
-        since = datetime.now() - timedelta(hours=1)
-        date_fmt = "%Y-%m-%d %H:%M:%S"
-        result = {"events": 0, "accelerator": 0}
-
-        def count_since(rows: List[Dict], date_key: str) -> int:
-            n = 0
-            for row in rows:
-                val = row.get(date_key)
-                if not val:
-                    continue
-                if isinstance(val, datetime):
-                    dt = val
-                else:
-                    try:
-                        dt = datetime.strptime(str(val).strip(), date_fmt)
-                    except (ValueError, TypeError):
-                        continue
-                if dt >= since:
-                    n += 1
-            return n
-
+        result = {name: {"events": 0, "accelerator": 0} for name in windows}
         try:
-            sheet_ev = self._get_sheet(SHEET_NAME_EVENTS)
-            result["events"] = count_since(sheet_ev.get_all_records(), "Дата регистрации")
-            sheet_acc = self._get_sheet(SHEET_NAME_ACCELERATOR)
-            result["accelerator"] = count_since(sheet_acc.get_all_records(), "Дата регистрации")
+            result = count_first_registrations({
+                "events": self._read_records(SHEET_NAME_EVENTS),
+                "accelerator": self._read_records(SHEET_NAME_ACCELERATOR),
+            }, windows)
         except Exception as e:
-            print(f"Error getting registration stats: {e}")
+            logger.error("Error getting registration stats: %s", e)
+            self._forget_sheet(SHEET_NAME_EVENTS, e)
+            self._forget_sheet(SHEET_NAME_ACCELERATOR, e)
+            if is_unavailable(e):
+                raise
         return result
+
+    def get_registrations_count_last_hour(self) -> Dict[str, int]:
+        """
+        Возвращает количество зарегистрировавшихся за последний час по каждому листу.
+        Возвращает {"events": N, "accelerator": N}.
+        """
+        since = datetime.now() - timedelta(hours=1)
+        return self.count_windows({"hour": since})["hour"]
@@ -0,0 +1,523 @@
+"""
+Асинхронный клиент Google Sheets API v4 поверх aiohttp (SHEETS_BACKEND=rest).
+
+Замена gspread без пула потоков: все запросы идут через одну сессию aiohttp
+с пулом keep-alive соединений, поэтому TLS не согласуется заново на каждый
+вызов. Ответы запрашиваются сжатыми (gzip), лишние поля отсекаются масками
+(`fields`), чтение нескольких диапазонов — один `values:batchGet`, запись
+поверх строки — `values:batchUpdate`.
+
+Токен сервисного аккаунта (JWT из credentials.json) получается при первом
+запросе и обновляется в фоне за `refresh_margin` секунд до истечения.
+
+Публичные методы те же, что у GoogleSheetsService, но асинхронные; класс
+подключается в AsyncSheetsService вместо него. Адреса API и токена
+(`token_uri` в credentials.json) можно подменить на локальный тестовый сервер.
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Mapping, Optional, Sequence, Set, Tuple
+from urllib.parse import quote
+
+import aiohttp
+from oauth2client import GOOGLE_TOKEN_URI, crypt
+
+from config import (
+    SPREADSHEET_ID,
+    CREDENTIALS_FILE,
+    SHEET_NAME_EVENTS,
+    SHEET_NAME_ACCELERATOR,
+    SHEET_NAME_ADMINS,
+    SHEETS_API_URL,
+    DRIVE_API_URL,
+)
+from services.sheet_rows import (
+    HEADERS_EVENTS,
+    HEADERS_ACCELERATOR,
+    REGISTRATION_WIDTH,
+    SheetCursor,
+    column_letter,
+    count_first_registrations,
+    make_cursor,
+    registration_user_ids,
+    to_record,
+    trim_row,
+)
+from utils.forms import FORMS
+
+logger = logging.getLogger(__name__)
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+]
+
+
+class SheetsApiError(Exception):
+    """Ответ Google API с кодом ошибки."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+
+def is_unavailable(error: Exception) -> bool:
+    """Google API перегружен или недоступен (429, 5xx, сеть) — запрос стоит повторить позже."""
+    if isinstance(error, SheetsApiError):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+
+
+def _is_sheet_missing(error: Exception) -> bool:
+    return isinstance(error, SheetsApiError) and "Unable to parse range" in error.message
+
+
+def _a1(sheet_name: str, cells: str = "") -> str:
+    """Диапазон в нотации A1 с экранированным именем листа."""
+    name = "'" + sheet_name.replace("'", "''") + "'"
+    return f"{name}!{cells}" if cells else name
+
+
+async def _raise_for_status(response: aiohttp.ClientResponse) -> None:
+    if response.status < 400:
+        return
+    try:
+        message = (await response.json(content_type=None))["error"]["message"]
+    except Exception:
+        message = response.reason or ""
+    raise SheetsApiError(response.status, message)
+
+
+class ServiceAccountToken:
+    """
+    Access-токен сервисного аккаунта. `get()` отдаёт действующий токен;
+    если до истечения меньше `refresh_margin` секунд, новый запрашивается
+    в фоне, а запросы пока идут со старым.
+    Ключ из credentials.json читается при первом запросе токена, а не в
+    конструкторе: без ключа бот стартует, а ошибку получают вызовы Sheets.
+    """
+
+    def __init__(self, credentials_file: str, scopes: Sequence[str], refresh_margin: float = 300.0):
+        self._credentials_file = credentials_file
+        self._info: Optional[Dict] = None
+        self._signer = None
+        self._scopes = " ".join(scopes)
+        self.refresh_margin = refresh_margin
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refresh: Optional[asyncio.Task] = None
+
+    def _load(self) -> Dict:
+        """Читает ключ сервисного аккаунта (один раз; при ошибке — снова в следующий раз)."""
+        if self._info is None:
+            with open(self._credentials_file, encoding="utf-8") as f:
+                info = json.load(f)
+            self._signer = crypt.Signer.from_string(info["private_key"])
+            self._info = info
+        return self._info
+
+    @property
+    def token_uri(self) -> str:
+        return self._load().get("token_uri", GOOGLE_TOKEN_URI)
+
+    def _assertion(self) -> str:
+        info = self._load()
+        now = int(time.time())
+        payload = {
+            "iss": info["client_email"],
+            "scope": self._scopes,
+            "aud": self.token_uri,
+            "iat": now,
+            "exp": now + 3600,
+        }
+        return crypt.make_signed_jwt(
+            self._signer, payload, key_id=info.get("private_key_id")
+        ).decode()
+
+    async def _fetch(self, session: aiohttp.ClientSession) -> None:
+        data = {
+            "grant_type": "urn:ietf:params:oauth:grant-type:jwt-bearer",
+            "assertion": self._assertion(),
+        }
+        async with session.post(self.token_uri, data=data) as response:
+            await _raise_for_status(response)
+            body = await response.json(content_type=None)
+        self._token = body["access_token"]
+        self._expires_at = time.time() + float(body.get("expires_in", 3600))
+        logger.debug("Service account token refreshed, expires in %ss", body.get("expires_in"))
+
+    @staticmethod
+    def _log_refresh_error(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Background token refresh failed: %s", task.exception())
+
+    def _start_refresh(self, session: aiohttp.ClientSession) -> asyncio.Task:
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.create_task(self._fetch(session))
+            self._refresh.add_done_callback(self._log_refresh_error)
+        return self._refresh
+
+    async def get(self, session: aiohttp.ClientSession) -> str:
+        remaining = self._expires_at - time.time()
+        if self._token is not None and remaining > 0:
+            if remaining < self.refresh_margin:
+                self._start_refresh(session)
+            return self._token
+        await asyncio.shield(self._start_refresh(session))
+        return self._token
+
+    def invalidate(self) -> None:
+        """Токен отклонён API (401) — следующий `get()` запросит новый."""
+        self._expires_at = 0.0
+
+
+class RestSheetsService:
+    """
+    Доступ к книге через REST API Sheets v4. Один экземпляр на процесс,
+    используется через AsyncSheetsService (предохранитель, таймауты, статистика).
+    Ошибки недоступности (`is_unavailable`) пробрасываются, остальные
+    логируются, и методы возвращают пустой результат — как в GoogleSheetsService.
+    """
+
+    # Какие ошибки считает предохранитель AsyncSheetsService
+    is_unavailable = staticmethod(is_unavailable)
+
+    def __init__(
+        self,
+        credentials_file: str = CREDENTIALS_FILE,
+        spreadsheet_id: str = SPREADSHEET_ID,
+        max_connections: int = 4,
+        timeout: float = 30.0,
+        full_resync_interval: float = 86400.0,
+        api_url: str = SHEETS_API_URL,
+        drive_url: str = DRIVE_API_URL,
+    ):
+        self._token = ServiceAccountToken(credentials_file, SCOPES)
+        self._spreadsheet_id = spreadsheet_id
+        self._values_url = f"{api_url.rstrip('/')}/spreadsheets/{spreadsheet_id}/values"
+        self._drive_url = drive_url.rstrip("/")
+        self.max_connections = max_connections
+        self.timeout = timeout
+        # Сессия создаётся при первом запросе — внутри работающего event loop
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._headers_checked: Set[str] = set()
+        self._full_resync_interval = full_resync_interval
+        self._cursors: Dict[str, SheetCursor] = {}
+        # False — Drive API недоступен, изменения ищутся по последней строке
+        self._check_modified = True
+        self._lock = asyncio.Lock()
+
+    def set_timeout(self, timeout: float) -> None:
+        """Таймаут одного HTTP-запроса (секунды)."""
+        self.timeout = timeout
+
+    async def connect(self) -> None:
+        """Открывает сессию и получает токен заранее, чтобы первый запрос не ждал их."""
+        await self._token.get(self._get_session())
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_connections, keepalive_timeout=60, ttl_dns_cache=300
+                ),
+                # Google отдаёт gzip, только если он упомянут и в User-Agent
+                headers={"Accept-Encoding": "gzip", "User-Agent": "vorona-bot (gzip)"},
+            )
+        return self._session
+
+    async def _request(self, method: str, url: str, **kwargs) -> Dict:
+        session = self._get_session()
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        for attempt in range(2):
+            token = await self._token.get(session)
+            headers = {"Authorization": f"Bearer {token}"}
+            async with session.request(method, url, headers=headers, timeout=timeout, **kwargs) as response:
+                if response.status == 401 and attempt == 0:
+                    self._token.invalidate()
+                    continue
+                await _raise_for_status(response)
+                return await response.json(content_type=None)
+
+    def _forget_sheet(self, name: str, error: Exception) -> None:
+        """Сбрасывает кэши листа, если ошибка говорит, что он не найден."""
+        if _is_sheet_missing(error):
+            self._headers_checked.discard(name)
+            self._cursors.pop(name, None)
+
+    async def _batch_get(self, ranges: List[str]) -> List[List[List]]:
+        """Значения нескольких диапазонов одним запросом (пустой диапазон — [])."""
+        body = await self._request(
+            "GET",
+            f"{self._values_url}:batchGet",
+            params=[("ranges", r) for r in ranges] + [("fields", "valueRanges(values)")],
+        )
+        value_ranges = body.get("valueRanges", [])
+        return [vr.get("values", []) for vr in value_ranges] + [[]] * (len(ranges) - len(value_ranges))
+
+    async def _batch_update(self, data: List[Tuple[str, List[List]]]) -> None:
+        await self._request(
+            "POST",
+            f"{self._values_url}:batchUpdate",
+            params={"fields": "totalUpdatedRows"},
+            json={
+                "valueInputOption": "RAW",
+                "data": [{"range": r, "values": values} for r, values in data],
+            },
+        )
+
+    async def _ensure_headers(self, sheet_name: str, headers: List[str]) -> None:
+        """Пишет строку заголовков, если первая строка листа пуста (проверка — один раз на лист)."""
+        if sheet_name in self._headers_checked:
+            return
+        (first_row,) = await self._batch_get([_a1(sheet_name, "1:1")])
+        if not first_row:
+            await self._batch_update([(_a1(sheet_name, "A1"), [headers])])
+        self._headers_checked.add(sheet_name)
+
+    async def _workbook_version(self) -> Optional[str]:
+        """modifiedTime книги; None, если Drive API недоступен сервисному аккаунту."""
+        if not self._check_modified:
+            return None
+        try:
+            return await self.get_modified_time()
+        except SheetsApiError as e:
+            if is_unavailable(e):
+                raise
+            logger.warning("Drive API unavailable, sheet edits are detected by the last row: %s", e)
+            self._check_modified = False
+            return None
+
+    async def _read_many(self, sheet_names: Sequence[str]) -> Dict[str, List[Dict]]:
+        """
+        Строки листов регистраций как словари; все листы — одним batchGet.
+
+        Как в GoogleSheetsService._read_records: лист читается целиком только
+        в первый раз, дальше — начиная с последней прочитанной строки. Если она
+        изменилась или прошло `full_resync_interval` секунд, лист перечитывается.
+        Если modifiedTime книги не изменился, строки отдаются из кэша без
+        запросов к Sheets.
+        """
+        now = time.monotonic()
+        modified_time = await self._workbook_version()
+        names, ranges = [], []
+        for name in sheet_names:
+            cursor = self._cursors.get(name)
+            if cursor is not None and now - cursor.synced_at >= self._full_resync_interval:
+                cursor = None
+            elif cursor is not None and modified_time is not None and cursor.modified_time == modified_time:
+                continue  # книга не менялась — строки из кэша
+            if cursor is None:
+                self._cursors.pop(name, None)
+                start = 1
+            else:
+                start = len(cursor.records) + 1
+            names.append(name)
+            ranges.append(_a1(name, f"A{start}:{column_letter(REGISTRATION_WIDTH[name])}"))
+
+        resync = []
+        for name, values in zip(names, await self._batch_get(ranges) if ranges else []):
+            cursor = self._cursors.get(name)
+            if cursor is None:
+                self._cursors[name] = make_cursor(values, modified_time)
+            elif not values or trim_row(values[0]) != cursor.last_row:
+                resync.append(name)
+            else:
+                cursor.records.extend(to_record(cursor.headers, row) for row in values[1:])
+                cursor.last_row = trim_row(values[-1])
+                cursor.modified_time = modified_time
+
+        if resync:
+            ranges = [_a1(name, f"A1:{column_letter(REGISTRATION_WIDTH[name])}") for name in resync]
+            for name, values in zip(resync, await self._batch_get(ranges)):
+                self._cursors[name] = make_cursor(values, modified_time)
+        return {name: self._cursors[name].records for name in sheet_names}
+
+    async def _read_records(self, *sheet_names: str) -> Dict[str, List[Dict]]:
+        async with self._lock:
+            return await self._read_many(sheet_names)
+
+    def build_row(self, event_type: str, user_data: Dict) -> Tuple[str, List]:
+        """
+        Возвращает (имя листа, строка) для регистрации.
+        event_type: "accelerator" | "events"
+        """
+        form = FORMS[event_type]
+        return form.sheet_name, form.row(user_data)
+
+    async def append_rows(self, sheet_name: str, rows: List[List]) -> bool:
+        """Дописывает несколько строк в лист одним запросом к API."""
+        headers = HEADERS_EVENTS if sheet_name == SHEET_NAME_EVENTS else HEADERS_ACCELERATOR
+        try:
+            await self._ensure_headers(sheet_name, headers)
+            await self._request(
+                "POST",
+                f"{self._values_url}/{quote(_a1(sheet_name), safe='')}:append",
+                params={
+                    "valueInputOption": "RAW",
+                    "insertDataOption": "INSERT_ROWS",
+                    "fields": "updates(updatedRows)",
+                },
+                json={"values": rows},
+            )
+            return True
+        except Exception as e:
+            logger.error("Error saving to Google Sheets: %s", e)
+            # Лист могли пересоздать или очистить — перепроверим заголовки
+            self._headers_checked.discard(sheet_name)
+            self._forget_sheet(sheet_name, e)
+            if is_unavailable(e):
+                raise
+            return False
+
+    async def update_registration(self, event_type: str, user_data: Dict) -> bool:
+        """
+        Перезаписывает последнюю строку пользователя в листе (повторная анкета).
+        Если строки ещё нет, дописывает новую.
+        """
+        sheet_name, row = self.build_row(event_type, user_data)
+        user_id = str(user_data["user_id"])
+        try:
+            async with self._lock:
+                records = (await self._read_many([sheet_name]))[sheet_name]
+                index = next(
+                    (i for i in range(len(records) - 1, -1, -1)
+                     if str(records[i].get("ID пользователя")) == user_id),
+                    None,
+                )
+                if index is not None:
+                    n = index + 2  # строка 1 — заголовки
+                    await self._batch_update(
+                        [(_a1(sheet_name, f"A{n}:{column_letter(len(row))}{n}"), [row])]
+                    )
+                    cursor = self._cursors[sheet_name]
+                    cursor.records[index] = to_record(cursor.headers, row)
+                    if index == len(cursor.records) - 1:
+                        cursor.last_row = trim_row(row)
+                    return True
+        except Exception as e:
+            logger.error("Error updating registration in Google Sheets: %s", e)
+            self._forget_sheet(sheet_name, e)
+            if is_unavailable(e):
+                raise
+            return False
+        return await self.append_rows(sheet_name, [row])
+
+    async def save_registration(self, event_type: str, user_data: Dict) -> bool:
+        """
+        Сохраняет регистрацию в лист по типу события.
+        event_type: "accelerator" | "events"
+        """
+        try:
+            sheet_name, row = self.build_row(event_type, user_data)
+        except KeyError as e:
+            logger.error("Error saving to Google Sheets: missing field %s", e)
+            return False
+        return await self.append_rows(sheet_name, [row])
+
+    async def get_admin_ids(self) -> List[int]:
+        """
+        Возвращает список Telegram user_id админов из листа «Админы».
+        Если лист не существует или пуст — возвращает пустой список.
+        """
+        try:
+            (values,) = await self._batch_get([_a1(SHEET_NAME_ADMINS, "A1:B")])
+        except Exception as e:
+            logger.error("Error getting admin ids from Google Sheets: %s", e)
+            if is_unavailable(e):
+                raise
+            return []
+        if not values:
+            return []
+        headers = [str(v).strip() for v in values[0]]
+        admin_ids: List[int] = []
+        for row in values[1:]:
+            uid = to_record(headers, row).get("ID админа")
+            if uid is not None and str(uid).strip():
+                try:
+                    admin_ids.append(int(uid))
+                except (ValueError, TypeError):
+                    pass
+        return admin_ids
+
+    async def get_modified_time(self) -> str:
+        """Время последнего изменения книги (Drive API, поле modifiedTime)."""
+        body = await self._request(
+            "GET",
+            f"{self._drive_url}/files/{self._spreadsheet_id}",
+            params={"fields": "modifiedTime", "supportsAllDrives": "true"},
+        )
+        return body["modifiedTime"]
+
+    async def get_registration_records(self, event_type: str) -> List[Dict]:
+        """
+        Возвращает все строки листа регистраций как словари (ключи — заголовки).
+        Если листа нет — пустой список; остальные ошибки пробрасываются, чтобы
+        импорт в локальное хранилище не посчитал лист пустым.
+        event_type: "accelerator" | "events"
+        """
+        sheet_name = SHEET_NAME_EVENTS if event_type == "events" else SHEET_NAME_ACCELERATOR
+        try:
+            return list((await self._read_records(sheet_name))[sheet_name])
+        except Exception as e:
+            self._forget_sheet(sheet_name, e)
+            if _is_sheet_missing(e):
+                return []
+            raise
+
+    async def get_user_ids(self, audience: str) -> List[int]:
+        """
+        Возвращает список Telegram user_id для рассылки.
+        audience: "all" | "accelerator" | "events"
+        """
+        names = []
+        if audience in ("all", "events"):
+            names.append(SHEET_NAME_EVENTS)
+        if audience in ("all", "accelerator"):
+            names.append(SHEET_NAME_ACCELERATOR)
+        try:
+            records = await self._read_records(*names)
+        except Exception as e:
+            logger.error("Error getting user ids from Google Sheets: %s", e)
+            for name in names:
+                self._forget_sheet(name, e)
+            if is_unavailable(e):
+                raise
+            return []
+        user_ids: List[int] = []
+        for name in names:
+            user_ids += registration_user_ids(records[name])
+        # Повторные регистрации одного пользователя — один получатель
+        return list(dict.fromkeys(user_ids))
+
+    async def count_windows(self, windows: Mapping[str, datetime]) -> Dict[str, Dict[str, int]]:
+        """
+        Количество зарегистрировавшихся для нескольких окон за одно чтение листов.
+        Возвращает {имя окна: {"events": N, "accelerator": N}}.
+        """
+        try:
+            records = await self._read_records(SHEET_NAME_EVENTS, SHEET_NAME_ACCELERATOR)
+        except Exception as e:
+            logger.error("Error getting registration stats: %s", e)
+            self._forget_sheet(SHEET_NAME_EVENTS, e)
+            self._forget_sheet(SHEET_NAME_ACCELERATOR, e)
+            if is_unavailable(e):
+                raise
+            return {name: {"events": 0, "accelerator": 0} for name in windows}
+        return count_first_registrations({
+            "events": records[SHEET_NAME_EVENTS],
+            "accelerator": records[SHEET_NAME_ACCELERATOR],
+        }, windows)
+
+    async def get_registrations_count_last_hour(self) -> Dict[str, int]:
+        """Количество зарегистрировавшихся за последний час: {"events": N, "accelerator": N}."""
+        since = datetime.now() - timedelta(hours=1)
+        return (await self.count_windows({"hour": since}))["hour"]
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
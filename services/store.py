@@ -0,0 +1,293 @@
+"""
+Локальное хранилище регистраций (SQLite).
+
+Основная модель для чтения: аудитории рассылки и статистика за период
+считаются индексированными запросами, без обращения к Google Sheets.
+Каждая подтверждённая анкета пишется сюда, а в таблицу попадает через
+RegistrationQueue. Существующие строки листов один раз импортируются сюда
+(`import_rows`); удачный импорт листа отмечается в таблице imports, пока
+отметки нет — импорт повторяется.
+
+Индекс в памяти (event_type, user_id) -> (id, дата регистрации) строится
+из базы в фоне после старта (`load`, и заново после импорта из листов) и позволяет за O(1) узнать,
+что пользователь уже зарегистрирован: повторная анкета обновляет прежнюю запись, а не добавляет
+новую.
+
+Статистика за последние дни считается по счётчикам в памяти
+(RegistrationCounters): при загрузке индекса они заполняются из базы, а затем
+дочитывают только новые строки (в том числе добавленные другими процессами).
+Пока индекс не загружен, те же ответы даёт база, просто медленнее.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from services.counters import RegistrationCounters
+
+logger = logging.getLogger(__name__)
+
+DATE_FMT = "%Y-%m-%d %H:%M:%S"
+
+IndexRow = Tuple[str, int, int, str]
+
+
+def _read_index(db: sqlite3.Connection) -> Tuple[int, List[IndexRow]]:
+    """Последний id и строки индекса (event_type, user_id, id, дата первой регистрации)."""
+    counted_id = db.execute("SELECT COALESCE(MAX(id), 0) FROM registrations").fetchone()[0]
+    # Для старых повторов (до появления индекса) берём последнюю запись, дата — первой
+    rows = db.execute(
+        "SELECT event_type, user_id, MAX(id), MIN(registered_at) FROM registrations"
+        " WHERE id <= ? GROUP BY event_type, user_id",
+        (counted_id,),
+    ).fetchall()
+    return counted_id, rows
+
+
+class RegistrationStore:
+    def __init__(self, db_path: str):
+        self._db_path = db_path
+        self._db = sqlite3.connect(db_path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS registrations ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " event_type TEXT NOT NULL,"
+            " user_id INTEGER NOT NULL,"
+            " registered_at TEXT NOT NULL,"
+            " payload TEXT NOT NULL"
+            ");"
+            "CREATE INDEX IF NOT EXISTS ix_registrations_event_time"
+            " ON registrations (event_type, registered_at);"
+            "CREATE INDEX IF NOT EXISTS ix_registrations_event_user"
+            " ON registrations (event_type, user_id);"
+            "CREATE INDEX IF NOT EXISTS ix_registrations_user"
+            " ON registrations (user_id);"
+            "CREATE TABLE IF NOT EXISTS imports ("
+            " event_type TEXT PRIMARY KEY,"
+            " imported_at TEXT NOT NULL,"
+            " rows INTEGER NOT NULL"
+            ");"
+        )
+        self._db.commit()
+        self._index: Dict[Tuple[str, int], Tuple[int, str]] = {}
+        self.counters = RegistrationCounters()
+        # Последняя строка, учтённая в счётчиках
+        self._counted_id = 0
+        # Индекс и счётчики загружены (load); до этого ответы берутся из базы
+        self.loaded = False
+
+    async def load(self) -> None:
+        """Строит индекс и счётчики в отдельном потоке, не блокируя event loop."""
+        def read() -> Tuple[int, List[IndexRow]]:
+            db = sqlite3.connect(self._db_path)
+            try:
+                return _read_index(db)
+            finally:
+                db.close()
+
+        self._apply_index(*await asyncio.to_thread(read))
+
+    def _load_index(self) -> None:
+        self._apply_index(*_read_index(self._db))
+
+    def _apply_index(self, counted_id: int, rows: List[IndexRow]) -> None:
+        """Подменяет индекс повторов и счётчики (по первой регистрации пользователя)."""
+        index = {(event_type, user_id): (row_id, registered_at)
+                 for event_type, user_id, row_id, registered_at in rows}
+        # Строки, добавленные, пока индекс строился, дочитает _sync_counters
+        index.update({key: entry for key, entry in self._index.items() if entry[0] > counted_id})
+        self._index = index
+        self._counted_id = counted_id
+        self.counters.reset()
+        since = datetime.now() - timedelta(days=self.counters.days)
+        for (event_type, _), (row_id, registered_at) in index.items():
+            if row_id <= counted_id:
+                self._count(event_type, registered_at, since)
+        self.loaded = True
+
+    def _count(self, event_type: str, registered_at: str, since: datetime) -> None:
+        try:
+            when = datetime.strptime(registered_at, DATE_FMT)
+        except ValueError:
+            return
+        if when >= since:
+            self.counters.record(event_type, when)
+
+    def _sync_counters(self) -> None:
+        """
+        Дочитывает в счётчики строки, добавленные после последней проверки.
+        Как и в _apply_index, пользователь учитывается один раз — по первой
+        регистрации: строка, у которой есть более ранняя, пропускается.
+        """
+        if not self.loaded:
+            return
+        rows = self._db.execute(
+            "SELECT id, event_type, user_id, registered_at FROM registrations"
+            " WHERE id > ? ORDER BY id",
+            (self._counted_id,),
+        ).fetchall()
+        since = datetime.now() - timedelta(days=self.counters.days)
+        for row_id, event_type, user_id, registered_at in rows:
+            earlier = self._db.execute(
+                "SELECT 1 FROM registrations WHERE event_type = ? AND user_id = ? AND id < ? LIMIT 1",
+                (event_type, user_id, row_id),
+            ).fetchone()
+            if earlier is None:
+                self._count(event_type, registered_at, since)
+            self._counted_id = row_id
+
+    def _lookup(self, event_type: str, user_id: int) -> Optional[Tuple[int, str]]:
+        key = (event_type, user_id)
+        entry = self._index.get(key)
+        if entry is None:
+            # Строку мог добавить другой процесс (импорт из листов у лидера)
+            row = self._db.execute(
+                "SELECT MAX(id), MIN(registered_at) FROM registrations"
+                " WHERE event_type = ? AND user_id = ?",
+                key,
+            ).fetchone()
+            if row[0] is not None:
+                entry = self._index[key] = (row[0], row[1])
+        return entry
+
+    def registered_at(self, event_type: str, user_id: int) -> Optional[str]:
+        """Дата регистрации пользователя на мероприятие или None, если её не было."""
+        entry = self._lookup(event_type, user_id)
+        return entry[1] if entry else None
+
+    def add(self, event_type: str, user_data: Dict) -> bool:
+        """
+        Сохраняет регистрацию.
+        event_type: "accelerator" | "events"
+        """
+        try:
+            user_id = int(user_data["user_id"])
+            cursor = self._db.execute(
+                "INSERT INTO registrations (event_type, user_id, registered_at, payload)"
+                " VALUES (?, ?, ?, ?)",
+                (
+                    event_type,
+                    user_id,
+                    user_data["registration_date"],
+                    json.dumps(user_data, ensure_ascii=False),
+                ),
+            )
+            self._db.commit()
+        except (sqlite3.Error, KeyError, ValueError, TypeError) as e:
+            logger.error("Failed to store registration: %s", e)
+            return False
+        self._index[(event_type, user_id)] = (cursor.lastrowid, user_data["registration_date"])
+        self._sync_counters()
+        return True
+
+    def update(self, event_type: str, user_data: Dict) -> bool:
+        """
+        Заменяет анкету уже зарегистрированного пользователя (дата регистрации
+        остаётся прежней). Если записи нет — добавляет новую.
+        """
+        try:
+            entry = self._lookup(event_type, int(user_data["user_id"]))
+            if entry is None:
+                return self.add(event_type, user_data)
+            self._db.execute(
+                "UPDATE registrations SET payload = ? WHERE id = ?",
+                (json.dumps(user_data, ensure_ascii=False), entry[0]),
+            )
+            self._db.commit()
+            return True
+        except (sqlite3.Error, KeyError, ValueError, TypeError) as e:
+            logger.error("Failed to update registration: %s", e)
+            return False
+
+    def is_imported(self, event_type: str) -> bool:
+        """Регистрации из листа уже перенесены в хранилище."""
+        return self._db.execute(
+            "SELECT 1 FROM imports WHERE event_type = ?", (event_type,)
+        ).fetchone() is not None
+
+    def import_rows(self, event_type: str, rows: Iterable[Dict]) -> int:
+        """
+        Загружает регистрации, прочитанные из листа (ключи — заголовки листа),
+        и отмечает лист импортированным. Строки без ID пользователя или даты
+        пропускаются, как и пользователи, которые уже есть в хранилище (их
+        анкеты новее или уже попали в лист из очереди).
+        Возвращает количество загруженных строк.
+        """
+        known = {user_id for (user_id,) in self._db.execute(
+            "SELECT DISTINCT user_id FROM registrations WHERE event_type = ?", (event_type,)
+        )}
+        items = []
+        for row in rows:
+            try:
+                user_id = int(row.get("ID пользователя"))
+            except (ValueError, TypeError):
+                continue
+            registered_at = str(row.get("Дата регистрации") or "").strip()
+            if not registered_at or user_id in known:
+                continue
+            items.append(
+                (event_type, user_id, registered_at, json.dumps(row, ensure_ascii=False, default=str))
+            )
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO registrations (event_type, user_id, registered_at, payload)"
+                " VALUES (?, ?, ?, ?)",
+                items,
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO imports (event_type, imported_at, rows) VALUES (?, ?, ?)",
+                (event_type, datetime.now().strftime(DATE_FMT), len(items)),
+            )
+        self._load_index()
+        return len(items)
+
+    async def get_user_ids(self, audience: str) -> List[int]:
+        """
+        Возвращает список Telegram user_id для рассылки (без повторов).
+        audience: "all" | "accelerator" | "events"
+        """
+        if audience == "all":
+            rows = self._db.execute(
+                "SELECT user_id FROM registrations GROUP BY user_id ORDER BY MIN(id)"
+            )
+        else:
+            rows = self._db.execute(
+                "SELECT user_id FROM registrations WHERE event_type = ?"
+                " GROUP BY user_id ORDER BY MIN(id)",
+                (audience,),
+            )
+        return [user_id for (user_id,) in rows]
+
+    def count_since(self, since: datetime) -> Dict[str, int]:
+        """
+        Количество пользователей, впервые зарегистрировавшихся начиная с `since`
+        (каждый один раз): {"events": N, "accelerator": N}.
+        В пределах окна счётчиков ответ берётся из памяти, иначе — запросом к базе.
+        """
+        if self.loaded and self.counters.covers(since):
+            self._sync_counters()
+            return self.counters.counts_since(since)
+        result = {"events": 0, "accelerator": 0}
+        for event_type in result:
+            result[event_type] = self._db.execute(
+                "SELECT COUNT(*) FROM ("
+                " SELECT MIN(registered_at) AS first_at FROM registrations"
+                " WHERE event_type = ? GROUP BY user_id"
+                ") WHERE first_at >= ?",
+                (event_type, since.strftime(DATE_FMT)),
+            ).fetchone()[0]
+        return result
+
+    async def count_windows(self, windows: Mapping[str, datetime]) -> Dict[str, Dict[str, int]]:
+        """Количество регистраций для нескольких окон: {имя окна: {"events": N, "accelerator": N}}."""
+        return {name: self.count_since(since) for name, since in windows.items()}
+
+    async def get_registrations_count_last_hour(self) -> Dict[str, int]:
+        """
+        Возвращает количество регистраций за последний час по каждому типу.
+        Возвращает {"events": N, "accelerator": N}.
+        """
+        return self.count_since(datetime.now() - timedelta(hours=1))
@@ -0,0 +1,116 @@
+"""
+Режим вебхука с несколькими процессами-воркерами.
+
+Главный процесс принимает вебхук Telegram и пересылает каждый апдейт одному
+из воркеров по chat_id (`chat_id % N`). Апдейты одного чата идут строго по
+очереди: следующий пересылается только после того, как воркер обработал
+предыдущий. Поэтому анкета пользователя всегда обрабатывается одним
+процессом и в правильном порядке, а разные чаты — параллельно на N ядрах.
+
+Воркер — обычное aiohttp-приложение с `SimpleRequestHandler` aiogram на
+127.0.0.1; он обрабатывает апдейт до ответа (`handle_in_background=False`).
+"""
+import asyncio
+import json
+import logging
+from typing import Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def route_key(update: Dict) -> int:
+    """Чат, к которому относится апдейт (для пользователя — его личный чат)."""
+    for value in update.values():
+        if not isinstance(value, dict):
+            continue
+        chat = value.get("chat") or (value.get("message") or {}).get("chat")
+        if chat:
+            return int(chat["id"])
+        user = value.get("from") or value.get("user")
+        if user:
+            return int(user["id"])
+    return int(update.get("update_id", 0))
+
+
+class UpdateRouter:
+    """Принимает вебхук Telegram и пересылает апдейты воркерам."""
+
+    def __init__(self, worker_urls: List[str], secret_token: str = "", timeout: float = 60.0):
+        self._urls = worker_urls
+        self._secret = secret_token
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._waiting: Dict[int, int] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def _on_startup(self, app: web.Application) -> None:
+        self._session = aiohttp.ClientSession(timeout=self._timeout)
+
+    async def _on_cleanup(self, app: web.Application) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+    def register(self, app: web.Application, path: str) -> None:
+        app.router.add_post(path, self.handle)
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self._secret and request.headers.get(SECRET_HEADER) != self._secret:
+            return web.Response(status=401)
+        body = await request.read()
+        try:
+            key = route_key(json.loads(body))
+        except (ValueError, TypeError, KeyError):
+            return web.Response(status=400)
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._waiting[key] = self._waiting.get(key, 0) + 1
+        try:
+            async with lock:
+                return await self._forward(self._urls[key % len(self._urls)], body)
+        finally:
+            self._waiting[key] -= 1
+            if not self._waiting[key]:
+                del self._waiting[key]
+                del self._locks[key]
+
+    async def _forward(self, url: str, body: bytes) -> web.Response:
+        headers = {"Content-Type": "application/json"}
+        if self._secret:
+            headers[SECRET_HEADER] = self._secret
+        try:
+            async with self._session.post(url, data=body, headers=headers) as resp:
+                payload = await resp.read()
+                return web.Response(status=resp.status, body=payload, content_type=resp.content_type)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error("Worker %s unavailable: %s", url, e)
+            # Telegram повторит доставку апдейта
+            return web.Response(status=503)
+
+
+def build_worker_app(dp: Dispatcher, bot: Bot, path: str, secret_token: str = "") -> web.Application:
+    """aiohttp-приложение воркера: обрабатывает апдейты, пересланные роутером."""
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=False,
+        secret_token=secret_token or None,
+    ).register(app, path=path)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+def build_router_app(worker_urls: List[str], path: str, secret_token: str = "") -> web.Application:
+    """aiohttp-приложение главного процесса: принимает вебхук Telegram."""
+    app = web.Application()
+    UpdateRouter(worker_urls, secret_token).register(app, path)
+    return app
@@ -0,0 +1,37 @@
+import asyncio
+
+from services import admins
+from services.admin_sync import AdminSync
+
+
+class StubSheets:
+    def __init__(self, ids):
+        self.ids = ids
+        self.reads = 0
+
+    async def get_admin_ids(self):
+        self.reads += 1
+        return list(self.ids)
+
+
+def test_refresh_reports_only_real_changes():
+    async def main():
+        admins.set_admin_ids([])
+        sheets = StubSheets([1, 2])
+        sync = AdminSync(sheets)
+        seen = []
+        unsubscribe = admins.subscribe(seen.append)
+        try:
+            assert await sync.refresh()
+            assert not await sync.refresh()
+            sheets.ids = [2, 1]
+            assert not await sync.refresh()
+            sheets.ids = [2, 3]
+            assert await sync.refresh()
+        finally:
+            unsubscribe()
+        assert [s.ids for s in seen] == [frozenset({1, 2}), frozenset({2, 3})]
+        assert admins.is_admin(3) and not admins.is_admin(1)
+        assert sheets.reads == 4
+
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+import asyncio
+from types import SimpleNamespace
+
+from services.broadcast_jobs import BroadcastJobManager
+from services.broadcaster import BroadcastResult
+from services.ledger import BroadcastLedger
+
+
+class StubBot:
+    async def send_message(self, chat_id, text, **kwargs):
+        return SimpleNamespace(chat=SimpleNamespace(id=chat_id), message_id=1)
+
+    async def edit_message_text(self, *args, **kwargs):
+        pass
+
+
+class SlowBroadcaster:
+    """Отправляет по одному сообщению в 10 мс, пока не попросят остановиться."""
+
+    async def broadcast(self, user_ids, text, on_progress=None, cancel=None):
+        result = BroadcastResult()
+        for i, user_id in enumerate(user_ids):
+            if cancel.is_set():
+                result.cancelled = True
+                break
+            await asyncio.sleep(0.01)
+            result.sent.append((user_id, 100 + i))
+            on_progress(result)
+        return result
+
+
+def test_stop_before_delete_leaves_no_rows(tmp_path):
+    async def main():
+        ledger = BroadcastLedger(str(tmp_path / "ledger.db"))
+        jobs = BroadcastJobManager(SlowBroadcaster(), flush_size=5, flush_interval=60)
+        broadcast_id = ledger.create(chat_id=1, message_id=10)
+        done = []
+
+        async def on_done(job):
+            done.append(job)
+            ledger.add_alias(broadcast_id, 1, 11)
+
+        await jobs.start(
+            StubBot(), 1, list(range(1000)), "hi",
+            on_done=on_done,
+            on_sent=lambda batch: ledger.add_messages(broadcast_id, batch),
+            broadcast_id=broadcast_id,
+        )
+        await asyncio.sleep(0.1)
+
+        job = jobs.find(broadcast_id)
+        assert job is not None
+        await jobs.stop(job)
+        assert done and done[0].result.cancelled
+        assert jobs.find(broadcast_id) is None
+        # Все доставленные записаны к моменту остановки
+        assert len(ledger.messages(broadcast_id)) == len(job.result.sent)
+
+        ledger.delete(broadcast_id)
+        assert ledger.created_at(broadcast_id) is None
+        assert ledger.find(1, 11) is None
+        assert ledger.messages(broadcast_id) == []
+
+    asyncio.run(main())
+
+
+def test_purge_removes_rows_of_deleted_broadcasts(tmp_path):
+    ledger = BroadcastLedger(str(tmp_path / "ledger.db"))
+    broadcast_id = ledger.create(chat_id=1, message_id=10)
+    ledger.delete(broadcast_id)
+    # Запоздавшая запись задания уже удалённой рассылки
+    ledger.add_messages(broadcast_id, [(5, 50)])
+    ledger.add_alias(broadcast_id, 1, 12)
+
+    kept = ledger.create(chat_id=1, message_id=20)  # create() вызывает purge()
+    ledger.add_messages(kept, [(6, 60)])
+    assert ledger.messages(broadcast_id) == []
+    assert ledger.find(1, 12) is None
+    assert ledger.messages(kept) == [(6, 60)]
+    assert ledger.find(1, 20) == kept
@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+
+from services import circuit_breaker
+from services.async_sheets import AsyncSheetsService, SheetsUnavailable
+from services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", clock)
+    return clock
+
+
+def open_breaker(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+
+def test_opens_after_threshold(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=5)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.retry_in() == 5
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_allows_single_probe(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=5)
+    open_breaker(breaker)
+    clock.now += 5
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_failed_probe_doubles_timeout_up_to_max(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=5, max_reset_timeout=15)
+    open_breaker(breaker)
+    for expected in (10, 15, 15):
+        clock.now += breaker.retry_in()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert breaker.retry_in() == expected
+
+
+def test_release_probe_allows_next_probe(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=5)
+    open_breaker(breaker)
+    clock.now += 5
+    assert breaker.allow()
+    breaker.release_probe()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+
+
+class StubSheets:
+    """Асинхронный бэкенд: вызов висит, пока не выставлен `done`."""
+
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.done = asyncio.Event()
+
+    def set_timeout(self, timeout: float) -> None:
+        pass
+
+    @staticmethod
+    def is_unavailable(error: Exception) -> bool:
+        return True
+
+    async def get_admin_ids(self):
+        self.started.set()
+        await self.done.wait()
+        return [1]
+
+
+def test_cancelled_probe_does_not_wedge_breaker(clock):
+    async def main():
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=5)
+        sheets = AsyncSheetsService(StubSheets(), breaker=breaker)
+        open_breaker(breaker)
+        clock.now += 5
+
+        probe = asyncio.create_task(sheets.get_admin_ids())
+        await sheets.sheets.started.wait()
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        assert breaker.state == HALF_OPEN
+        assert sheets.stats()["in_flight"] == 0
+        sheets.sheets.done.set()
+        assert await sheets.get_admin_ids() == [1]
+        assert breaker.state == CLOSED
+
+    asyncio.run(main())
+
+
+def test_cancelled_call_while_closed_keeps_probe(clock):
+    async def main():
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=5)
+        sheets = AsyncSheetsService(StubSheets(), breaker=breaker)
+        call = asyncio.create_task(sheets.get_admin_ids())
+        await sheets.sheets.started.wait()
+
+        # Пока вызов висел, цепь разомкнулась и пропустила другой пробный вызов
+        open_breaker(breaker)
+        clock.now += 5
+        assert breaker.allow()
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        assert not breaker.allow()
+
+    asyncio.run(main())
+
+
+def test_rejects_while_open(clock):
+    async def main():
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=5)
+        sheets = AsyncSheetsService(StubSheets(), breaker=breaker)
+        open_breaker(breaker)
+        with pytest.raises(SheetsUnavailable) as error:
+            await sheets.get_admin_ids()
+        assert error.value.reason == "rejected"
+
+    asyncio.run(main())
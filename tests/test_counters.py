@@ -0,0 +1,104 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from services import counters
+from services.counters import RegistrationCounters, SlidingCounter
+from services.store import DATE_FMT, RegistrationStore
+
+
+def test_sliding_counter_counts_window():
+    counter = SlidingCounter(minutes=10)
+    base = 600_000.0
+    counter.add(base)
+    counter.add(base + 60, n=2)
+    counter.add(base + 120)
+    now = base + 150
+    assert counter.count_since(base, now) == 4
+    assert counter.count_since(base + 60, now) == 3
+    assert counter.count_since(base + 120, now) == 1
+
+
+def test_sliding_counter_drops_old_minutes_on_rollover():
+    counter = SlidingCounter(minutes=5)
+    base = 600_000.0
+    counter.add(base)
+    counter.add(base + 4 * 60)
+    # Через 5 минут корзина первой регистрации переиспользуется
+    assert counter.count_since(0, base + 5 * 60) == 1
+    counter.add(base + 5 * 60)
+    assert counter.count_since(0, base + 5 * 60) == 2
+    # Пауза дольше окна очищает все корзины
+    assert counter.count_since(0, base + 60 * 60) == 0
+
+
+def test_sliding_counter_ignores_too_old_events():
+    counter = SlidingCounter(minutes=5)
+    base = 600_000.0
+    counter.add(base + 10 * 60)
+    counter.add(base)
+    assert counter.count_since(0, base + 10 * 60) == 1
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [datetime(2024, 3, 10, 12, 0, 30).timestamp()]
+    monkeypatch.setattr(counters.time, "time", lambda: now[0])
+    return now
+
+
+def test_covers_full_window_computed_slightly_earlier(clock):
+    c = RegistrationCounters(days=7)
+    since = datetime.fromtimestamp(clock[0]) - timedelta(days=7)
+    clock[0] += 0.5  # вызывающий посчитал now чуть раньше
+    assert c.covers(since)
+    assert not c.covers(since - timedelta(minutes=2))
+
+
+def test_seven_day_window_keeps_oldest_minute(clock):
+    c = RegistrationCounters(days=7)
+    now = datetime.fromtimestamp(clock[0])
+    c.record("events", now - timedelta(days=7) + timedelta(seconds=10))
+    c.record("events", now - timedelta(minutes=1))
+    assert c.counts_since(now - timedelta(days=7)) == {"events": 2, "accelerator": 0}
+    assert c.counts_since(now - timedelta(hours=1)) == {"events": 1, "accelerator": 0}
+
+
+def test_store_counts_each_user_once_on_every_path(tmp_path):
+    async def main():
+        store = RegistrationStore(str(tmp_path / "store.db"))
+        now = datetime.now()
+
+        def at(**kwargs) -> str:
+            return (now - timedelta(**kwargs)).strftime(DATE_FMT)
+
+        def insert(user_id: int, registered_at: str) -> None:
+            # Строка от другого процесса или повтор из старых данных
+            store._db.execute(
+                "INSERT INTO registrations (event_type, user_id, registered_at, payload)"
+                " VALUES ('events', ?, ?, '{}')",
+                (user_id, registered_at),
+            )
+            store._db.commit()
+
+        store.add("events", {"user_id": 1, "registration_date": at(days=10)})
+        store.add("events", {"user_id": 2, "registration_date": at(days=3)})
+        insert(2, at(minutes=5))
+        await store.load()
+        insert(1, at(minutes=1))
+        store.add("events", {"user_id": 3, "registration_date": at(minutes=2)})
+        store.update("events", {"user_id": 3, "registration_date": at(minutes=0)})
+
+        windows = [now - timedelta(hours=1), now - timedelta(days=7), now - timedelta(days=30)]
+        in_memory = [store.count_since(since) for since in windows]
+        store.loaded = False  # тот же ответ запросом к базе
+        in_db = [store.count_since(since) for since in windows]
+        assert in_memory == in_db == [
+            {"events": 1, "accelerator": 0},
+            {"events": 2, "accelerator": 0},
+            {"events": 3, "accelerator": 0},
+        ]
+        assert store.counters.covers(windows[1])
+
+    asyncio.run(main())
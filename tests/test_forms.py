@@ -0,0 +1,96 @@
+import pytest
+from aiogram.fsm.state import State, StatesGroup
+
+from utils.forms import (
+    CONFIRMATIONS,
+    EDIT_FIELDS,
+    FORMS,
+    PREV_STATE,
+    STEPS,
+    Field,
+    Form,
+)
+from utils.states import ChoosingEvent
+
+
+class DemoStates(StatesGroup):
+    name = State()
+    email = State()
+    consent = State()
+    confirmation = State()
+
+
+DEMO = Form(
+    event_type="demo",
+    title="Demo",
+    sheet_name="Demo",
+    edit_prefix="demo",
+    confirmation_state=DemoStates.confirmation,
+    success_text="ok",
+    fields=[
+        Field("user_id", column="ID", required=True),
+        Field("name", DemoStates.name, "Имя:", column="Имя", required=True,
+              summary="Имя", edit=("name", "Имя")),
+        Field("email", DemoStates.email, "Email:", column="Email", summary="Email",
+              summary_limit=5, edit=("email", "Email")),
+        Field(None, DemoStates.consent, "Согласие", choices={"consent": None}),
+    ],
+)
+
+
+def test_steps_skip_bot_filled_fields():
+    assert [f.key for f in DEMO.steps] == ["name", "email", None]
+    assert DEMO.headers == ["ID", "Имя", "Email"]
+
+
+def test_next_and_prev_tables():
+    assert DEMO.next[DemoStates.name.state].key == "email"
+    assert DEMO.next[DemoStates.email.state].state == DemoStates.consent
+    assert DEMO.next[DemoStates.consent.state] is None
+    assert DEMO.prev[DemoStates.name.state] == ChoosingEvent.waiting_for_event
+    assert DEMO.prev[DemoStates.email.state] == DemoStates.name
+    assert DEMO.prev[DemoStates.confirmation.state] == DemoStates.consent
+
+
+def test_edit_menu_lists_editable_steps():
+    assert list(DEMO.edit_fields) == ["edit:demo:name", "edit:demo:email"]
+    buttons = [row[0].callback_data for row in DEMO.edit_menu.inline_keyboard]
+    assert buttons == ["edit:demo:name", "edit:demo:email", "nav:back"]
+
+
+def test_row_and_summary():
+    data = {"user_id": 7, "name": "Анна", "email": "anna@example.com"}
+    assert DEMO.row(data) == [7, "Анна", "anna@example.com"]
+    assert DEMO.row({"user_id": 7, "name": "Анна"}) == [7, "Анна", ""]
+    with pytest.raises(KeyError):
+        DEMO.row({"user_id": 7})
+    assert "Email: anna@…" in DEMO.summary(data)
+
+
+@pytest.mark.parametrize("form", list(FORMS.values()), ids=list(FORMS))
+def test_real_form_tables_are_consistent(form):
+    # По next от первого шага проходятся все шаги по порядку
+    step, seen = form.steps[0], []
+    while step is not None:
+        seen.append(step)
+        step = form.next[step.state.state]
+    assert seen == list(form.steps)
+    # prev ведёт обратно от подтверждения к выбору мероприятия
+    state, back = form.confirmation_state, []
+    while state != ChoosingEvent.waiting_for_event:
+        state = form.prev[state.state]
+        back.append(state)
+    assert back[:-1] == [f.state for f in reversed(form.steps)]
+    # callback_data в Telegram — не больше 64 байт
+    assert all(len(data.encode()) <= 64 for data in form.edit_fields)
+    assert len(form.headers) == len(set(form.headers))
+
+
+def test_global_tables_cover_both_forms():
+    for form in FORMS.values():
+        for step in form.steps:
+            assert STEPS[step.state.state] == (form, step)
+            assert step.state.state in PREV_STATE
+        assert CONFIRMATIONS[form.confirmation_state.state] is form
+        for data, f in form.edit_fields.items():
+            assert EDIT_FIELDS[data] == (form, f)
@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from services import fsm_storage
+from services.fsm_storage import SQLiteStorage, count_states, create_storage
+from utils.states import AcceleratorStates
+
+KEY = StorageKey(bot_id=1, chat_id=42, user_id=42)
+
+
+def key(n: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=n, user_id=n)
+
+
+def redis_storage():
+    fakeredis = pytest.importorskip("fakeredis")
+    from aiogram.fsm.storage.redis import RedisStorage
+
+    return RedisStorage(redis=fakeredis.FakeAsyncRedis(), state_ttl=60, data_ttl=60)
+
+
+@pytest.fixture(params=["sqlite", "memory", "redis"])
+def storage(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteStorage(str(tmp_path / "fsm.db"), flush_interval=0)
+    if request.param == "memory":
+        return MemoryStorage()
+    return redis_storage()
+
+
+async def form_round_trip(storage) -> None:
+    state = FSMContext(storage, KEY)
+    assert await state.get_state() is None
+    await state.set_state(AcceleratorStates.waiting_for_name)
+    await state.update_data(event_type="events")
+    await state.set_state(AcceleratorStates.waiting_for_tg)
+    await state.update_data(full_name="Анна")
+
+    assert await state.get_state() == AcceleratorStates.waiting_for_tg.state
+    assert await state.get_data() == {"event_type": "events", "full_name": "Анна"}
+
+    await state.clear()
+    assert await state.get_state() is None
+    assert await state.get_data() == {}
+
+
+def test_form_round_trip(storage):
+    async def main():
+        try:
+            await form_round_trip(storage)
+        finally:
+            await storage.close()
+
+    asyncio.run(main())
+
+
+def test_create_storage_redis_uses_ttl():
+    pytest.importorskip("redis")
+    from aiogram.fsm.storage.redis import RedisStorage
+
+    storage = create_storage("redis", "", redis_url="redis://localhost:6379/0", ttl=120)
+    assert isinstance(storage, RedisStorage)
+    assert storage.state_ttl == 120 and storage.data_ttl == 120
+
+
+def test_sqlite_survives_restart(tmp_path):
+    path = str(tmp_path / "fsm.db")
+
+    async def main():
+        storage = SQLiteStorage(path, flush_interval=60)
+        await storage.set_state(KEY, AcceleratorStates.waiting_for_tg)
+        await storage.set_data(KEY, {"full_name": "Анна"})
+        await storage.close()  # close() дописывает отложенные изменения
+
+        storage = SQLiteStorage(path)
+        assert await storage.get_state(KEY) == AcceleratorStates.waiting_for_tg.state
+        assert await storage.get_data(KEY) == {"full_name": "Анна"}
+        assert count_states(storage) == {AcceleratorStates.waiting_for_tg.state: 1}
+        await storage.close()
+
+    asyncio.run(main())
+
+
+def test_sqlite_expired_session_is_empty(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(fsm_storage.time, "time", lambda: now[0])
+
+    async def main():
+        storage = SQLiteStorage(str(tmp_path / "fsm.db"), ttl=100, flush_interval=0)
+        await storage.set_state(KEY, AcceleratorStates.waiting_for_tg)
+        await storage.set_data(KEY, {"full_name": "Анна"})
+        now[0] += 99
+        assert await storage.get_state(KEY) == AcceleratorStates.waiting_for_tg.state
+        now[0] += 2
+        assert await storage.get_state(KEY) is None
+        assert await storage.get_data(KEY) == {}
+        assert count_states(storage) == {}
+        await storage.close()
+
+    asyncio.run(main())
+
+
+def test_sqlite_purges_expired_rows(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(fsm_storage.time, "time", lambda: now[0])
+    path = str(tmp_path / "fsm.db")
+
+    async def main():
+        storage = SQLiteStorage(path, ttl=100, flush_interval=0)
+        await storage.set_state(key(1), AcceleratorStates.waiting_for_tg)
+        now[0] += 3601
+        await storage.set_state(key(2), AcceleratorStates.waiting_for_tg)
+        rows = storage._db.execute("SELECT key FROM fsm_sessions").fetchall()
+        assert len(rows) == 1
+        await storage.close()
+
+    asyncio.run(main())
+
+
+def test_sqlite_lru_eviction_keeps_unflushed_changes(tmp_path):
+    path = str(tmp_path / "fsm.db")
+
+    async def main():
+        storage = SQLiteStorage(path, flush_interval=60, cache_size=2)
+        for n in range(1, 4):
+            await storage.set_state(key(n), AcceleratorStates.waiting_for_tg)
+            await storage.set_data(key(n), {"n": n})
+        # key(1) вытеснен из кэша до сброса — его изменения уже в базе
+        assert len(storage._cache) == 2
+        row = storage._db.execute(
+            "SELECT data FROM fsm_sessions WHERE key = ?", (fsm_storage._key(key(1)),)
+        ).fetchone()
+        assert row == ('{"n": 1}',)
+        # и читаются обратно
+        assert await storage.get_data(key(1)) == {"n": 1}
+        await storage.close()
+
+        storage = SQLiteStorage(path)
+        for n in range(1, 4):
+            assert await storage.get_data(key(n)) == {"n": n}
+        await storage.close()
+
+    asyncio.run(main())
@@ -0,0 +1,164 @@
+import asyncio
+from typing import Dict, List
+
+import pytest
+
+from services.async_sheets import AsyncSheetsService
+from services.registration_queue import RegistrationQueue
+from services.sheet_rows import to_record
+from utils.forms import FORMS
+
+
+class BackendDown(Exception):
+    """Google не ответил (считается недоступностью, как 503)."""
+
+
+class StubSheets:
+    """Лист в памяти; `calls` — журнал вызовов записи по порядку."""
+
+    def __init__(self):
+        self.sheets: Dict[str, List[List]] = {}
+        self.calls: List[tuple] = []
+        # Следующий append_rows запишет строки, но вернёт ошибку (как оборванный таймаутом)
+        self.fail_after_append = False
+        self.read_fails = False
+
+    def set_timeout(self, timeout: float) -> None:
+        pass
+
+    @staticmethod
+    def is_unavailable(error: Exception) -> bool:
+        return isinstance(error, BackendDown)
+
+    def build_row(self, event_type: str, user_data: Dict):
+        form = FORMS[event_type]
+        return form.sheet_name, form.row(user_data)
+
+    async def append_rows(self, sheet_name: str, rows: List[List]) -> bool:
+        self.calls.append(("append", [row[0] for row in rows]))
+        self.sheets.setdefault(sheet_name, []).extend(rows)
+        if self.fail_after_append:
+            self.fail_after_append = False
+            raise BackendDown("timeout")
+        return True
+
+    async def update_registration(self, event_type: str, user_data: Dict) -> bool:
+        self.calls.append(("update", [user_data["user_id"]]))
+        sheet_name, row = self.build_row(event_type, user_data)
+        rows = self.sheets.setdefault(sheet_name, [])
+        for i in range(len(rows) - 1, -1, -1):
+            if rows[i][0] == row[0]:
+                rows[i] = row
+                return True
+        rows.append(row)
+        return True
+
+    async def get_registration_records(self, event_type: str) -> List[Dict]:
+        if self.read_fails:
+            raise BackendDown("read failed")
+        form = FORMS[event_type]
+        return [to_record(form.headers, row) for row in self.sheets.get(form.sheet_name, [])]
+
+
+def registration(user_id: int, **extra) -> Dict:
+    return {
+        "user_id": user_id,
+        "full_name": f"User {user_id}",
+        "contact": "@user",
+        "registration_date": f"2024-01-01 10:00:{user_id:02d}",
+        **extra,
+    }
+
+
+@pytest.fixture
+def env(tmp_path):
+    backend = StubSheets()
+    sheets = AsyncSheetsService(backend)
+    queue = RegistrationQueue(str(tmp_path / "queue.db"), sheets, batch_size=10)
+    return backend, queue
+
+
+def test_appends_batch_in_one_call(env):
+    backend, queue = env
+
+    async def main():
+        for user_id in (1, 2, 3):
+            queue.enqueue("events", registration(user_id))
+        result = await queue.flush("events")
+        assert result.ok and result.size == 3
+        assert backend.calls == [("append", [1, 2, 3])]
+        assert queue.pending_count() == 0
+
+    asyncio.run(main())
+
+
+def test_update_is_written_alone_and_in_order(env):
+    backend, queue = env
+
+    async def main():
+        queue.enqueue("events", registration(1))
+        queue.enqueue("events", registration(2))
+        queue.enqueue("events", registration(1, full_name="Renamed"), update=True)
+        queue.enqueue("events", registration(3))
+        while queue.pending_count():
+            assert (await queue.flush("events")).ok
+        assert backend.calls == [("append", [1, 2]), ("update", [1]), ("append", [3])]
+        sheet = backend.sheets[FORMS["events"].sheet_name]
+        assert [row[0] for row in sheet] == [1, 2, 3]
+        assert sheet[0][1] == "Renamed"
+
+    asyncio.run(main())
+
+
+def test_retry_skips_rows_that_already_landed(env):
+    backend, queue = env
+
+    async def main():
+        queue.enqueue("events", registration(1))
+        queue.enqueue("events", registration(2))
+        backend.fail_after_append = True
+        assert not (await queue.flush("events")).ok
+        assert queue.pending_count() == 2
+
+        queue.enqueue("events", registration(3))
+        result = await queue.flush("events")
+        assert result.ok and result.size == 1
+        assert backend.calls == [("append", [1, 2]), ("append", [3])]
+        assert [row[0] for row in backend.sheets[FORMS["events"].sheet_name]] == [1, 2, 3]
+        assert queue.pending_count() == 0
+
+    asyncio.run(main())
+
+
+def test_retry_waits_when_sheet_cannot_be_checked(env):
+    backend, queue = env
+
+    async def main():
+        queue.enqueue("events", registration(1))
+        backend.fail_after_append = True
+        assert not (await queue.flush("events")).ok
+
+        backend.read_fails = True
+        assert not (await queue.flush("events")).ok
+        assert backend.calls == [("append", [1])]
+        assert queue.pending_count() == 1
+
+        backend.read_fails = False
+        assert (await queue.flush("events")).ok
+        assert backend.calls == [("append", [1])]
+        assert queue.pending_count() == 0
+
+    asyncio.run(main())
+
+
+def test_malformed_rows_are_dropped(env):
+    backend, queue = env
+
+    async def main():
+        queue.enqueue("events", {"full_name": "no id"})
+        queue.enqueue("events", registration(1))
+        assert (await queue.flush("events")).ok
+        assert backend.calls == [("append", [1])]
+        assert queue.pending_count() == 0
+
+    asyncio.run(main())
@@ -0,0 +1,50 @@
+from datetime import datetime
+
+from services.sheet_rows import (
+    column_letter,
+    count_first_registrations,
+    make_cursor,
+    registration_user_ids,
+    trim_row,
+)
+
+
+def test_column_letter():
+    assert [column_letter(n) for n in (1, 7, 12, 26, 27, 52, 703)] == [
+        "A", "G", "L", "Z", "AA", "AZ", "AAA"
+    ]
+
+
+def test_make_cursor_pads_short_rows():
+    cursor = make_cursor([["ID пользователя", "ФИО"], ["1", "Анна"], ["2"]], "t1")
+    assert cursor.headers == ["ID пользователя", "ФИО"]
+    assert cursor.records[1] == {"ID пользователя": "2", "ФИО": ""}
+    assert cursor.last_row == ["2"]
+    assert cursor.modified_time == "t1"
+
+
+def test_make_cursor_empty_sheet():
+    cursor = make_cursor([])
+    assert cursor.headers == [] and cursor.records == [] and cursor.last_row == []
+
+
+def test_trim_row():
+    assert trim_row([1, "", "x", "", ""]) == ["1", "", "x"]
+
+
+def test_registration_user_ids_skips_bad_values():
+    rows = [{"ID пользователя": "5"}, {"ID пользователя": ""}, {"ID пользователя": "abc"}, {}]
+    assert registration_user_ids(rows) == [5]
+
+
+def test_count_first_registrations_counts_each_user_once():
+    rows = [
+        {"ID пользователя": "1", "Дата регистрации": "2024-01-01 10:00:00"},
+        {"ID пользователя": "1", "Дата регистрации": "2024-01-05 10:00:00"},
+        {"ID пользователя": "2", "Дата регистрации": "2024-01-04 10:00:00"},
+        {"ID пользователя": "3", "Дата регистрации": "не дата"},
+    ]
+    windows = {"since_jan_3": datetime(2024, 1, 3), "all": datetime(2000, 1, 1)}
+    result = count_first_registrations({"events": rows}, windows)
+    assert result["since_jan_3"] == {"events": 1, "accelerator": 0}
+    assert result["all"] == {"events": 2, "accelerator": 0}
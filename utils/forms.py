@@ -0,0 +1,310 @@
+"""
+Декларативное описание анкет регистрации.
+
+Анкета (`Form`) — упорядоченный список полей (`Field`): вопрос и клавиатура
+шага, проверка ответа, колонка в листе Google Sheets, строка в сводке перед
+подтверждением и пункт меню «Изменить». По этому описанию
+handlers/registration.py ведёт FSM одним набором обработчиков на обе анкеты,
+а services/sheets.py строит заголовки и строки листов.
+
+Переходы между шагами заранее собраны в словари по имени состояния
+(`STEPS`, `PREV_STATE`, `CONFIRMATIONS`, `EDIT_FIELDS`), поэтому обработчик
+находит текущий шаг, следующий и предыдущий за O(1).
+"""
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from config import (
+    EVENTS,
+    ACCELERATOR_STAGES,
+    PIZZAPITCH_CHOICES,
+    PERSONAL_DATA_POLICY_URL,
+    SHEET_NAME_EVENTS,
+    SHEET_NAME_ACCELERATOR,
+)
+from utils.states import ChoosingEvent, AcceleratorStates, EventStates
+from utils.validators import validate_email, validate_telegram_contact, validate_url
+
+BACK_BTN = InlineKeyboardButton(text="◀️ Назад", callback_data="nav:back")
+
+
+# --- Клавиатуры шагов (строятся один раз; модели aiogram неизменяемы) ---
+def with_back(kb: InlineKeyboardMarkup) -> InlineKeyboardMarkup:
+    rows = [list(row) for row in kb.inline_keyboard]
+    rows.append([BACK_BTN])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+BACK_KB = InlineKeyboardMarkup(inline_keyboard=[[BACK_BTN]])
+
+YES_NO_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [
+        InlineKeyboardButton(text="Да", callback_data="yn:y"),
+        InlineKeyboardButton(text="Нет", callback_data="yn:n"),
+    ],
+])
+YES_NO_CHOICES = {"yn:y": "Да", "yn:n": "Нет"}
+
+CONSENT_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="Да, я ознакомился", callback_data="consent")],
+])
+
+STAGE_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text=v, callback_data=f"st:{k}")] for k, v in ACCELERATOR_STAGES.items()
+])
+
+PIZZAPITCH_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text=v, callback_data=f"pz:{k}")] for k, v in PIZZAPITCH_CHOICES.items()
+])
+
+
+@dataclass(frozen=True, eq=False)
+class Field:
+    """
+    Поле анкеты.
+    key: ключ в данных FSM (None — шаг без ответа, например согласие).
+    state: состояние шага (None — поле заполняет бот: user_id, дата).
+    choices: для шага с кнопками — callback_data -> сохраняемое значение;
+        None — ответ текстом.
+    validate / error: проверка текстового ответа и текст при ошибке
+        (для шага с кнопками — ответ на сообщение вместо нажатия).
+    column: заголовок колонки в листе; required — без значения строку не записать.
+    summary / summary_limit: подпись в сводке и обрезка длинного ответа.
+    edit: (код, подпись) пункта меню «Изменить».
+    """
+    key: Optional[str]
+    state: Optional[State] = None
+    prompt: str = ""
+    markup: InlineKeyboardMarkup = BACK_KB
+    choices: Optional[Mapping[str, Optional[str]]] = None
+    validate: Optional[Callable[[str], bool]] = None
+    error: str = ""
+    column: Optional[str] = None
+    required: bool = False
+    summary: Optional[str] = None
+    summary_limit: int = 0
+    edit: Optional[Tuple[str, str]] = None
+
+
+USER_ID = Field("user_id", column="ID пользователя", required=True)
+REGISTRATION_DATE = Field("registration_date", column="Дата регистрации", required=True)
+
+CONSENT_TEXT = (
+    "Я подтверждаю, что лично ознакомился с Положением об обработке "
+    "персональных данных НИУ ВШЭ, вправе предоставлять свои персональные "
+    "данные и давать согласие на их обработку.\n\n"
+    f"Ссылка на положение: {PERSONAL_DATA_POLICY_URL}"
+)
+TG_PROMPT = "Ваш Telegram-аккаунт (@username или номер телефона):"
+TG_ERROR = "Введите @username или номер телефона:"
+HSE_ERROR = "Выберите «Да» или «Нет» кнопкой ниже."
+CONSENT_ERROR = "Нажмите «Да, я ознакомился» под сообщением выше."
+
+
+def consent_field(state: State) -> Field:
+    return Field(
+        None, state, CONSENT_TEXT, with_back(CONSENT_KB),
+        choices={"consent": None}, error=CONSENT_ERROR,
+    )
+
+
+class Form:
+    def __init__(
+        self,
+        event_type: str,
+        title: str,
+        sheet_name: str,
+        edit_prefix: str,
+        fields: List[Field],
+        confirmation_state: State,
+        success_text: str,
+    ):
+        self.event_type = event_type
+        self.title = title
+        self.sheet_name = sheet_name
+        self.fields = tuple(fields)
+        self.confirmation_state = confirmation_state
+        self.success_text = success_text
+        # Шаги, которые задаются пользователю, по порядку
+        self.steps = tuple(f for f in self.fields if f.state is not None)
+        self.columns = tuple(f for f in self.fields if f.column)
+        self.headers = [f.column for f in self.columns]
+
+        self.next: Dict[str, Optional[Field]] = {}
+        self.prev: Dict[str, State] = {}
+        prev_state = ChoosingEvent.waiting_for_event
+        for i, step in enumerate(self.steps):
+            self.next[step.state.state] = self.steps[i + 1] if i + 1 < len(self.steps) else None
+            self.prev[step.state.state] = prev_state
+            prev_state = step.state
+        self.prev[confirmation_state.state] = prev_state
+
+        self.edit_fields = {
+            f"edit:{edit_prefix}:{f.edit[0]}": f for f in self.steps if f.edit is not None
+        }
+        self.edit_menu = InlineKeyboardMarkup(inline_keyboard=[
+            *([InlineKeyboardButton(text=f.edit[1], callback_data=data)]
+              for data, f in self.edit_fields.items()),
+            [BACK_BTN],
+        ])
+
+    def row(self, data: Mapping) -> List:
+        """Строка листа. KeyError — нет обязательного поля."""
+        return [data[f.key] if f.required else data.get(f.key, "") for f in self.columns]
+
+    def summary(self, data: Mapping) -> str:
+        lines = ["Проверьте данные:", ""]
+        for f in self.steps:
+            if f.summary is None:
+                continue
+            value = str(data.get(f.key, ""))
+            if f.summary_limit and len(value) > f.summary_limit:
+                value = value[:f.summary_limit] + "…"
+            lines.append(f"{f.summary}: {value}")
+        lines += ["", "Всё верно?"]
+        return "\n".join(lines)
+
+
+AGAIN_TEXT = "Если хотите зарегистрироваться ещё раз или на второе мероприятие, нажмите /start"
+
+ACCELERATOR_FORM = Form(
+    event_type="accelerator",
+    title="Акселератор",
+    sheet_name=SHEET_NAME_ACCELERATOR,
+    edit_prefix="acc",
+    confirmation_state=AcceleratorStates.waiting_for_confirmation,
+    success_text=f"Регистрация на {EVENTS['accelerator']} завершена. 🎉\n\n{AGAIN_TEXT}",
+    fields=[
+        USER_ID,
+        Field(
+            "full_name", AcceleratorStates.waiting_for_name,
+            "Регистрация в Акселератор «ВоронаКреативТех».\nВведите ваши ФИО:",
+            column="ФИО", required=True, summary="ФИО", edit=("name", "ФИО"),
+        ),
+        Field(
+            "project_name", AcceleratorStates.waiting_for_project_name, "Название проекта:",
+            column="Название проекта", summary="Название проекта",
+            edit=("project", "Название проекта"),
+        ),
+        Field(
+            "email", AcceleratorStates.waiting_for_email, "Электронная почта:",
+            validate=validate_email, error="Некорректный email. Введите снова:",
+            column="Email", summary="Email", edit=("email", "Email"),
+        ),
+        Field(
+            "contact", AcceleratorStates.waiting_for_tg, TG_PROMPT,
+            validate=validate_telegram_contact, error=TG_ERROR,
+            column="Тг-аккаунт", summary="Тг", edit=("tg", "Telegram"),
+        ),
+        Field(
+            "stage", AcceleratorStates.waiting_for_stage, "Этап реализации проекта:",
+            with_back(STAGE_KB),
+            choices={f"st:{k}": v for k, v in ACCELERATOR_STAGES.items()},
+            error="Выберите этап кнопкой ниже.",
+            column="Этап реализации", summary="Этап", edit=("stage", "Этап"),
+        ),
+        Field(
+            "description", AcceleratorStates.waiting_for_description, "Краткое описание проекта:",
+            column="Описание проекта", summary="Описание", summary_limit=100,
+            edit=("description", "Описание"),
+        ),
+        Field(
+            "pizzapitch", AcceleratorStates.waiting_for_pizzapitch,
+            "Хотите ли выступить на мероприятиях Бизнес-студии?",
+            with_back(PIZZAPITCH_KB),
+            choices={f"pz:{k}": v for k, v in PIZZAPITCH_CHOICES.items()},
+            error="Выберите вариант кнопкой ниже.",
+            column="Выступление на мероприятиях", summary="Выступление на мероприятиях",
+            edit=("pizzapitch", "Выступление на мероприятиях"),
+        ),
+        Field(
+            "presentation_url", AcceleratorStates.waiting_for_presentation_url,
+            "Пришлите ссылку на презентацию вашего продукта/проекта. Если её нет — поставьте «-»:",
+            validate=lambda text: text == "-" or validate_url(text),
+            error="Введите корректную ссылку (http:// или https://) или «-»:",
+            column="Ссылка на презентацию", summary="Ссылка на презентацию",
+            edit=("presentation", "Ссылка на презентацию"),
+        ),
+        Field(
+            "team", AcceleratorStates.waiting_for_team, "ФИО и Образовательная программа:",
+            column="ФИО и Образовательная программа",
+            summary="ФИО и Образовательная программа", summary_limit=80,
+            edit=("team", "ФИО и Образовательная программа"),
+        ),
+        Field(
+            "hse", AcceleratorStates.waiting_for_hse, "Ваш вуз:", with_back(YES_NO_KB),
+            choices=YES_NO_CHOICES, error=HSE_ERROR,
+            column="Ваш вуз", summary="Ваш вуз", edit=("hse", "Ваш вуз"),
+        ),
+        consent_field(AcceleratorStates.waiting_for_consent),
+        REGISTRATION_DATE,
+    ],
+)
+
+EVENTS_FORM = Form(
+    event_type="events",
+    title="Мероприятия",
+    sheet_name=SHEET_NAME_EVENTS,
+    edit_prefix="ev",
+    confirmation_state=EventStates.waiting_for_confirmation,
+    success_text=(
+        "Регистрация на мероприятия Бизнес-студии «ВоронаКреативТех» завершена. 🎉\n\n"
+        "До скорой встречи! И подписывайтесь на наш канал @HSEVorona, "
+        "чтобы общаться и быть в курсе новостей!\n\n"
+        f"{AGAIN_TEXT}"
+    ),
+    fields=[
+        USER_ID,
+        Field(
+            "full_name", EventStates.waiting_for_name,
+            "Регистрация на мероприятия Бизнес-студии «ВоронаКреативТех».\nВведите ваши ФИО:",
+            column="ФИО", required=True, summary="ФИО", edit=("name", "ФИО"),
+        ),
+        Field(
+            "hse", EventStates.waiting_for_hse,
+            "Ваш вуз (важно для заказа пропуска для гостей не из ВШЭ):", with_back(YES_NO_KB),
+            choices=YES_NO_CHOICES, error=HSE_ERROR,
+            column="Вы из ВШЭ", summary="Ваш вуз", edit=("hse", "Ваш вуз"),
+        ),
+        Field(
+            "edu_program", EventStates.waiting_for_edu_program,
+            "Ваша образовательная программа (для выпускников — программа по диплому):",
+            column="Образовательная программа", summary="Образовательная программа",
+            edit=("edu", "Образовательная программа"),
+        ),
+        Field(
+            "contact", EventStates.waiting_for_tg, TG_PROMPT,
+            validate=validate_telegram_contact, error=TG_ERROR,
+            column="Тг-аккаунт", summary="Тг", edit=("tg", "Telegram"),
+        ),
+        Field(
+            "question", EventStates.waiting_for_question,
+            "Ваш вопрос спикерам или организаторам (можно пропустить — отправьте «-»):",
+            column="Вопрос спикерам", summary="Вопрос", edit=("question", "Вопрос"),
+        ),
+        consent_field(EventStates.waiting_for_consent),
+        REGISTRATION_DATE,
+    ],
+)
+
+FORMS: Mapping[str, Form] = MappingProxyType({
+    form.event_type: form for form in (ACCELERATOR_FORM, EVENTS_FORM)
+})
+
+# Таблицы переходов по имени состояния (как его возвращает state.get_state())
+STEPS: Mapping[str, Tuple[Form, Field]] = MappingProxyType({
+    step.state.state: (form, step) for form in FORMS.values() for step in form.steps
+})
+PREV_STATE: Mapping[str, State] = MappingProxyType({
+    name: prev for form in FORMS.values() for name, prev in form.prev.items()
+})
+CONFIRMATIONS: Mapping[str, Form] = MappingProxyType({
+    form.confirmation_state.state: form for form in FORMS.values()
+})
+EDIT_FIELDS: Mapping[str, Tuple[Form, Field]] = MappingProxyType({
+    data: (form, f) for form in FORMS.values() for data, f in form.edit_fields.items()
+})